@@ -1,7 +1,153 @@
-from db import get_db
-from prettytable import PrettyTable
+import functools
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from db import (ManagedConnection, get_db, get_habit_generation, get_period_key, get_write_generation, iter_pages,
+                note_other_writes)
+
+# Maximum number of query results kept by the analytics cache
+CACHE_SIZE = 256
+
+# Maximum number of results about single habits kept by the analytics cache
+HABIT_CACHE_SIZE = 4096
+
+# Number of rows fetched at a time by the streaming queries
+PAGE_SIZE = 1000
+
+HABIT_INFO_HEADER = ("Habit", "Periodicity", "Description", "Creation Date", "Current Streak")
+EVENT_LOG_HEADER = ("Habit", "Streak", "Event Date")
+COMPLETION_RATE_HEADER = ("Period", "Checked In", "Due", "Completion Rate")
+DUE_HABITS_HEADER = ("Habit", "Periodicity", "Current Streak", "Due Since", "Breaks After", "Status")
+
+# Buckets of the completion rate reports, with the periodicity whose periods they match
+GRAINS = {"day": "daily", "week": "weekly", "month": "monthly", "year": "yearly"}
+
+# SQL expression for the first day of the period of a periodicity that holds a "YYYY-MM-DD" date
+SQL_PERIOD_START = """
+    CASE {periodicity} WHEN 'weekly' THEN date({date}, 'weekday 0', '-6 days')
+                       WHEN 'monthly' THEN date({date}, 'start of month')
+                       WHEN 'yearly' THEN date({date}, 'start of year')
+                       ELSE date({date}) END"""
+
+# Shades of the heatmap cells, from no check-in to the most check-ins of a day
+HEATMAP_SHADES = "·░▒▓█"
+
+# Maps (function name, database, arguments) to (write generation, result, error), least recently used first
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+# The same for results about single habits, keyed by (function name, database, habit, other arguments)
+_habit_cache = OrderedDict()
+
+
+def cached(function):
+    """
+    Memoize an analytics query per database and arguments.
+
+    A result (or the ValueError raised for an empty result) is reused until any function of the db module changes
+    the database, which starts a new write generation. Commits of other processes start one too: every lookup on a
+    connection from get_db checks its PRAGMA data_version (see db.note_other_writes). Only the CACHE_SIZE most
+    recently used results are kept. Calls on an in-memory history.History or a snapshot.Snapshot are not cached.
+
+    Parameters:
+    - function: Analytics function taking a database connection followed by hashable arguments.
+
+    Returns:
+    The memoized function.
+    """
+    @functools.wraps(function)
+    def wrapper(db, *args):
+        if not isinstance(db, sqlite3.Connection):
+            return function(db, *args)
+        key = (function.__name__, getattr(db, "key", id(db)), args)
+        if isinstance(db, ManagedConnection):
+            note_other_writes(db)
+        generation = get_write_generation()
+        return memoize(_cache, CACHE_SIZE, key, lambda entry: entry[0] == generation,
+                       lambda: function(db, *args), generation)
+    return wrapper
+
+
+def cached_by_habit(function):
+    """
+    Memoize an analytics query about one habit per database, habit and further arguments.
+
+    Unlike with cached, a result is only thrown away when its own habit changes, so checking in one habit keeps
+    the results of all others. Called with None for the habit, the query covers all habits and its result is
+    reused until any habit changes. A commit of another process counts as a change to every habit. The
+    HABIT_CACHE_SIZE most recently used results are kept. Calls on a snapshot.Snapshot are not cached.
 
+    Parameters:
+    - function: Analytics function taking a database connection, a habit name or None, and hashable arguments.
 
+    Returns:
+    The memoized function.
+    """
+    @functools.wraps(function)
+    def wrapper(db, name, *args):
+        if not isinstance(db, sqlite3.Connection):
+            return function(db, name, *args)
+        key = (function.__name__, getattr(db, "key", id(db)), name, args)
+        if isinstance(db, ManagedConnection):
+            note_other_writes(db)
+        # Read before the query runs, so a change made while it runs marks the result as stale
+        generation = get_write_generation()
+        if name is None:
+            current = lambda entry: entry[0] == get_write_generation()
+        else:
+            current = lambda entry: entry[0] >= get_habit_generation(name)
+        return memoize(_habit_cache, HABIT_CACHE_SIZE, key, current, lambda: function(db, name, *args),
+                       generation)
+    return wrapper
+
+
+def memoize(cache, size, key, current, compute, generation):
+    """
+    Look a result up in a cache, computing and storing it if it is missing or stale.
+
+    Parameters:
+    - cache: OrderedDict mapping keys to (write generation, result, error), least recently used first.
+    - size: Number of entries kept.
+    - key: Key of the result.
+    - current: Function telling whether an entry is still current.
+    - compute: Function computing the result. A ValueError it raises is stored and raised like a result.
+    - generation: Write generation read before the lookup, which a new entry is stored under.
+
+    Returns:
+    The result.
+    """
+    with _cache_lock:
+        entry = cache.get(key)
+        if entry is not None and current(entry):
+            cache.move_to_end(key)
+        else:
+            entry = None
+    if entry is None:
+        try:
+            entry = (generation, compute(), None)
+        except ValueError as error:
+            entry = (generation, None, error)
+        with _cache_lock:
+            cache[key] = entry
+            cache.move_to_end(key)
+            while len(cache) > size:
+                cache.popitem(last=False)
+    if entry[2] is not None:
+        raise entry[2].with_traceback(None)
+    return entry[1]
+
+
+def clear_cache():
+    """
+    Remove every result from the analytics cache.
+    """
+    with _cache_lock:
+        _cache.clear()
+        _habit_cache.clear()
+
+
+@cached
 def get_all_habits_info(db):
     """
     Retrieve information for all habits from the habit_info table.
@@ -13,8 +159,8 @@ def get_all_habits_info(db):
     List of tuples containing habit information.
     """
     cur = db.cursor()
-    column_names = (("Habit", "Periodicity", "Description", "Creation Date", "Current Streak"), )
-    cur.execute("SELECT * FROM habit_info")
+    column_names = (HABIT_INFO_HEADER, )
+    cur.execute("SELECT habit, periodicity, description, creation_date, streak FROM habit_info")
     rows = cur.fetchall()
     rows_with_header = column_names + tuple(rows)
     if len(rows) > 0:
@@ -23,6 +169,7 @@ def get_all_habits_info(db):
         raise ValueError("No habit information found; Please add a habit first")
 
 
+@cached
 def get_all_habits(db):
     """
     Retrieve the names of all habits from the habit_info table.
@@ -43,6 +190,7 @@ def get_all_habits(db):
     else:
         raise ValueError("No habit found; Please add a habit first")
 
+@cached
 def get_all_habits_based_on_periodicity(db, periodicity):
     """
     Retrieve habits based on a specific periodicity from the habit_info table.
@@ -56,7 +204,7 @@ def get_all_habits_based_on_periodicity(db, periodicity):
     """
     cur = db.cursor()
     column_names = (("Habit", "Periodicity", "Description", "Creation Date", "Current Streak"),)
-    cur.execute("SELECT * FROM habit_info WHERE periodicity = ?", (periodicity,))
+    cur.execute("SELECT habit, periodicity, description, creation_date, streak FROM habit_info WHERE periodicity = ?", (periodicity,))
     rows = cur.fetchall()
     rows_with_header = column_names + tuple(rows)
     if len(rows) > 0:
@@ -65,6 +213,7 @@ def get_all_habits_based_on_periodicity(db, periodicity):
         raise ValueError("No habit found with that periodicity.")
 
 
+@cached
 def get_data_of_single_habit(db, name):
     """
     Retrieve information for a specific habit from the habit_info table.
@@ -78,7 +227,7 @@ def get_data_of_single_habit(db, name):
     """
     cur = db.cursor()
     column_names = (("Habit", "Periodicity", "Description", "Creation Date", "Current Streak"),)
-    cur.execute("SELECT * FROM habit_info WHERE habit = ?", (name,))
+    cur.execute("SELECT habit, periodicity, description, creation_date, streak FROM habit_info WHERE habit = ?", (name,))
     rows = cur.fetchall()
     rows_with_header = column_names + tuple(rows)
     if len(rows) > 0:
@@ -87,43 +236,54 @@ def get_data_of_single_habit(db, name):
         raise ValueError("No habit found; Please add a habit first")
 
 
+@cached
 def get_longest_streak_for_given_habit(db, name):
     """
-    Retrieve the longest streak for a specific habit from the event_log table.
+    Retrieve the longest streak for a specific habit from the habit_info table.
 
     Parameters:
-    - db: Database connection.
+    - db: Database connection, or a history.History or snapshot.Snapshot to compute the streak from.
     - name: Name of the habit.
 
     Returns:
     Integer representing the longest streak.
     """
-    cur = db.cursor()
     string = name.capitalize() + " Longest Streak"
     column_names = ((string, ),)
-    cur.execute("SELECT MAX(streak) FROM event_log WHERE habit = ?", (name,))
-    rows = cur.fetchall()
+    if not isinstance(db, sqlite3.Connection):
+        longest = db[name].longest_streak()[0] if name in db else 0
+        rows = [(longest, )] if longest > 0 else []
+    else:
+        cur = db.cursor()
+        cur.execute("SELECT longest_streak FROM habit_info WHERE habit = ? AND longest_streak > 0", (name,))
+        rows = cur.fetchall()
     rows_with_header = column_names + tuple(rows)
     if len(rows) > 0:
         return rows_with_header
     else:
-        raise ValueError("No habit found; Please add a habit first")
+        raise ValueError("No check-in event found for given Habit.")
 
 
+@cached
 def get_longest_streaks_of_all_habits(db):
     """
-    Retrieve the longest streak for each habit from the event_log table.
+    Retrieve the longest streak for each habit from the habit_info table.
 
     Parameters:
-    - db: Database connection.
+    - db: Database connection, or a history.History or snapshot.Snapshot to compute the streaks from.
 
     Returns:
-    List of tuples containing the longest streak for each habit.
+    List of tuples containing the longest streak for each habit and the date it was reached.
     """
-    cur = db.cursor()
-    column_names = (("Habit Name", "Longest Streak"), )
-    cur.execute("SELECT habit, MAX(streak) AS max_streak FROM event_log WHERE habit IN (SELECT habit FROM habit_info) GROUP BY habit")
-    rows = cur.fetchall()
+    column_names = (("Habit Name", "Longest Streak", "Reached On"), )
+    if not isinstance(db, sqlite3.Connection):
+        rows = sorted(row for row in db.longest_streaks() if row[1] > 0)
+    else:
+        cur = db.cursor()
+        cur.execute("""
+            SELECT habit, longest_streak, longest_streak_end_date FROM habit_info
+            WHERE longest_streak > 0 ORDER BY habit""")
+        rows = cur.fetchall()
     rows_with_header = column_names + tuple(rows)
     if len(rows) > 0:
         return rows_with_header
@@ -131,26 +291,362 @@ def get_longest_streaks_of_all_habits(db):
         raise ValueError("No habit found; Please add a habit first")
 
 
+@cached
 def get_event_logs_by_habit(db, name):
     """
     Retrieve event logs for a specific habit from the event_log table.
 
     Parameters:
-    - db: Database connection.
+    - db: Database connection, or a history.History or snapshot.Snapshot to read the events from.
     - name: Name of the habit.
 
     Returns:
     List of tuples containing event log information for the habit.
     """
+    column_names = (EVENT_LOG_HEADER,)
+    if not isinstance(db, sqlite3.Connection):
+        rows = list(db[name].rows()) if name in db else []
+    else:
+        cur = db.cursor()
+        cur.execute("SELECT habit, streak, event_date FROM event_log WHERE habit = ?", (name,))
+        rows = cur.fetchall()
+    rows_with_header = column_names + tuple(rows)
+    if len(rows) > 0:
+        return rows_with_header
+    else:
+        raise ValueError("No check-in event found for given Habit.")
+
+
+@cached
+def get_due_habits(db, today):
+    """
+    Retrieve the habits that are due on a day, with one range scan of the (next_due_date, breaks_after_date)
+    index.
+
+    A habit is "overdue" once the last day it could be checked in to keep its streak has passed, "at risk" on
+    that last day, and "due" before it or while it has no streak to lose.
+
+    Parameters:
+    - db: Database connection.
+    - today: The day as "YYYY-MM-DD".
+
+    Returns:
+    List of tuples of the habit, its periodicity, its current streak, the day it became due, the last day of its
+    streak and its status, ordered by the day it became due.
+    """
     cur = db.cursor()
-    column_names = (("Habit", "Streak", "Event Date"),)
-    cur.execute("SELECT * FROM event_log WHERE habit = ?", (name,))
+    column_names = (DUE_HABITS_HEADER, )
+    cur.execute("""
+        SELECT habit, periodicity, streak, next_due_date, breaks_after_date,
+               CASE WHEN breaks_after_date < :today THEN 'overdue'
+                    WHEN breaks_after_date = :today THEN 'at risk'
+                    ELSE 'due' END
+        FROM habit_info
+        WHERE next_due_date <= :today
+        ORDER BY next_due_date""", {"today": today})
     rows = cur.fetchall()
     rows_with_header = column_names + tuple(rows)
     if len(rows) > 0:
         return rows_with_header
     else:
+        raise ValueError("No habit is due")
+
+
+def get_report_window(end=None, days=365):
+    """
+    Get the first and last day of a report covering a number of days.
+
+    Parameters:
+    - end: Last day as "YYYY-MM-DD". Defaults to today.
+    - days: Number of days covered.
+
+    Returns:
+    Tuple of the first and the last day as "YYYY-MM-DD".
+    """
+    last = date.today() if end is None else date.fromisoformat(end)
+    return (last - timedelta(days=days - 1)).isoformat(), last.isoformat()
+
+
+def get_period_start(periodicity, day):
+    """
+    Get the first day of the period of a periodicity that holds a day. Weeks start on Monday.
+
+    Parameters:
+    - periodicity: Periodicity (daily, weekly, monthly, yearly).
+    - day: A datetime.date.
+
+    Returns:
+    The first day of the period as a datetime.date.
+    """
+    if periodicity == "weekly":
+        return day - timedelta(days=day.weekday())
+    elif periodicity == "monthly":
+        return day.replace(day=1)
+    elif periodicity == "yearly":
+        return day.replace(month=1, day=1)
+    else:
+        return day
+
+
+def get_period_start_of_key(periodicity, key):
+    """
+    Get the first day of the period with a period key (see db.get_period_key).
+
+    Parameters:
+    - periodicity: Periodicity (daily, weekly, monthly, yearly).
+    - key: Period key.
+
+    Returns:
+    The first day of the period as a datetime.date.
+    """
+    if periodicity == "weekly":
+        return date.fromordinal(key * 7 + 1)
+    elif periodicity == "monthly":
+        return date(key // 12, key % 12 + 1, 1)
+    elif periodicity == "yearly":
+        return date(key, 1, 1)
+    else:
+        return date.fromordinal(key)
+
+
+@cached_by_habit
+def get_check_in_counts(db, name, start, end):
+    """
+    Count the check-ins of a habit, or of all habits, on every day between two dates with one grouped query.
+
+    Repeated check-ins in a period do not count. The check-ins are grouped by date and by the periodicity of their
+    habit, longest periods first within a day, as snapshot.Snapshot.check_in_counts orders them.
+
+    Parameters:
+    - db: Database connection, or a snapshot.Snapshot to count the check-ins in.
+    - name: Name of the habit, or None for all habits.
+    - start: First day as "YYYY-MM-DD".
+    - end: Last day as "YYYY-MM-DD".
+
+    Returns:
+    Tuple of (event date, periodicity, number of check-ins) tuples, ordered by date.
+    """
+    if not isinstance(db, sqlite3.Connection):
+        return db.check_in_counts(name, start, end)
+    habit_filter = "" if name is None else "AND h.habit = ?"
+    params = (start, end) if name is None else (start, end, name)
+    cur = db.cursor()
+    # Habit by habit, each a range of the (habit, event_date) index, which is twice as fast as looking up the
+    # habit of every check-in found by date
+    cur.execute(f"""
+        SELECT e.event_date, h.periodicity, COUNT(*) FROM habit_info h CROSS JOIN event_log e ON e.habit = h.habit
+        WHERE e.period_key IS NOT NULL AND e.event_date BETWEEN ? AND ? {habit_filter}
+        GROUP BY e.event_date, h.periodicity
+        ORDER BY e.event_date, CASE h.periodicity WHEN 'yearly' THEN 0 WHEN 'monthly' THEN 1
+                                                  WHEN 'weekly' THEN 2 ELSE 3 END""", params)
+    return tuple(cur)
+
+
+def count_due_periods(db, name, first_days, last_days):
+    """
+    Count the periods of habits that start in each of a list of date ranges, counting from the period every
+    habit was created in. Habits are grouped by periodicity and first period in SQL, so the work done here does
+    not grow with the number of habits.
+
+    Parameters:
+    - db: Database connection, or a snapshot.Snapshot to read the habits from.
+    - name: Name of the habit, or None for all habits.
+    - first_days: List of the first day of every range, as datetime.date.
+    - last_days: List of the last day of every range, as datetime.date.
+
+    Returns:
+    NumPy array with the number of due periods in every range.
+    """
+    # Imported here, as numpy takes longer to load than a short command takes to run
+    import numpy as np
+
+    if not isinstance(db, sqlite3.Connection):
+        cur = db.creation_groups(name)
+    else:
+        habit_filter = "" if name is None else "WHERE habit = ?"
+        cur = db.cursor()
+        cur.execute(f"""
+            SELECT periodicity, {SQL_PERIOD_START.format(periodicity="periodicity", date="creation_date")} AS first,
+                   COUNT(*)
+            FROM habit_info {habit_filter}
+            GROUP BY periodicity, first""", () if name is None else (name,))
+    groups = {}
+    for habit_periodicity, first, count in cur:
+        groups.setdefault(habit_periodicity, []).append((first, count))
+
+    due = np.zeros(len(first_days), dtype=np.int64)
+    for habit_periodicity, firsts in groups.items():
+        # Periods starting in [a, b] = key(b) - key(a - 1 day), and no earlier than the habit's first period
+        def key(day):
+            return get_period_key(habit_periodicity, day.isoformat())
+        before = np.array([key(day - timedelta(days=1)) for day in first_days])
+        last = np.array([key(day) for day in last_days])
+        created = np.array([key(date.fromisoformat(first) - timedelta(days=1)) if first else np.iinfo(np.int64).min
+                            for first, _ in firsts])
+        counts = np.array([count for _, count in firsts])
+        due += np.maximum(last[:, None] - np.maximum(before[:, None], created[None, :]), 0) @ counts
+    return due
+
+
+@cached_by_habit
+def get_completion_rates(db, name, grain, start, end):
+    """
+    Compute the completion rate of a habit, or of all habits together, per day, week, month or year.
+
+    Every period of a habit belongs to the bucket its first day falls in. The rate of a bucket is the share of
+    the periods due in it (from the period the habit was created in, up to the last day) that have a check-in.
+
+    Parameters:
+    - db: Database connection, or a snapshot.Snapshot.
+    - name: Name of the habit, or None for all habits.
+    - grain: Size of the buckets: "day", "week", "month" or "year".
+    - start: First day as "YYYY-MM-DD".
+    - end: Last day as "YYYY-MM-DD".
+
+    Returns:
+    List of tuples of the first day of each bucket, the periods checked in, the periods due and the completion
+    rate in percent.
+    """
+    if grain not in GRAINS:
+        raise ValueError(f"Unknown grain '{grain}'; use one of {', '.join(GRAINS)}.")
+    import numpy as np
+    bucket_periodicity = GRAINS[grain]
+    first, last = date.fromisoformat(start), date.fromisoformat(end)
+    first_key = get_period_key(bucket_periodicity, start)
+    buckets = [get_period_start_of_key(bucket_periodicity, key)
+               for key in range(first_key, get_period_key(bucket_periodicity, end) + 1)]
+    ends = buckets[1:] + [last + timedelta(days=1)]
+
+    checked = np.zeros(len(buckets), dtype=np.int64)
+    for event_date, periodicity, count in get_check_in_counts(db, name, start, end):
+        period_start = get_period_start(periodicity, date.fromisoformat(event_date))
+        if period_start >= first:
+            checked[get_period_key(bucket_periodicity, period_start.isoformat()) - first_key] += count
+    due = count_due_periods(db, name, [max(bucket, first) for bucket in buckets],
+                            [min(bucket_end - timedelta(days=1), last) for bucket_end in ends])
+
+    column_names = (COMPLETION_RATE_HEADER, )
+    # Check-ins dated before their habit was created count as due periods too
+    rows = [(bucket.isoformat(), done, max(due_count, done), round(100 * done / max(due_count, done), 1))
+            for bucket, done, due_count in zip(buckets, checked.tolist(), due.tolist()) if due_count or done]
+    rows_with_header = column_names + tuple(rows)
+    if len(rows) > 0:
+        return rows_with_header
+    else:
+        raise ValueError("No habit found; Please add a habit first")
+
+
+@cached_by_habit
+def get_heatmap(db, name, start, end):
+    """
+    Count the check-ins of a habit, or of all habits, on every day between two dates, for print_heatmap.
+
+    Parameters:
+    - db: Database connection, or a snapshot.Snapshot.
+    - name: Name of the habit, or None for all habits.
+    - start: First day as "YYYY-MM-DD".
+    - end: Last day as "YYYY-MM-DD".
+
+    Returns:
+    List of tuples of a date and its number of check-ins, for the days with check-ins.
+    """
+    column_names = (("Date", "Check-ins"), )
+    totals = {}
+    for event_date, _, count in get_check_in_counts(db, name, start, end):
+        totals[event_date] = totals.get(event_date, 0) + count
+    rows = sorted(totals.items())
+    rows_with_header = column_names + tuple(rows)
+    if len(rows) > 0:
+        return rows_with_header
+    else:
+        raise ValueError("No check-in event found for given Habit.")
+
+
+def iter_all_habits_info(db, page_size=PAGE_SIZE):
+    """
+    Stream information for all habits from the habit_info table, one page at a time.
+
+    The header is HABIT_INFO_HEADER; it is not part of the pages.
+
+    Parameters:
+    - db: Database connection.
+    - page_size: Number of rows per page.
+
+    Yields:
+    Lists of tuples containing habit information.
+    """
+    cur = db.cursor()
+    cur.execute("SELECT habit, periodicity, description, creation_date, streak FROM habit_info")
+    yield from iter_pages(cur, page_size)
+
+
+def iter_event_logs_by_habit(db, name, page_size=PAGE_SIZE):
+    """
+    Stream the event logs of a specific habit from the event_log table, oldest first, one page at a time.
+
+    The header is EVENT_LOG_HEADER; it is not part of the pages.
+
+    Parameters:
+    - db: Database connection.
+    - name: Name of the habit.
+    - page_size: Number of rows per page.
+
+    Yields:
+    Lists of tuples containing event log information for the habit.
+    """
+    cur = db.cursor()
+    cur.execute("SELECT habit, streak, event_date FROM event_log WHERE habit = ? ORDER BY event_date", (name,))
+    yield from iter_pages(cur, page_size)
+
+
+def get_habit_info_widths(db):
+    """
+    Get the width of the widest value of every column of iter_all_habits_info, so print_stream can size a table
+    before its first page arrives.
+
+    Parameters:
+    - db: Database connection.
+
+    Returns:
+    List of column widths, in the order of HABIT_INFO_HEADER.
+
+    Raises:
+    - ValueError: If there are no habits.
+    """
+    cur = db.cursor()
+    cur.execute("""
+        SELECT max(length(habit)), max(length(periodicity)), max(length(description)),
+               max(length(creation_date)), max(length(streak))
+        FROM habit_info""")
+    widths = cur.fetchone()
+    if widths[0] is None:
+        raise ValueError("No habit information found; Please add a habit first")
+    return [width or 0 for width in widths]
+
+
+def get_event_log_widths(db, name):
+    """
+    Get the width of the widest value of every column of iter_event_logs_by_habit, so print_stream can size a
+    table before its first page arrives.
+
+    Parameters:
+    - db: Database connection.
+    - name: Name of the habit.
+
+    Returns:
+    List of column widths, in the order of EVENT_LOG_HEADER.
+
+    Raises:
+    - ValueError: If the habit has no check-ins.
+    """
+    cur = db.cursor()
+    cur.execute("""
+        SELECT max(length(habit)), max(length(streak)), max(length(event_date))
+        FROM event_log WHERE habit = ?""", (name,))
+    widths = cur.fetchone()
+    if widths[0] is None:
         raise ValueError("No check-in event found for given Habit.")
+    return [width or 0 for width in widths]
 
 
 def print_tabular(data, db):
@@ -165,6 +661,9 @@ def print_tabular(data, db):
         print("No data to display.")
         return
 
+    # Loaded on first use, so scripts that never print tables do not pay for it
+    from prettytable import PrettyTable
+
     # Create a PrettyTable instance
     table = PrettyTable()
     table.field_names = data[0]
@@ -174,3 +673,100 @@ def print_tabular(data, db):
         table.add_row(row)
 
     print(table)
+
+
+def print_stream(header, pages, out=None, widths=None):
+    """
+    Print tabular data as it arrives, without holding more than one page in memory.
+
+    Columns are as wide as their name and the widest value given in widths. Without widths, the first page sets
+    them, and a longer value on a later page is cut short, ending in "…", so the table stays aligned.
+
+    Parameters:
+    - header: Tuple of column names.
+    - pages: Iterable of pages, each a list of tuples.
+    - out: File to write to. Defaults to sys.stdout.
+    - widths: Width of the widest value of every column, e.g. from get_habit_info_widths.
+
+    Returns:
+    Number of rows printed.
+    """
+    out = sys.stdout if out is None else out
+    pages = iter(pages)
+    first_page = next(pages, None)
+    if not first_page:
+        print("No data to display.", file=out)
+        return 0
+
+    if widths is None:
+        widths = [0] * len(header)
+        for row in first_page:
+            widths = [max(width, len(str(value))) for width, value in zip(widths, row)]
+    widths = [max(width, len(str(name))) for width, name in zip(widths, header)]
+
+    def write_separator():
+        out.write("+" + "+".join("-" * (width + 2) for width in widths) + "+\n")
+
+    def fit(value, width):
+        value = str(value)
+        return value if len(value) <= width else value[:width - 1] + "…"
+
+    def write_row(row):
+        out.write("|" + "|".join(f" {fit(value, width).center(width)} " for value, width in zip(row, widths)) + "|\n")
+
+    write_separator()
+    write_row(header)
+    write_separator()
+    count = 0
+    page = first_page
+    while page:
+        for row in page:
+            write_row(row)
+        count += len(page)
+        page = next(pages, None)
+    write_separator()
+    return count
+
+
+def print_heatmap(data, start, end, out=None):
+    """
+    Print a calendar heatmap of check-ins: one column per week and one row per weekday, shaded by the number of
+    check-ins of the day relative to the busiest day.
+
+    Parameters:
+    - data: Rows from get_heatmap, header first.
+    - start: First day as "YYYY-MM-DD".
+    - end: Last day as "YYYY-MM-DD".
+    - out: File to write to. Defaults to sys.stdout.
+    """
+    out = sys.stdout if out is None else out
+    counts = dict(data[1:])
+    busiest = max(counts.values(), default=0)
+    first, last = date.fromisoformat(start), date.fromisoformat(end)
+    monday = get_period_start("weekly", first)
+    weeks = (last - monday).days // 7 + 1
+
+    # Month names above the week their first day falls in, where there is room
+    labels = [" "] * (weeks + 3)
+    for week in range(weeks):
+        day = monday + timedelta(days=7 * week)
+        month_start = (day + timedelta(days=6)).replace(day=1)
+        if week == 0 or day <= month_start <= day + timedelta(days=6):
+            name = (month_start if week else first).strftime("%b")
+            if all(label == " " for label in labels[max(week - 1, 0):week + 3]):
+                labels[week:week + 3] = name
+    out.write("    " + "".join(labels).rstrip() + "\n")
+
+    for weekday in range(7):
+        cells = []
+        for week in range(weeks):
+            day = monday + timedelta(days=7 * week + weekday)
+            count = counts.get(day.isoformat(), 0)
+            if not first <= day <= last:
+                cells.append(" ")
+            elif count == 0:
+                cells.append(HEATMAP_SHADES[0])
+            else:
+                cells.append(HEATMAP_SHADES[-(-count * (len(HEATMAP_SHADES) - 1) // busiest)])
+        out.write(date.fromordinal(weekday + 1).strftime("%a") + " " + "".join(cells).rstrip() + "\n")
+    out.write(f"    Less {' '.join(HEATMAP_SHADES)} More (busiest day: {busiest} check-ins)\n")
@@ -0,0 +1,6 @@
+"""
+Benchmarks for the Habit Tracker.
+
+Run a benchmark from the project folder, e.g.:
+    python -m benchmarks.bench_check_in
+"""
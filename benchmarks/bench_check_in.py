@@ -0,0 +1,82 @@
+"""
+Compare checking in many habits with Habit.check_in_many against looping over Habit.handle_streaks.
+
+Usage:
+    python -m benchmarks.bench_check_in [number of habits]
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from db import get_db, add_habit
+from habit import Habit
+
+
+def make_db(path, habit_names):
+    """
+    Create a database with one habit per name, cycling through all periodicities.
+
+    Parameters:
+    - path: Path of the database file.
+    - habit_names: Names of the habits to create.
+
+    Returns:
+    - sqlite3.Connection: Connection object to the new database.
+    """
+    db = get_db(path)
+    periodicities = ["daily", "weekly", "monthly", "yearly"]
+    for i, name in enumerate(habit_names):
+        add_habit(db, name, periodicities[i % 4], f"Benchmark habit {i}", "2023-01-01", 0)
+    return db
+
+
+def time_handle_streaks(db, habit_names):
+    """
+    Check in every habit with its own Habit.handle_streaks call.
+
+    Returns:
+    - float: Elapsed time in seconds.
+    """
+    start = time.perf_counter()
+    # handle_streaks prints a message for every habit
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name in habit_names:
+            Habit(name).handle_streaks(db)
+    return time.perf_counter() - start
+
+
+def time_check_in_many(db, habit_names):
+    """
+    Check in every habit with a single Habit.check_in_many call.
+
+    Returns:
+    - float: Elapsed time in seconds.
+    """
+    start = time.perf_counter()
+    Habit.check_in_many(db, habit_names)
+    return time.perf_counter() - start
+
+
+def main(count=200):
+    habit_names = [f"habit{i}" for i in range(count)]
+    with tempfile.TemporaryDirectory() as folder:
+        db = make_db(os.path.join(folder, "loop.db"), habit_names)
+        loop_time = time_handle_streaks(db, habit_names)
+        db.close()
+
+        db = make_db(os.path.join(folder, "batch.db"), habit_names)
+        batch_time = time_check_in_many(db, habit_names)
+        db.close()
+
+    print(f"Checking in {count} habits:")
+    print(f"  loop over handle_streaks: {loop_time * 1000:9.1f} ms")
+    print(f"  check_in_many:            {batch_time * 1000:9.1f} ms")
+    print(f"  speed-up:                 {loop_time / batch_time:9.1f}x")
+    print(f"  mean handle_streaks latency: {loop_time / count * 1000:6.2f} ms per check-in")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
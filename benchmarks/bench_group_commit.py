@@ -0,0 +1,57 @@
+"""
+Compare check-ins per second through Habit.add_event with a commit per check-in and with group commit.
+
+Usage:
+    python -m benchmarks.bench_group_commit [number of check-ins]
+
+Each mode runs with synchronous = NORMAL (the default, where a WAL commit does not wait for the disk) and with
+synchronous = FULL (where every commit is flushed to disk).
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_check_in import make_db
+from db import enable_group_commit
+from habit import Habit
+
+
+def time_add_event(path, habit_names, synchronous, group_commit):
+    """
+    Check in every habit once with Habit.add_event.
+
+    Returns:
+    - float: Elapsed time in seconds, including the commit of the last group.
+    """
+    db = make_db(path, habit_names)
+    db.execute(f"PRAGMA synchronous = {synchronous}")
+    if group_commit:
+        enable_group_commit(db)
+    start = time.perf_counter()
+    # add_event prints the new streak of every habit
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name in habit_names:
+            Habit(name).add_event(db)
+    db.close()
+    return time.perf_counter() - start
+
+
+def main(count=2000):
+    habit_names = [f"habit{i}" for i in range(count)]
+    print(f"Checking in {count} habits with Habit.add_event:")
+    with tempfile.TemporaryDirectory() as folder:
+        for synchronous in ("NORMAL", "FULL"):
+            times = {}
+            for group_commit in (False, True):
+                path = os.path.join(folder, f"{synchronous}-{group_commit}.db")
+                times[group_commit] = time_add_event(path, habit_names, synchronous, group_commit)
+                label = "group commit" if group_commit else "commit per check-in"
+                print(f"  synchronous={synchronous:6} {label:20} {count / times[group_commit]:9.0f} check-ins/s")
+            print(f"  synchronous={synchronous:6} {'speed-up':20} {times[False] / times[True]:9.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
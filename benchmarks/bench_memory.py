@@ -0,0 +1,85 @@
+"""
+Compare the memory used by check-in history loaded as event_log tuples and as a compact history.History, and by
+Habit objects with and without __slots__.
+
+Usage:
+    python -m benchmarks.bench_memory [number of events] [database]
+
+The database is generated (and kept) when it does not exist; by default it is benchmarks/data/memory-N.db.
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+from benchmarks.generate import generate
+from benchmarks.run import DATA_DIR
+from db import get_db
+from habit import Habit
+from history import History
+
+# Habits shared between the generated events
+HABIT_COUNT = 10_000
+
+
+class DictHabit(Habit):
+    """
+    A Habit whose attributes live in a __dict__, as before Habit had __slots__.
+    """
+
+
+def measure(function):
+    """
+    Call a function twice: once to time it, then once more to measure the memory held by its result and the
+    peak memory during the call, as tracing slows allocations down.
+
+    Returns:
+    - tuple: (result, bytes held, peak bytes, seconds).
+    """
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    del result
+    tracemalloc.start()
+    result = function()
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, held, peak, elapsed
+
+
+def report(label, count, held, peak, elapsed):
+    print(f"  {label:28} {held / 2 ** 20:9.1f} MiB {held / count:8.1f} B/item   peak {peak / 2 ** 20:9.1f} MiB"
+          f"   {elapsed:6.2f} s")
+
+
+def main(count=10_000_000, path=None):
+    path = path or os.path.join(DATA_DIR, f"memory-{count}.db")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        print(f"Generating {count} events into {path} ...", file=sys.stderr)
+        generate(path, HABIT_COUNT, count)
+    db = get_db(path)
+    events = db.execute("SELECT COUNT(*) FROM event_log").fetchone()[0]
+    print(f"History of {events} check-ins:")
+
+    rows, held, peak, elapsed = measure(
+        lambda: db.execute("SELECT habit, streak, event_date FROM event_log ORDER BY habit, event_date").fetchall())
+    report("event_log tuples", events, held, peak, elapsed)
+    del rows
+
+    history, held, peak, elapsed = measure(lambda: History.load(db))
+    report("history.History", events, held, peak, elapsed)
+    del history
+
+    print(f"{HABIT_COUNT} Habit objects:")
+    for cls in (DictHabit, Habit):
+        habits, held, peak, elapsed = measure(
+            lambda: [cls(f"habit{i:06d}", "daily", "Benchmark habit") for i in range(HABIT_COUNT)])
+        report(f"{cls.__name__} ({'__dict__' if cls is DictHabit else '__slots__'})", HABIT_COUNT, held, peak,
+               elapsed)
+        del habits
+    db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000, sys.argv[2] if len(sys.argv) > 2 else None)
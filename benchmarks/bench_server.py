@@ -0,0 +1,178 @@
+"""
+Load-test the HTTP/JSON server with concurrent keep-alive clients and report requests per second and latency.
+
+Usage:
+    python -m benchmarks.bench_server [--url http://127.0.0.1:8000] [--connections 16] [--requests 5000]
+                                      [--write-ratio 0.2] [--habits 100] [--workers 4]
+
+Without --url, a server is started on a temporary copy of a generated database with --habits habits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+from benchmarks.generate import generate
+
+# Check-ins per habit in the generated database
+EVENTS_PER_HABIT = 100
+
+
+async def request(reader, writer, method, path, body=None):
+    """
+    Send one request on a keep-alive connection and read the response.
+
+    Returns:
+    - tuple: (HTTP status, parsed JSON body).
+    """
+    data = json.dumps(body).encode() if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(data)}\r\n\r\n".encode()
+                 + data)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        if key.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(host, port, names, write_ratio, remaining, latencies, rng):
+    """
+    Send requests on one connection until the shared budget of requests is used up.
+
+    Parameters:
+    - remaining: One-element list with the number of requests left to send, shared by all clients.
+    - latencies: Dictionary of latency lists, in seconds, per request kind ("read" or "write").
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            name = rng.choice(names)
+            if rng.random() < write_ratio:
+                kind, method, path, body = "write", "POST", "/checkins", {"names": [name]}
+            else:
+                kind, method, body = "read", "GET", None
+                path = rng.choice([f"/habits/{name}", f"/habits/{name}/events", f"/habits/{name}/longest",
+                                   "/longest"])
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, method, path, body)
+            latencies[kind].append(time.perf_counter() - start)
+            if status >= 500:
+                raise RuntimeError(f"{method} {path} failed with {status}")
+    finally:
+        writer.close()
+
+
+async def load(host, port, connections, count, write_ratio, seed):
+    """
+    Run the load test.
+
+    Returns:
+    - tuple: (latencies per request kind, elapsed seconds).
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    _, response = await request(reader, writer, "GET", "/habits")
+    writer.close()
+    names = [row[0] for row in response["results"][0]["rows"]]
+    if not names:
+        raise SystemExit("The server has no habits to check in")
+
+    latencies = {"read": [], "write": []}
+    remaining = [count]
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, names, write_ratio, remaining, latencies, random.Random(seed + i))
+                           for i in range(connections)))
+    return latencies, time.perf_counter() - start
+
+
+def summarize(label, latencies, elapsed):
+    """
+    Print the throughput and latency percentiles of a list of latencies.
+    """
+    if not latencies:
+        return
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print(f"  {label:6} {len(latencies):7} requests {len(latencies) / elapsed:9.0f} req/s   "
+          f"p50 {cuts[49] * 1000:7.2f} ms   p99 {cuts[98] * 1000:7.2f} ms")
+
+
+def free_port():
+    """
+    Find a free TCP port on the loopback interface.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(path, port, workers):
+    """
+    Start server.py in a child process and wait until it accepts connections.
+
+    Returns:
+    - subprocess.Popen: The server process.
+    """
+    server = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server.py")
+    process = subprocess.Popen([sys.executable, server, "--db", path, "--port", str(port),
+                                "--workers", str(workers)], stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise SystemExit("The server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Habit Tracker HTTP/JSON server.")
+    parser.add_argument("--url", help="server to test; by default one is started on a generated database")
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="share of requests that are check-ins")
+    parser.add_argument("--habits", type=int, default=100, help="habits in the generated database")
+    parser.add_argument("--workers", type=int, default=4, help="reader threads of the started server")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        process = None
+        if args.url:
+            url = urlsplit(args.url)
+            host, port = url.hostname, url.port or 80
+        else:
+            path = os.path.join(folder, "server.db")
+            generate(path, args.habits, args.habits * EVENTS_PER_HABIT, args.seed)
+            host, port = "127.0.0.1", free_port()
+            process = start_server(path, port, args.workers)
+        try:
+            latencies, elapsed = asyncio.run(load(host, port, args.connections, args.requests, args.write_ratio,
+                                                  args.seed))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    print(f"{args.requests} requests on {args.connections} connections in {elapsed:.2f} s:")
+    summarize("all", latencies["read"] + latencies["write"], elapsed)
+    summarize("read", latencies["read"], elapsed)
+    summarize("write", latencies["write"], elapsed)
+
+
+if __name__ == "__main__":
+    main()
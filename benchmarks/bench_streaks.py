@@ -0,0 +1,78 @@
+"""
+Time the NumPy streak engine on synthetic check-in arrays and on the event_log of a generated database.
+
+Usage:
+    python -m benchmarks.bench_streaks [number of events] [number of habits] [scale of the database]
+"""
+import sys
+import time
+import numpy as np
+
+from benchmarks.run import get_database
+from db import get_db
+from streaks import compute_longest_streaks, compute_streaks, load_events, period_keys
+
+
+def time_arrays(event_count, habit_count):
+    rng = np.random.default_rng(42)
+    codes = rng.integers(0, 4, habit_count)
+    habit_ids = rng.integers(0, habit_count, event_count)
+    # Check-ins spread over about ten years, ordered by habit and day as load_events returns them
+    habit_ids = np.sort(habit_ids)
+    days = rng.integers(735000, 738650, event_count)
+    days = np.sort(habit_ids * 1_000_000 + days) % 1_000_000
+
+    start = time.perf_counter()
+    keys = period_keys(days, codes[habit_ids])
+    keys_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compute_streaks(habit_ids, keys, habit_count)
+    streaks_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compute_longest_streaks(habit_ids, keys, days, habit_count)
+    longest_time = time.perf_counter() - start
+
+    shuffle = rng.permutation(event_count)
+    start = time.perf_counter()
+    compute_streaks(habit_ids[shuffle], keys[shuffle], habit_count)
+    unordered_time = time.perf_counter() - start
+
+    print(f"{event_count} events over {habit_count} habits:")
+    print(f"  period keys:                 {keys_time * 1000:9.1f} ms")
+    print(f"  current/longest:             {streaks_time * 1000:9.1f} ms")
+    print(f"  current/longest (unordered): {unordered_time * 1000:9.1f} ms")
+    print(f"  longest with end days:       {longest_time * 1000:9.1f} ms")
+
+
+def time_event_log(scale):
+    db = get_db(get_database(scale, 0))
+    try:
+        start = time.perf_counter()
+        names, codes, habit_ids, days = load_events(db)
+        load_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        keys = period_keys(days, codes[habit_ids])
+        keys_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        compute_streaks(habit_ids, keys, len(names))
+        streaks_time = time.perf_counter() - start
+    finally:
+        db.close()
+
+    print(f"{len(days)} events of {len(names)} habits from event_log ({scale}):")
+    print(f"  load:                        {load_time * 1000:9.1f} ms")
+    print(f"  period keys:                 {keys_time * 1000:9.1f} ms")
+    print(f"  current/longest:             {streaks_time * 1000:9.1f} ms")
+
+
+def main(event_count=10_000_000, habit_count=100_000, scale="small"):
+    time_arrays(event_count, habit_count)
+    time_event_log(scale)
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]), *sys.argv[3:4])
@@ -0,0 +1,49 @@
+"""
+Measure the throughput of exporting check-ins to CSV and JSON Lines and importing them into a new database.
+
+Usage:
+    python -m benchmarks.bench_transfer [number of events]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.generate import generate
+from db import get_db
+import transfer
+
+# Habits shared between the generated events
+HABIT_COUNT = 1000
+
+
+def main(count=1_000_000):
+    with tempfile.TemporaryDirectory() as folder:
+        source = os.path.join(folder, "source.db")
+        generate(source, HABIT_COUNT, count)
+        db = get_db(source)
+        print(f"Moving {count} check-ins of {HABIT_COUNT} habits:")
+        for fmt in transfer.FORMATS:
+            habits_path = os.path.join(folder, f"habits.{fmt}")
+            events_path = os.path.join(folder, f"events.{fmt}")
+            with open(habits_path, "w", newline="") as file:
+                transfer.export_table(db, "habits", file, fmt)
+            start = time.perf_counter()
+            with open(events_path, "w", newline="") as file:
+                transfer.export_table(db, "events", file, fmt)
+            export_time = time.perf_counter() - start
+
+            target = get_db(os.path.join(folder, f"target-{fmt}.db"))
+            with open(habits_path, newline="") as file:
+                transfer.import_table(target, "habits", file, fmt)
+            with open(events_path, newline="") as file:
+                _, inserted, import_time = transfer.import_table(target, "events", file, fmt)
+            target.close()
+            size = os.path.getsize(events_path) / 2 ** 20
+            print(f"  {fmt:6} export: {export_time:6.2f} s {count / export_time:10.0f} rows/s   "
+                  f"import: {import_time:6.2f} s {inserted / import_time:10.0f} rows/s   file: {size:6.1f} MiB")
+        db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,166 @@
+"""
+Build synthetic Habit Tracker databases for benchmarking.
+
+Usage:
+    python -m benchmarks.generate SCALE [path] [--seed SEED]
+    python -m benchmarks.generate --habits 500 --events 200000 [path] [--seed SEED]
+"""
+import argparse
+import os
+import time
+from datetime import date
+import numpy as np
+
+from db import get_db, refresh_longest_streaks, commit
+from streaks import UNIX_EPOCH_ORDINAL
+
+# Named scales as (number of habits, number of event_log rows)
+SCALES = {
+    "tiny": (10, 1_000),
+    "small": (1_000, 100_000),
+    "medium": (100_000, 5_000_000),
+    "large": (100_000, 50_000_000),
+}
+
+# Share of habits per periodicity
+PERIODICITY_MIX = {"daily": 0.5, "weekly": 0.3, "monthly": 0.15, "yearly": 0.05}
+
+# Chance that a habit misses a period, per periodicity
+MISS_CHANCE = {"daily": 0.15, "weekly": 0.1, "monthly": 0.08, "yearly": 0.05}
+
+def key_to_ordinals(keys, periodicity, rng):
+    """
+    Pick a random day inside each period.
+
+    Parameters:
+    - keys: NumPy array of period keys (see db.get_period_key).
+    - periodicity: Periodicity of the keys.
+    - rng: NumPy random generator.
+
+    Returns:
+    - numpy.ndarray: Day ordinal of every key.
+    """
+    if periodicity == "daily":
+        return keys
+    elif periodicity == "weekly":
+        return keys * 7 + 1 + rng.integers(0, 7, len(keys))
+    elif periodicity == "monthly":
+        months = (keys - 1970 * 12).astype("datetime64[M]")
+        first_days = months.astype("datetime64[D]").astype(np.int64) + UNIX_EPOCH_ORDINAL
+        return first_days + rng.integers(0, 28, len(keys))
+    else:
+        years = (keys - 1970).astype("datetime64[Y]")
+        first_days = years.astype("datetime64[D]").astype(np.int64) + UNIX_EPOCH_ORDINAL
+        return first_days + rng.integers(0, 365, len(keys))
+
+
+def plan_habits(habit_count, event_count, rng):
+    """
+    Decide the periodicity and the number of check-ins of every habit.
+
+    Events are shared out in proportion to how many periods a habit has per year, so daily habits get long
+    histories and yearly habits short ones.
+
+    Returns:
+    - tuple: (list of periodicities, NumPy array of check-in counts).
+    """
+    names = list(PERIODICITY_MIX)
+    periodicities = list(rng.choice(names, habit_count, p=list(PERIODICITY_MIX.values())))
+    weights = np.array([{"daily": 365, "weekly": 52, "monthly": 12, "yearly": 1}[p] for p in periodicities], float)
+    weights *= rng.uniform(0.5, 1.5, habit_count)
+    counts = np.floor(weights / weights.sum() * event_count).astype(np.int64)
+    # Hand out what rounding left over, one event at a time to the habits with the most history
+    counts[np.argsort(-weights)[:event_count - counts.sum()]] += 1
+    return periodicities, counts
+
+
+def generate(path, habit_count, event_count, seed=0, today=None):
+    """
+    Create a database with habit_count habits and about event_count check-ins, reproducible from the seed.
+
+    Every habit gets a history of check-ins ending near today, with randomly missed periods, and the streak
+    columns are computed the way check-ins would have stored them.
+
+    Parameters:
+    - path: Path of the database file. It must not exist yet.
+    - habit_count: Number of habits.
+    - event_count: Number of event_log rows to aim for.
+    - seed: Seed of the random generator.
+    - today: Date the histories end at, as a datetime.date. Defaults to today.
+
+    Returns:
+    - int: Number of event_log rows written.
+    """
+    rng = np.random.default_rng(seed)
+    today = today if today is not None else date.today()
+    db = get_db(path)
+    db.execute("PRAGMA synchronous = OFF")
+    periodicities, counts = plan_habits(habit_count, event_count, rng)
+    names = [f"habit{i:06d}" for i in range(habit_count)]
+
+    cur = db.cursor()
+    written = 0
+    for i, (name, periodicity, count) in enumerate(zip(names, periodicities, counts)):
+        last_key = {
+            "daily": today.toordinal(),
+            "weekly": (today.toordinal() - 1) // 7,
+            "monthly": today.year * 12 + today.month - 1,
+            "yearly": today.year,
+        }[periodicity]
+        # Walk back from the last checked-in period; a step of more than one period is a missed period
+        steps = rng.geometric(1 - MISS_CHANCE[periodicity], count)
+        keys = np.sort(last_key - rng.integers(0, 3) - (np.cumsum(steps) - steps[:1]))
+        days = key_to_ordinals(keys, periodicity, rng)
+        days = np.minimum(days, today.toordinal())
+        # Streak of every check-in: its position within its run of consecutive periods
+        run_starts = np.ones(len(keys), dtype=bool)
+        run_starts[1:] = np.diff(keys) != 1
+        positions = np.arange(len(keys))
+        streaks = positions - np.maximum.accumulate(np.where(run_starts, positions, 0)) + 1
+        dates = (days - UNIX_EPOCH_ORDINAL).astype("datetime64[D]").astype(str)
+
+        creation = str(dates[0]) if count else today.isoformat()
+        current = int(streaks[-1]) if count else 0
+        cur.execute("INSERT INTO habit_info (habit, periodicity, description, creation_date, streak) "
+                    "VALUES (?, ?, ?, ?, ?)", (name, periodicity, f"Benchmark habit {i}", creation, current))
+        cur.executemany("""
+            INSERT INTO event_log (habit, streak, event_date, period_key) VALUES (?, ?, ?, ?)""",
+                        zip([name] * len(keys), streaks.tolist(), dates.tolist(), keys.tolist()))
+        written += len(keys)
+
+    refresh_longest_streaks(cur)
+    commit(db)
+    db.close()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a synthetic Habit Tracker database.")
+    parser.add_argument("scale", nargs="?", help=f"named scale: {', '.join(SCALES)}")
+    parser.add_argument("path", nargs="?", help="database file to create")
+    parser.add_argument("--habits", type=int, help="number of habits, overrides the scale")
+    parser.add_argument("--events", type=int, help="number of event_log rows, overrides the scale")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    # With --habits and --events the only positional argument is the path
+    if args.scale is not None and args.scale not in SCALES:
+        if args.path is not None or args.habits is None:
+            parser.error(f"unknown scale '{args.scale}'")
+        args.scale, args.path = None, args.scale
+
+    habit_count, event_count = SCALES.get(args.scale, (None, None))
+    habit_count = args.habits or habit_count
+    event_count = args.events if args.events is not None else event_count
+    if habit_count is None or event_count is None:
+        parser.error("give a scale or both --habits and --events")
+    path = args.path or f"bench-{habit_count}-{event_count}-{args.seed}.db"
+    if os.path.exists(path):
+        parser.error(f"{path} already exists")
+
+    start = time.perf_counter()
+    written = generate(path, habit_count, event_count, args.seed)
+    print(f"Wrote {habit_count} habits and {written} events to {path} in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
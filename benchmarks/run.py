@@ -0,0 +1,202 @@
+"""
+Time the Habit Tracker's check-in, analytics and rendering paths on a synthetic database and save the results as
+JSON, so runs on different commits can be compared.
+
+Usage:
+    python -m benchmarks.run [--scale SCALE] [--seed SEED] [--repeat N] [--output FILE]
+    python -m benchmarks.run --compare OLD.json NEW.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import analytics
+from benchmarks.generate import SCALES, generate
+from db import get_db, get_all_habits_as_choices
+from habit import Habit
+
+# Where generated databases and results are kept between runs
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# Number of habits checked in per handle_streaks measurement
+CHECK_IN_SAMPLE = 100
+
+
+def measure(function, repeat):
+    """
+    Call a function repeat times and summarize the elapsed times.
+
+    Returns:
+    - dict: Minimum, median and mean time in milliseconds, and the number of calls.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return {"min_ms": min(times), "median_ms": statistics.median(times), "mean_ms": statistics.mean(times),
+            "repeat": repeat}
+
+
+def uncached(function, *args):
+    """
+    Wrap an analytics function so that every call reaches the database instead of the analytics cache.
+    """
+    def call():
+        analytics.clear_cache()
+        try:
+            function(*args)
+        except ValueError:
+            pass
+    return call
+
+
+def get_database(scale, seed):
+    """
+    Get the path of the database for a scale and seed, generating it the first time.
+    """
+    habit_count, event_count = SCALES[scale]
+    path = os.path.join(DATA_DIR, f"{scale}-{seed}.db")
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        print(f"Generating {habit_count} habits and {event_count} events into {path} ...", file=sys.stderr)
+        generate(path, habit_count, event_count, seed)
+    return path
+
+
+def run(scale, seed, repeat):
+    """
+    Run every benchmark on the database of the given scale.
+
+    Check-ins write to the database, so the run works on a fresh copy of the generated database and each
+    handle_streaks measurement checks in a different sample of habits.
+
+    Returns:
+    - dict: Benchmark results keyed by name.
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "bench.db")
+        shutil.copyfile(get_database(scale, seed), path)
+        db = get_db(path)
+        try:
+            return run_on(db, repeat)
+        finally:
+            # Closed before the folder is removed, which fails on Windows while the file is open
+            db.close()
+
+
+def run_on(db, repeat):
+    """
+    Run every benchmark on an open database.
+
+    Returns:
+    - dict: Benchmark results keyed by name.
+    """
+    names = [row[0] for row in db.execute("SELECT habit FROM habit_info ORDER BY habit")]
+    name = db.execute("SELECT habit FROM event_log GROUP BY habit ORDER BY COUNT(*) DESC LIMIT 1").fetchone()[0]
+    periodicity = db.execute("SELECT periodicity FROM habit_info WHERE habit = ?", (name,)).fetchone()[0]
+    info = analytics.get_all_habits_info(db)
+    samples = iter([names[i:i + CHECK_IN_SAMPLE] for i in range(0, len(names), CHECK_IN_SAMPLE)])
+
+    def check_in_sample():
+        for habit_name in next(samples, names[:CHECK_IN_SAMPLE]):
+            Habit(habit_name).handle_streaks(db)
+
+    benchmarks = {
+        "get_all_habits": uncached(analytics.get_all_habits, db),
+        "get_all_habits_info": uncached(analytics.get_all_habits_info, db),
+        "get_all_habits_based_on_periodicity": uncached(analytics.get_all_habits_based_on_periodicity, db,
+                                                        periodicity),
+        "get_data_of_single_habit": uncached(analytics.get_data_of_single_habit, db, name),
+        "get_longest_streak_for_given_habit": uncached(analytics.get_longest_streak_for_given_habit, db, name),
+        "get_longest_streaks_of_all_habits": uncached(analytics.get_longest_streaks_of_all_habits, db),
+        "get_event_logs_by_habit": uncached(analytics.get_event_logs_by_habit, db, name),
+        "get_all_habits_as_choices": lambda: get_all_habits_as_choices(db),
+        "print_tabular(get_all_habits_info)": lambda: analytics.print_tabular(info, db),
+        f"handle_streaks x{CHECK_IN_SAMPLE}": check_in_sample,
+    }
+    results = {}
+    for bench_name, function in benchmarks.items():
+        # Keep the messages and tables printed by the code under test out of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            results[bench_name] = measure(function, repeat)
+        print(f"  {bench_name:45} {results[bench_name]['median_ms']:10.2f} ms", file=sys.stderr)
+    db.close()
+    return results
+
+
+def get_commit():
+    """
+    Get the current git commit, or None outside a git checkout.
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_path, new_path):
+    """
+    Print the median time of every benchmark in two result files and how it changed.
+    """
+    with open(old_path) as file:
+        old = json.load(file)
+    with open(new_path) as file:
+        new = json.load(file)
+    print(f"{'benchmark':45} {old['commit'] or 'old':>10} {new['commit'] or 'new':>10}   change")
+    for name, result in new["results"].items():
+        if name not in old["results"]:
+            continue
+        before = old["results"][name]["median_ms"]
+        after = result["median_ms"]
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"{name:45} {before:10.2f} {after:10.2f}   {change:+6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Habit Tracker.")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="result file, defaults to benchmarks/results/SCALE-COMMIT.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    print(f"Benchmarking scale '{args.scale}':", file=sys.stderr)
+    commit = get_commit()
+    report = {
+        "scale": args.scale,
+        "habits": SCALES[args.scale][0],
+        "events": SCALES[args.scale][1],
+        "seed": args.seed,
+        "commit": commit,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": run(args.scale, args.seed, args.repeat),
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{args.scale}-{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results saved to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
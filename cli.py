@@ -0,0 +1,475 @@
+"""
+Non-interactive Habit Tracker commands for scripts and cron jobs.
+
+Every command prints one JSON object per result on stdout. Examples:
+    python cli.py create coding --periodicity daily --description "Code for 30 minutes"
+    python cli.py checkin coding reading
+    python cli.py report longest
+    python cli.py report rates coding --grain week
+    python cli.py report due
+    python cli.py export events history.csv
+    python cli.py rebuild --all
+    python cli.py snapshot snapshots/today
+    python cli.py report heatmap --snapshot snapshots/today
+    python cli.py import events history.jsonl --chunk-size 100000
+    python cli.py --batch operations.txt
+    python cli.py --stats stats.json checkin coding
+    python cli.py --profile profiles report rates
+    python cli.py --users users/ --user alice checkin coding
+    python cli.py --users users/ --all-users report longest
+
+A batch file holds one command per line, in the same syntax as the command line; blank lines and lines
+starting with # are skipped. All commands of a batch run against one connection in a single transaction.
+"""
+import argparse
+import contextlib
+import json
+import os
+import shlex
+import sys
+import time
+from datetime import date
+
+import analytics
+import transfer
+from db import get_current_streak, get_db, is_habit_exists, rebuild_all_streaks, rebuild_streaks, transaction
+from habit import Habit, NOT_FOUND
+from profiling import PROFILE_ENV, CallProfiler, QueryStats, get_call_profiler, get_query_stats
+from shards import ShardRouter
+
+PERIODICITIES = ["daily", "weekly", "monthly", "yearly"]
+
+
+class CommandError(Exception):
+    """
+    Raised for a command that cannot be parsed or run.
+    """
+
+
+class CommandParser(argparse.ArgumentParser):
+    """
+    An argument parser that raises CommandError instead of exiting, so one bad batch line does not end the batch.
+    """
+
+    def error(self, message):
+        raise CommandError(message)
+
+
+def build_parser():
+    """
+    Build the parser for a single command.
+
+    Returns:
+    - CommandParser: Parser of the commands.
+    """
+    parser = CommandParser(prog="cli.py", add_help=False)
+    commands = parser.add_subparsers(dest="command", required=True, parser_class=CommandParser)
+
+    create = commands.add_parser("create", help="create a habit")
+    create.add_argument("name")
+    create.add_argument("--periodicity", choices=PERIODICITIES, required=True)
+    create.add_argument("--description", default="")
+
+    delete = commands.add_parser("delete", help="delete a habit and its check-ins")
+    delete.add_argument("name")
+
+    rename = commands.add_parser("rename", help="rename a habit")
+    rename.add_argument("name")
+    rename.add_argument("new_name")
+
+    describe = commands.add_parser("describe", help="change the description of a habit")
+    describe.add_argument("name")
+    describe.add_argument("description")
+
+    periodicity = commands.add_parser("periodicity", help="change the periodicity of a habit")
+    periodicity.add_argument("name")
+    periodicity.add_argument("periodicity", choices=PERIODICITIES)
+
+    rebuild = commands.add_parser("rebuild", help="recount the streaks of a habit, or of all habits, from the history")
+    rebuild.add_argument("name", nargs="?")
+    rebuild.add_argument("--all", action="store_true", help="rebuild every habit, a batch of habits at a time")
+
+    checkin = commands.add_parser("checkin", help="check in one or more habits")
+    checkin.add_argument("names", nargs="+")
+    checkin.add_argument("--date", help="date of the check-in as YYYY-MM-DD, defaults to today")
+
+    report = commands.add_parser("report", help="print an analytics report")
+    reports = report.add_subparsers(dest="report", required=True, parser_class=CommandParser)
+    reports.add_parser("habits", help="all currently tracked habits")
+    reports.add_parser("info", help="all currently tracked habits with information")
+    habit = reports.add_parser("habit", help="information of one habit")
+    habit.add_argument("name")
+    same_periodicity = reports.add_parser("periodicity", help="all habits with the same periodicity")
+    same_periodicity.add_argument("periodicity", choices=PERIODICITIES)
+    longest = reports.add_parser("longest", help="longest streak of all habits, or of one habit")
+    longest.add_argument("name", nargs="?")
+    events = reports.add_parser("events", help="check-in history of a habit")
+    events.add_argument("name")
+    rates = reports.add_parser("rates", help="completion rate of all habits, or of one habit, per period")
+    rates.add_argument("name", nargs="?")
+    rates.add_argument("--grain", choices=analytics.GRAINS, default="month")
+    heatmap = reports.add_parser("heatmap", help="check-ins per day of all habits, or of one habit")
+    heatmap.add_argument("name", nargs="?")
+    due = reports.add_parser("due", help="habits that are due, at risk of breaking their streak or overdue")
+    due.add_argument("--date", help="day to check as YYYY-MM-DD, defaults to today")
+    for report_parser in (rates, heatmap):
+        report_parser.add_argument("--start", help="first day as YYYY-MM-DD, defaults to a year before --end")
+        report_parser.add_argument("--end", help="last day as YYYY-MM-DD, defaults to today")
+    for report_parser in (longest, events, rates, heatmap):
+        report_parser.add_argument("--snapshot", metavar="DIR", help="read the check-ins from a snapshot instead "
+                                                                     "of the database")
+
+    export = commands.add_parser("export", help="write all habits or check-ins to a CSV or JSON Lines file")
+    export.add_argument("table", choices=transfer.TABLES)
+    export.add_argument("path")
+    export.add_argument("--format", choices=transfer.FORMATS, help="defaults to the file extension")
+
+    snapshot = commands.add_parser("snapshot", help="write a memory-mapped snapshot of all check-ins for reports")
+    snapshot.add_argument("path")
+
+    load = commands.add_parser("import", help="load habits or check-ins from a CSV or JSON Lines file")
+    load.add_argument("table", choices=transfer.TABLES)
+    load.add_argument("path")
+    load.add_argument("--format", choices=transfer.FORMATS, help="defaults to the file extension")
+    load.add_argument("--chunk-size", type=int, default=transfer.CHUNK_SIZE, help="rows per transaction")
+
+    commands.add_parser("stats", help="SQL statements run so far, per statement, db.py function and operation")
+    return parser
+
+
+def table(args, header, rows):
+    """
+    Build the result of a report.
+    """
+    return {"command": "report", "report": args.report, "header": list(header), "rows": [list(row) for row in rows]}
+
+
+def check_date(value):
+    """
+    Check a date given as YYYY-MM-DD, parsed the way check-ins parse theirs.
+
+    Raises:
+    - CommandError: If the date is not valid.
+    """
+    try:
+        date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise CommandError(f"invalid date '{value}', expected YYYY-MM-DD")
+    return value
+
+
+def run_report(db, args):
+    """
+    Run a report command.
+
+    Returns:
+    - list: Result objects.
+    """
+    if getattr(args, "snapshot", None) is not None:
+        # Imported here, as snapshot loads numpy, which takes longer than most commands take to run
+        from snapshot import Snapshot
+        try:
+            db = Snapshot.open(args.snapshot)
+        except OSError as error:
+            raise CommandError(f"cannot open snapshot: {error}")
+    # Checked here, as the reports below turn a ValueError into an empty result
+    if args.report == "due" and args.date is not None:
+        check_date(args.date)
+    try:
+        if args.report == "habits":
+            records = analytics.get_all_habits(db)
+        elif args.report == "info":
+            records = analytics.get_all_habits_info(db)
+        elif args.report == "habit":
+            records = analytics.get_data_of_single_habit(db, args.name.lower())
+        elif args.report == "periodicity":
+            records = analytics.get_all_habits_based_on_periodicity(db, args.periodicity)
+        elif args.report == "longest" and args.name is not None:
+            records = analytics.get_longest_streak_for_given_habit(db, args.name.lower())
+        elif args.report == "longest":
+            records = analytics.get_longest_streaks_of_all_habits(db)
+        elif args.report == "due":
+            records = analytics.get_due_habits(db, args.date or date.today().isoformat())
+        elif args.report in ("rates", "heatmap"):
+            start, end = analytics.get_report_window(args.end)
+            name = args.name.lower() if args.name is not None else None
+            if args.report == "rates":
+                records = analytics.get_completion_rates(db, name, args.grain, args.start or start, end)
+            else:
+                records = analytics.get_heatmap(db, name, args.start or start, end)
+        elif getattr(args, "snapshot", None) is not None:
+            records = analytics.get_event_logs_by_habit(db, args.name.lower())
+        else:
+            # Paged, so every row is converted as it arrives instead of being copied into a table first
+            rows = [row for page in analytics.iter_event_logs_by_habit(db, args.name.lower()) for row in page]
+            return [table(args, analytics.EVENT_LOG_HEADER if rows else (), rows)]
+    except ValueError:
+        records = ()
+    header = records[0] if records else ()
+    return [table(args, header, records[1:])]
+
+
+def report_progress(read, inserted, seconds):
+    """
+    Print the progress of an import to stderr.
+    """
+    print(f"{read} rows read, {inserted} inserted, {read / max(seconds, 1e-9):.0f} rows/s", file=sys.stderr)
+
+
+def run_transfer(db, args):
+    """
+    Run an export or import command.
+
+    Returns:
+    - list: Result objects.
+    """
+    fmt = args.format or transfer.get_format(args.path)
+    result = {"command": args.command, "table": args.table, "path": args.path}
+    try:
+        if args.command == "export":
+            start = time.perf_counter()
+            with open(args.path, "w", newline="") as file:
+                result["rows"] = transfer.export_table(db, args.table, file, fmt)
+            seconds = time.perf_counter() - start
+        else:
+            with open(args.path, newline="") as file:
+                result["rows"], result["inserted"], seconds = transfer.import_table(
+                    db, args.table, file, fmt, args.chunk_size, report_progress)
+    except OSError as error:
+        return [dict(result, ok=False, error=str(error))]
+    result.update(ok=True, seconds=round(seconds, 3), rows_per_second=round(result["rows"] / max(seconds, 1e-9)))
+    return [result]
+
+
+def run_command(db, args):
+    """
+    Run one parsed command with the Habit class and the analytics module.
+
+    Parameters:
+    - db: Database connection.
+    - args: Parsed command.
+
+    Returns:
+    - list: Result objects, one per habit for check-ins and one for every other command.
+    """
+    if args.command == "report":
+        return run_report(db, args)
+    if args.command in ("export", "import"):
+        return run_transfer(db, args)
+    if args.command == "snapshot":
+        from snapshot import write_snapshot
+        start = time.perf_counter()
+        count = write_snapshot(db, args.path)
+        return [{"command": "snapshot", "path": args.path, "ok": True, "events": count,
+                 "seconds": round(time.perf_counter() - start, 3)}]
+    if args.command == "stats":
+        stats = get_query_stats()
+        if stats is None:
+            raise CommandError("statistics are off, run with --stats FILE")
+        return [dict({"command": "stats", "ok": True}, **stats.to_dict())]
+    if args.command == "rebuild" and args.all == (args.name is not None):
+        raise CommandError("rebuild needs either a habit name or --all")
+    if args.command == "rebuild" and args.all:
+        start = time.perf_counter()
+        count = rebuild_all_streaks(db)
+        return [{"command": "rebuild", "ok": True, "habits": count,
+                 "seconds": round(time.perf_counter() - start, 3)}]
+    if args.command == "checkin":
+        return [{"command": "checkin", "habit": name, "outcome": outcome, "streak": streak}
+                for name, outcome, streak in Habit.check_in_many(db, [name.lower() for name in args.names],
+                                                                 args.date)]
+
+    name = args.name.lower()
+    result = {"command": args.command, "habit": name}
+    if args.command == "create":
+        result["ok"] = Habit(name, args.periodicity, args.description).create(db)
+        if not result["ok"]:
+            result["error"] = "habit already exists"
+        return [result]
+    if not is_habit_exists(db, name):
+        return [dict(result, ok=False, error=NOT_FOUND)]
+
+    habit = Habit(name)
+    if args.command == "delete":
+        habit.delete(db)
+        result["ok"] = True
+    elif args.command == "rename":
+        result["new_name"] = args.new_name.lower()
+        result["ok"] = habit.edit_name(db, result["new_name"])
+        if not result["ok"]:
+            result["error"] = "habit already exists"
+    elif args.command == "describe":
+        habit.edit_description(db, args.description)
+        result["ok"] = True
+    elif args.command == "periodicity":
+        habit.change_periodicity(db, args.periodicity)
+        result["ok"] = True
+    elif args.command == "rebuild":
+        rebuild_streaks(db, name)
+        result.update(ok=True, streak=get_current_streak(db, name))
+    return [result]
+
+
+def write_results(out, results):
+    """
+    Write results as JSON lines.
+
+    Returns:
+    - int: Number of results that failed, counting check-ins of habits that do not exist.
+    """
+    for result in results:
+        out.write(json.dumps(result) + "\n")
+    return sum(result.get("ok") is False or result.get("outcome") == NOT_FOUND for result in results)
+
+
+def run_line(db, parser, argv, out):
+    """
+    Parse and run one command, writing its results as JSON lines. A bad command produces an error result.
+
+    Returns:
+    - int: Number of results that failed.
+    """
+    try:
+        results = run_command(db, parser.parse_args(argv))
+    except (CommandError, ValueError) as error:
+        results = [{"command": argv[0] if argv else None, "ok": False, "error": str(error)}]
+    return write_results(out, results)
+
+
+def run_batch(db, lines, out):
+    """
+    Run a stream of commands, one per line, in a single transaction.
+
+    Parameters:
+    - db: Database connection.
+    - lines: Iterable of command lines.
+    - out: File the JSON results are written to.
+
+    Returns:
+    - tuple: (number of commands run, number of results that failed).
+    """
+    parser = build_parser()
+    count = failed = 0
+    with transaction(db):
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                argv = shlex.split(line)
+            except ValueError as error:
+                failed += write_results(out, [{"command": None, "ok": False, "error": str(error)}])
+                continue
+            failed += run_line(db, parser, argv, out)
+            count += 1
+    return count, failed
+
+
+def run_for_all_users(router, argv, out):
+    """
+    Run one command on the database of every user, in parallel, writing the results as JSON lines tagged with
+    the user id.
+
+    Parameters:
+    - router: ShardRouter of the user databases.
+    - argv: Command to run, as a list of arguments.
+    - out: File the JSON results are written to.
+
+    Returns:
+    - tuple: (number of users the command ran for, number of results that failed).
+    """
+    def run(db):
+        try:
+            return run_command(db, args)
+        except ValueError as error:
+            return [{"command": args.command, "ok": False, "error": str(error)}]
+
+    try:
+        args = build_parser().parse_args(argv)
+    except CommandError as error:
+        return 0, write_results(out, [{"command": argv[0] if argv else None, "ok": False, "error": str(error)}])
+    results = router.fan_out(run)
+    failed = 0
+    for user_id, user_results in results.items():
+        failed += write_results(out, [dict(result, user=user_id) for result in user_results])
+    return len(results), failed
+
+
+def main(argv=None):
+    """
+    Run the command line interface.
+
+    Parameters:
+    - argv: Command line arguments without the program name. Defaults to sys.argv[1:].
+
+    Returns:
+    - int: Exit status: 1 if any result failed, 0 otherwise.
+    """
+    # Without abbreviations, so that options of a command (like rebuild --all) are not taken for these
+    parser = argparse.ArgumentParser(description="Run Habit Tracker commands without the interactive menu.",
+                                     epilog="commands: create, delete, rename, describe, periodicity, checkin, "
+                                            "rebuild [NAME | --all], snapshot DIR, stats, "
+                                            "report {habits,info,habit,periodicity,longest,events,rates,heatmap,due}, "
+                                            "export {habits,events} FILE, import {habits,events} FILE",
+                                     allow_abbrev=False)
+    parser.add_argument("--db", default="main.db", help="database file (default: main.db)")
+    parser.add_argument("--batch", metavar="FILE", help="run the commands in FILE ('-' for stdin) in one "
+                                                         "transaction")
+    parser.add_argument("--users", metavar="DIR", help="directory of per-user databases, used instead of --db")
+    parser.add_argument("--user", help="user whose database the commands run on, with --users")
+    parser.add_argument("--all-users", action="store_true", help="run the command for every user, with --users")
+    parser.add_argument("--stats", metavar="FILE", help="count and time the SQL statements run, and write the "
+                                                        "statistics to FILE ('-' for stderr) as JSON at the end")
+    parser.add_argument("--profile", metavar="DIR", default=os.environ.get(PROFILE_ENV),
+                        help="profile every Habit method and analytics report run, each into a .pstats file in DIR "
+                             f"with a summary on stderr (default: ${PROFILE_ENV})")
+    args, command = parser.parse_known_args(argv)
+    if args.batch is None and not command:
+        parser.error("give a command or --batch FILE")
+    if args.users is not None and (args.user is None) == (not args.all_users):
+        parser.error("--users needs either --user or --all-users")
+    if args.users is None and (args.user is not None or args.all_users):
+        parser.error("--user and --all-users need --users")
+    if args.all_users and args.batch is not None:
+        parser.error("--all-users runs a single command, not a batch")
+
+    # Already collecting or profiling when started through main.py
+    stats = profiler = None
+    if args.stats is not None and get_query_stats() is None:
+        stats = QueryStats()
+        stats.install()
+    if args.profile and get_call_profiler() is None:
+        profiler = CallProfiler(args.profile)
+        profiler.install()
+
+    router = ShardRouter(args.users) if args.users is not None else None
+    out = sys.stdout
+    try:
+        # The Habit class prints messages for people; keep them out of the JSON output
+        with open(os.devnull, "w") as messages, contextlib.redirect_stdout(messages):
+            if args.all_users:
+                _, failed = run_for_all_users(router, command, out)
+            else:
+                with router.connect(args.user) if router else contextlib.nullcontext(get_db(args.db)) as db:
+                    if args.batch is None:
+                        failed = run_line(db, build_parser(), command, out)
+                    elif args.batch == "-":
+                        _, failed = run_batch(db, sys.stdin, out)
+                    else:
+                        with open(args.batch) as lines:
+                            _, failed = run_batch(db, lines, out)
+    finally:
+        if profiler is not None:
+            profiler.uninstall()
+        if stats is not None:
+            stats.uninstall()
+            stats.dump(args.stats)
+    if router is not None:
+        router.close()
+    out.flush()
+    # Scripts and cron jobs can tell that something failed without reading the results
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,30 +1,456 @@
+import atexit
+import contextlib
+import itertools
+import os
 import sqlite3
+import threading
+from datetime import date
 
+# Page cache size (in KiB) and memory-mapped I/O size (in bytes) applied to every new connection.
+# Both can be overridden per database when get_db opens it.
+CACHE_SIZE_KIB = 16384
+MMAP_SIZE = 256 * 1024 * 1024
 
-def get_db(name="main.db"):
+# Habits replayed per transaction by rebuild_all_streaks
+REBUILD_BATCH_SIZE = 1000
+
+# Bumped by every function that changes the database, so caches of query results can tell they are stale
+_write_generation = 0
+_generations = itertools.count(1)
+# Write generation of the last change to each habit, and of the last change that may have touched every habit
+_habit_generations = {}
+_all_habits_generation = 0
+
+# Functions called after every commit made through this module, see add_write_listener
+_write_listeners = []
+
+# Connections shared by the whole process, keyed by database path
+_connections = {}
+_connections_lock = threading.Lock()
+# Connections owned by a single thread, keyed by database path
+_thread_connections = threading.local()
+
+
+class ManagedConnection(sqlite3.Connection):
+    """
+    A SQLite connection handed out by get_db. Closing it removes it from the connection manager, so the next
+    get_db call for the same database opens a fresh connection.
+    """
+
+    # Depth of nested transaction() blocks; while above zero, commit() leaves committing to the outermost block
+    batch_depth = 0
+
+    # GroupCommit of the connection, if group commit is enabled
+    group_commit = None
+
+    # Names of the habits changed in the outermost transaction() block, or None if any habit may have changed
+    changed_habits = None
+
+    # PRAGMA data_version when note_other_writes last read it, or None before the first call
+    data_version = None
+
+    def close(self):
+        if self.group_commit is not None:
+            self.group_commit.stop()
+        with _connections_lock:
+            if _connections.get(self.key) is self:
+                del _connections[self.key]
+        per_thread = getattr(_thread_connections, "connections", {})
+        if per_thread.get(self.key) is self:
+            del per_thread[self.key]
+        # A new connection may reuse this one's identity, so nothing cached for it may survive
+        bump_write_generation()
+        super().close()
+
+
+def get_write_generation():
+    """
+    Get the current write generation. It changes whenever a function of this module changes the database.
+
+    Returns:
+    - int: The current write generation.
+    """
+    return _write_generation
+
+
+def get_habit_generation(name):
+    """
+    Get the write generation of the last change that may have touched a habit. A result about the habit alone
+    that was computed in this generation or a later one is still current.
+
+    Parameters:
+    - name (str): Name of the habit.
+
+    Returns:
+    - int: The write generation.
+    """
+    return max(_habit_generations.get(name, 0), _all_habits_generation)
+
+
+def bump_write_generation(habits=None):
+    """
+    Start a new write generation, marking every cached query result as stale.
+
+    Parameters:
+    - habits: Names of the habits that changed, so that cached results about other single habits stay current.
+              Defaults to all habits.
+    """
+    global _write_generation, _all_habits_generation
+    # next() on itertools.count is atomic, so concurrent writers never share a generation
+    generation = next(_generations)
+    if habits is None:
+        _all_habits_generation = generation
+        _habit_generations.clear()
+    else:
+        for name in habits:
+            _habit_generations[name] = generation
+    _write_generation = generation
+
+
+def add_write_listener(listener):
+    """
+    Call a function after every commit made through this module, in this process, with the key of the database
+    (see get_db) and the names of the habits that changed, or None if any habit may have changed.
+
+    The listener runs on the thread that committed, so it should only take note of the change and return.
+
+    Parameters:
+    - listener: The function.
+    """
+    _write_listeners.append(listener)
+
+
+def remove_write_listener(listener):
+    """
+    Stop calling a function added with add_write_listener.
+
+    Parameters:
+    - listener: The function.
+    """
+    _write_listeners.remove(listener)
+
+
+def notify_write_listeners(db, habits):
+    """
+    Tell the write listeners about a commit.
+
+    Parameters:
+    - db (sqlite3.Connection): Connection that committed.
+    - habits: Names of the habits that changed, or None if any habit may have changed.
+    """
+    for listener in list(_write_listeners):
+        listener(getattr(db, "key", None), habits)
+
+
+def note_other_writes(db):
+    """
+    Start a new write generation if another connection, e.g. of another process, committed to the database since
+    the last call for this connection. Commits through this module bump the generation themselves; this catches
+    the ones it never sees, at the cost of one cheap pragma.
+
+    Parameters:
+    - db (ManagedConnection): Connection object from get_db.
+    """
+    data_version = db.execute("PRAGMA data_version").fetchone()[0]
+    if data_version != db.data_version:
+        db.data_version = data_version
+        bump_write_generation()
+
+
+def note_changed_habits(db, habits):
+    """
+    Record the habits changed in the open transaction() block of a connection.
+
+    Parameters:
+    - db (ManagedConnection): Connection object from get_db.
+    - habits: Names of the changed habits, or None if any habit may have changed.
+    """
+    if habits is None:
+        db.changed_habits = None
+    elif db.changed_habits is not None:
+        db.changed_habits.update(habits)
+
+
+def commit(db, habits=None):
+    """
+    Commit the current transaction and start a new write generation.
+
+    Every function that changes the database commits through here. Inside a transaction() block the commit is
+    left to the end of the block, and with group commit enabled (see enable_group_commit) it is left to the next
+    group flush.
+
+    Parameters:
+    - db (sqlite3.Connection): Connection object to the database.
+    - habits: Names of the habits that changed. Defaults to all habits.
+    """
+    if getattr(db, "batch_depth", 0) == 0:
+        group = getattr(db, "group_commit", None)
+        if group is None:
+            db.commit()
+            if _write_listeners:
+                notify_write_listeners(db, habits)
+        else:
+            group.add(habits)
+    else:
+        note_changed_habits(db, habits)
+    bump_write_generation(habits)
+
+
+@contextlib.contextmanager
+def transaction(db, habits=None):
+    """
+    Run several functions of this module in a single transaction.
+
+    The transaction is committed when the outermost block ends and rolled back if it raises. Other threads
+    sharing the connection wait for the block to end before running a block of their own, and a group commit
+    flush never falls inside a block.
+
+    With group commit enabled, the outermost block runs in a savepoint of the group's open transaction, so a
+    block that raises rolls back only its own changes.
+
+    Parameters:
+    - db (ManagedConnection): Connection object from get_db.
+    - habits: Names of the habits the block changes, so that cached results about other habits stay current.
+              Defaults to all habits.
+    """
+    with db.lock:
+        savepoint = db.batch_depth == 0 and db.group_commit is not None
+        if savepoint:
+            if not db.in_transaction:
+                db.execute("BEGIN")
+            db.execute("SAVEPOINT batch")
+        if db.batch_depth == 0:
+            db.changed_habits = set()
+        note_changed_habits(db, habits)
+        db.batch_depth += 1
+        try:
+            yield db
+        except BaseException:
+            db.batch_depth -= 1
+            if savepoint:
+                db.execute("ROLLBACK TO batch")
+                db.execute("RELEASE batch")
+                bump_write_generation()
+            elif db.batch_depth == 0:
+                db.rollback()
+                bump_write_generation()
+            raise
+        db.batch_depth -= 1
+        if savepoint:
+            db.execute("RELEASE batch")
+        if db.batch_depth == 0:
+            commit(db, db.changed_habits)
+
+
+@contextlib.contextmanager
+def read_snapshot(db):
+    """
+    Run several queries on one consistent view of the database.
+
+    Outside a transaction, the block runs in a read transaction of its own, which is rolled back when it ends, so
+    every query in it sees the same rows, whatever other connections commit meanwhile. Inside a transaction the
+    queries already share its view. Other threads sharing the connection wait for the block to end, so none of
+    their writes falls into the read transaction and is rolled back with it.
+
+    Parameters:
+    - db (ManagedConnection): Connection object from get_db.
+    """
+    with db.lock:
+        own_transaction = not db.in_transaction
+        if own_transaction:
+            db.execute("BEGIN")
+        try:
+            yield db
+        finally:
+            if own_transaction:
+                db.rollback()
+
+
+class GroupCommit:
+    """
+    Write-behind commits for one connection: changes are committed in groups instead of one by one.
+
+    A group is committed once it holds max_events commits, or max_delay seconds after its first commit, whichever
+    comes first. A crash loses at most the uncommitted group, so max_delay bounds the window of lost changes.
+    Until a group is committed, other connections do not see its changes; the connection itself does.
+    """
+
+    def __init__(self, db, max_delay, max_events, flush_on_exit):
+        """
+        Initialize a GroupCommit.
+
+        Parameters:
+        - db (ManagedConnection): Connection whose commits are grouped.
+        - max_delay (float): Longest time in seconds a change waits for its commit.
+        - max_events (int): Number of commits collected in a group.
+        - flush_on_exit (bool): Commit the open group when the interpreter exits.
+        """
+        self.db = db
+        self.max_delay = max_delay
+        self.max_events = max_events
+        self.flush_on_exit = flush_on_exit
+        self.pending = 0
+        # Names of the habits changed in the open group, or None if any habit may have changed
+        self.changed_habits = set()
+        self.timer = None
+        if flush_on_exit:
+            atexit.register(self.flush)
+
+    def add(self, habits=None):
+        """
+        Count a commit, and commit the group if it is full. Called by commit() with the connection's changes made.
+
+        Parameters:
+        - habits: Names of the habits that changed. Defaults to all habits.
+        """
+        with self.db.lock:
+            self.pending += 1
+            if habits is None:
+                self.changed_habits = None
+            elif self.changed_habits is not None:
+                self.changed_habits.update(habits)
+            if self.pending >= self.max_events:
+                self.flush()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.max_delay, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        """
+        Commit the open group, if any.
+        """
+        with self.db.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if self.pending and self.db.batch_depth == 0:
+                self.db.commit()
+                self.pending = 0
+                # Caches of other connections may have read the state from before the group was committed
+                bump_write_generation(self.changed_habits)
+                if _write_listeners:
+                    notify_write_listeners(self.db, self.changed_habits)
+                self.changed_habits = set()
+
+    def stop(self):
+        """
+        Commit the open group and stop grouping commits.
+        """
+        self.flush()
+        if self.flush_on_exit:
+            atexit.unregister(self.flush)
+        self.db.group_commit = None
+
+
+def enable_group_commit(db, max_delay=0.05, max_events=1000, flush_on_exit=True):
+    """
+    Group the commits of a connection: every function of this module that changes the database then leaves its
+    changes in an open transaction, which is committed every max_events changes or max_delay seconds.
+
+    This trades durability for write throughput: without flush_on_exit, or if the process is killed, up to
+    max_delay seconds of changes are lost. Habit.add_event and the other check-in paths need no changes.
+
+    Parameters:
+    - db (ManagedConnection): Shared connection from get_db. Connections owned by one thread cannot be committed
+                              from the timer thread, and are refused.
+    - max_delay (float): Longest time in seconds a change waits for its commit.
+    - max_events (int): Number of changes committed together at most.
+    - flush_on_exit (bool): Commit the last group when the interpreter exits.
+
+    Returns:
+    - GroupCommit: The group commit of the connection.
+    """
+    if not getattr(db, "shared", False):
+        raise ValueError("group commit needs a connection shared between threads")
+    if db.group_commit is not None:
+        db.group_commit.stop()
+    db.group_commit = GroupCommit(db, max_delay, max_events, flush_on_exit)
+    return db.group_commit
+
+
+def disable_group_commit(db):
+    """
+    Commit the open group of a connection and go back to committing every change.
+
+    Parameters:
+    - db (ManagedConnection): Connection object from get_db.
+    """
+    if getattr(db, "group_commit", None) is not None:
+        db.group_commit.stop()
+
+
+def get_db(name="main.db", per_thread=False, cache_size=None, mmap_size=None):
     """
     Get a connection to the SQLite database with the specified name.
 
+    There is one shared connection per database per process; with per_thread set, each thread gets its own
+    connection instead. The schema is migrated and the pragmas are applied only when a connection is opened.
+
     Parameters:
     - name (str): Name of the SQLite database file.
+    - per_thread (bool): Return a connection owned by the calling thread instead of the shared one.
+    - cache_size (int): Page cache size in KiB, used when the connection is opened. Defaults to CACHE_SIZE_KIB.
+    - mmap_size (int): Memory-mapped I/O size in bytes, used when the connection is opened. Defaults to MMAP_SIZE.
 
     Returns:
     - sqlite3.Connection: Connection object to the database.
     """
-    db = sqlite3.connect(name)
-    create_tables(db)
+    key = name if name in ("", ":memory:") else os.path.abspath(name)
+    if per_thread:
+        if not hasattr(_thread_connections, "connections"):
+            _thread_connections.connections = {}
+        connections = _thread_connections.connections
+        if key not in connections:
+            connections[key] = open_db(name, key, True, cache_size, mmap_size)
+        return connections[key]
+
+    with _connections_lock:
+        if key not in _connections:
+            _connections[key] = open_db(name, key, False, cache_size, mmap_size)
+        return _connections[key]
+
+
+def open_db(name, key, check_same_thread, cache_size=None, mmap_size=None):
+    """
+    Open a new connection, migrate the schema and apply the connection pragmas.
+
+    Parameters:
+    - name (str): Name of the SQLite database file.
+    - key (str): Key of the connection in the connection manager.
+    - check_same_thread (bool): Only allow the creating thread to use the connection.
+    - cache_size (int): Page cache size in KiB. Defaults to CACHE_SIZE_KIB.
+    - mmap_size (int): Memory-mapped I/O size in bytes. Defaults to MMAP_SIZE.
+
+    Returns:
+    - sqlite3.Connection: Connection object to the database.
+    """
+    db = sqlite3.connect(name, factory=ManagedConnection, check_same_thread=check_same_thread)
+    db.key = key
+    db.shared = not check_same_thread
+    db.lock = threading.RLock()
+    db.create_function("period_key", 2, get_period_key, deterministic=True)
+    cache_size = CACHE_SIZE_KIB if cache_size is None else cache_size
+    mmap_size = MMAP_SIZE if mmap_size is None else mmap_size
+    db.execute("PRAGMA journal_mode = WAL")
+    db.execute("PRAGMA synchronous = NORMAL")
+    db.execute(f"PRAGMA cache_size = {-int(cache_size)}")
+    db.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+    migrate(db)
+    # Enabled after migrating, as older databases may hold events of habits that no longer exist
+    db.execute("PRAGMA foreign_keys = ON")
     return db
 
 
-def create_tables(db):
+def create_tables(cur):
     """
     Create tables in the database if they do not exist.
 
+    Databases created before schema versioning already have these tables, so this is safe to run on them.
+
     Parameters:
-    - db (sqlite3.Connection): Connection object to the database.
+    - cur (sqlite3.Cursor): Cursor of the database to migrate.
     """
-    cur = db.cursor()
-
     cur.execute("""
         CREATE TABLE IF NOT EXISTS habit_info (
             habit TEXT PRIMARY KEY , 
@@ -45,7 +471,230 @@ def create_tables(db):
             ON DELETE CASCADE
         )""")
 
-    db.commit()
+
+def index_event_log(cur):
+    """
+    Rebuild the event_log table with a rowid primary key and index it by habit and event date.
+
+    Parameters:
+    - cur (sqlite3.Cursor): Cursor of the database to migrate.
+    """
+    cur.execute("""
+        CREATE TABLE event_log_new (
+            id INTEGER PRIMARY KEY,
+            habit TEXT,
+            streak INT,
+            event_date DATE,
+            FOREIGN KEY (habit) 
+            REFERENCES habit_info (habit) 
+            ON UPDATE CASCADE 
+            ON DELETE CASCADE
+        )""")
+    cur.execute("""
+        INSERT INTO event_log_new (habit, streak, event_date)
+        SELECT habit, streak, event_date FROM event_log ORDER BY rowid""")
+    cur.execute("DROP TABLE event_log")
+    cur.execute("ALTER TABLE event_log_new RENAME TO event_log")
+    cur.execute("CREATE INDEX idx_event_log_habit_date ON event_log (habit, event_date)")
+
+
+def add_period_keys(cur):
+    """
+    Add a period_key column to the event_log table and make it unique per habit.
+
+    Only the first event of a habit in each period gets a key; later events in the same period keep a NULL key,
+    so they stay in the history without counting as check-ins.
+
+    Parameters:
+    - cur (sqlite3.Cursor): Cursor of the database to migrate.
+    """
+    cur.connection.create_function("period_key", 2, get_period_key, deterministic=True)
+    cur.execute("ALTER TABLE event_log ADD COLUMN period_key INTEGER")
+    cur.execute("""
+        UPDATE event_log
+        SET period_key = (SELECT period_key(h.periodicity, event_log.event_date)
+                          FROM habit_info h WHERE h.habit = event_log.habit)
+        WHERE id IN (SELECT MIN(e.id) FROM event_log e JOIN habit_info h ON h.habit = e.habit
+                     GROUP BY e.habit, period_key(h.periodicity, e.event_date))""")
+    cur.execute("CREATE UNIQUE INDEX idx_event_log_habit_period ON event_log (habit, period_key)")
+
+
+def refresh_longest_streaks(cur, name=None):
+    """
+    Recompute the longest streak of habits from their check-ins.
+
+    Consecutive period keys of a habit form a streak (gaps and islands: within a streak, period_key minus the
+    row number is constant). The longest streak and the date of its last check-in are stored on habit_info.
+
+    Parameters:
+    - cur (sqlite3.Cursor): Cursor of the database.
+    - name (str): Name of a single habit to refresh. Defaults to all habits.
+    """
+    cur.execute("""
+        UPDATE habit_info SET longest_streak = 0, longest_streak_end_date = NULL
+        WHERE ? IS NULL OR habit = ?""", (name, name))
+    cur.execute("""
+        WITH islands AS (
+            SELECT habit, event_date,
+                   period_key - ROW_NUMBER() OVER (PARTITION BY habit ORDER BY period_key) AS island
+            FROM event_log
+            WHERE period_key IS NOT NULL AND (? IS NULL OR habit = ?)
+        ), runs AS (
+            SELECT habit, COUNT(*) AS length, MAX(event_date) AS end_date,
+                   ROW_NUMBER() OVER (PARTITION BY habit ORDER BY COUNT(*) DESC, MAX(event_date) DESC) AS rank
+            FROM islands
+            GROUP BY habit, island
+        )
+        UPDATE habit_info SET longest_streak = runs.length, longest_streak_end_date = runs.end_date
+        FROM runs
+        WHERE runs.habit = habit_info.habit AND runs.rank = 1""", (name, name))
+
+
+def add_longest_streaks(cur):
+    """
+    Add the longest_streak and longest_streak_end_date columns to the habit_info table and fill them in.
+
+    Parameters:
+    - cur (sqlite3.Cursor): Cursor of the database to migrate.
+    """
+    cur.execute("ALTER TABLE habit_info ADD COLUMN longest_streak INT NOT NULL DEFAULT 0")
+    cur.execute("ALTER TABLE habit_info ADD COLUMN longest_streak_end_date TEXT")
+    refresh_longest_streaks(cur)
+
+
+def index_check_in_dates(cur):
+    """
+    Index the check-ins (events with a period key) by date and period key, for reports over a range of dates.
+
+    Parameters:
+    - cur (sqlite3.Cursor): Cursor of the database to migrate.
+    """
+    cur.execute("""
+        CREATE INDEX idx_event_log_date_period ON event_log (event_date, period_key)
+        WHERE period_key IS NOT NULL""")
+
+
+def add_due_dates(cur):
+    """
+    Add the next_due_date and breaks_after_date columns to the habit_info table, fill them in and index them.
+
+    Parameters:
+    - cur (sqlite3.Cursor): Cursor of the database to migrate.
+    """
+    cur.execute("ALTER TABLE habit_info ADD COLUMN next_due_date TEXT")
+    cur.execute("ALTER TABLE habit_info ADD COLUMN breaks_after_date TEXT")
+    refresh_due_dates(cur)
+    cur.execute("CREATE INDEX idx_habit_info_due ON habit_info (next_due_date, breaks_after_date)")
+
+
+# Schema migrations in order. Migration number i (counting from 1) upgrades a database from
+# user_version i - 1 to user_version i. Only append to this list; never change an existing entry.
+MIGRATIONS = [
+    create_tables,
+    index_event_log,
+    add_period_keys,
+    add_longest_streaks,
+    index_check_in_dates,
+    add_due_dates,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(db):
+    """
+    Bring the database schema up to date by running the migrations it has not run yet.
+
+    The schema version is stored in PRAGMA user_version, so each migration runs only once per database.
+    Every migration runs in its own transaction together with the version bump.
+
+    Parameters:
+    - db (sqlite3.Connection): Connection object to the database.
+    """
+    cur = db.cursor()
+    version = cur.execute("PRAGMA user_version").fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        cur.execute("BEGIN")
+        try:
+            migration(cur)
+            cur.execute(f"PRAGMA user_version = {number}")
+        except Exception:
+            db.rollback()
+            raise
+        commit(db)
+
+
+# Computes get_period_key(periodicity, date) inside SQLite for "YYYY-MM-DD" dates, without calling back into Python
+SQL_PERIOD_KEY = """
+    CASE {periodicity}
+        WHEN 'weekly' THEN (CAST(julianday({date}) - 1721424.5 AS INTEGER) - 1) / 7
+        WHEN 'monthly' THEN CAST(strftime('%Y', {date}) AS INTEGER) * 12 + CAST(strftime('%m', {date}) AS INTEGER) - 1
+        WHEN 'yearly' THEN CAST(strftime('%Y', {date}) AS INTEGER)
+        ELSE CAST(julianday({date}) - 1721424.5 AS INTEGER) END"""
+
+
+# First and last day of the period after the one holding a "YYYY-MM-DD" date: after a check-in on that date, the
+# habit is due again from the first day and its streak breaks after the last
+SQL_NEXT_PERIOD_START = """
+    CASE {periodicity} WHEN 'weekly' THEN date({date}, 'weekday 0', '+1 day')
+                       WHEN 'monthly' THEN date({date}, 'start of month', '+1 month')
+                       WHEN 'yearly' THEN date({date}, 'start of year', '+1 year')
+                       ELSE date({date}, '+1 day') END"""
+SQL_NEXT_PERIOD_END = """
+    CASE {periodicity} WHEN 'weekly' THEN date({date}, 'weekday 0', '+7 days')
+                       WHEN 'monthly' THEN date({date}, 'start of month', '+2 months', '-1 day')
+                       WHEN 'yearly' THEN date({date}, 'start of year', '+2 years', '-1 day')
+                       ELSE date({date}, '+1 day') END"""
+
+# Assignment of the due dates of a habit from its last check-in, found with one seek on the (habit, event_date)
+# index. A habit without check-ins is due from the day it was created and has no streak to break.
+_SET_DUE_DATES = f"""
+    (next_due_date, breaks_after_date) = (
+        SELECT COALESCE({SQL_NEXT_PERIOD_START.format(periodicity="habit_info.periodicity", date="last")},
+                        date(habit_info.creation_date)),
+               {SQL_NEXT_PERIOD_END.format(periodicity="habit_info.periodicity", date="last")}
+        FROM (SELECT MAX(event_date) AS last FROM event_log WHERE habit = habit_info.habit))"""
+_UPDATE_DUE_DATES = "UPDATE habit_info SET " + _SET_DUE_DATES
+
+
+def refresh_due_dates(cur, first=None, last=None):
+    """
+    Recompute when habits are next due and the last day they can be checked in without breaking their streak.
+
+    Parameters:
+    - cur (sqlite3.Cursor): Cursor of the database.
+    - first (str): Name of the first habit to refresh. Defaults to all habits.
+    - last (str): Name of the last habit to refresh, in sort order. Pass the same name twice for one habit.
+    """
+    if first is None:
+        cur.execute(_UPDATE_DUE_DATES)
+    else:
+        cur.execute(_UPDATE_DUE_DATES + " WHERE habit BETWEEN ? AND ?", (first, last))
+
+
+def get_period_key(periodicity, event_date):
+    """
+    Get the key of the period an event date falls in, so that consecutive periods have consecutive keys.
+
+    Daily keys are day ordinals, weekly keys count weeks from Monday to Sunday, monthly keys count months and
+    yearly keys are years. The function is also available in SQL as period_key(periodicity, event_date).
+
+    Parameters:
+    - periodicity (str): Periodicity of the habit (daily, weekly, monthly, yearly).
+    - event_date (str): Date of the event as "YYYY-MM-DD".
+
+    Returns:
+    - int: Key of the period.
+    """
+    day = date.fromisoformat(event_date)
+    if periodicity == "weekly":
+        return (day.toordinal() - 1) // 7
+    elif periodicity == "monthly":
+        return day.year * 12 + day.month - 1
+    elif periodicity == "yearly":
+        return day.year
+    else:
+        return day.toordinal()
 
 
 def add_habit(db, name, periodicity, description, creation_date, streak):
@@ -61,9 +710,10 @@ def add_habit(db, name, periodicity, description, creation_date, streak):
     - streak (int): Current streak of the habit.
     """
     cur = db.cursor()
-    cur.execute("INSERT INTO habit_info VALUES (?, ?, ?, ?, ?)",
-                (name, periodicity, description, creation_date, streak))
-    db.commit()
+    cur.execute("""
+        INSERT INTO habit_info (habit, periodicity, description, creation_date, streak, next_due_date)
+        VALUES (?, ?, ?, ?, ?, date(?))""", (name, periodicity, description, creation_date, streak, creation_date))
+    commit(db, (name,))
 
 
 def is_habit_exists(db, name):
@@ -93,7 +743,7 @@ def remove_habit(db, name):
     """
     cur = db.cursor()
     cur.execute("DELETE FROM habit_info WHERE habit = ?", (name,))
-    db.commit()
+    commit(db, (name,))
 
 
 def update_habit_name(db, old_name, new_name):
@@ -107,7 +757,7 @@ def update_habit_name(db, old_name, new_name):
     """
     cur = db.cursor()
     cur.execute("UPDATE habit_info SET habit = ? WHERE habit = ?", (new_name, old_name))
-    db.commit()
+    commit(db, (old_name, new_name))
 
 
 def update_description(db, name, new_description):
@@ -121,21 +771,139 @@ def update_description(db, name, new_description):
     """
     cur = db.cursor()
     cur.execute("UPDATE habit_info SET description = ? WHERE habit = ?", (new_description, name))
-    db.commit()
+    commit(db, (name,))
+
+
+def replay_streaks(cur, first, last):
+    """
+    Recompute the period keys and streaks of a range of habits from their event dates, under their current
+    periodicity.
+
+    The first event of each period gets the period key and later ones in the same period a NULL key, as when
+    the period_key column was added. Every event gets the streak it earns: its position in the run of
+    consecutive periods it belongs to (gaps and islands over the distinct periods, in one window pass). Only
+    events whose key or streak changes are written. The current streak of a habit becomes the streak of its
+    last check-in, and its longest streak and due dates are refreshed.
+
+    Parameters:
+    - cur (sqlite3.Cursor): Cursor of the database.
+    - first (str): Name of the first habit to replay.
+    - last (str): Name of the last habit to replay, in sort order. Pass the same name twice for one habit.
+    """
+    cur.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS replayed (id INTEGER PRIMARY KEY, period_key INT, streak INT, rekey INT)""")
+    cur.execute(f"""
+        INSERT INTO replayed (id, period_key, streak, rekey)
+        WITH periods AS (
+            SELECT e.id, e.habit, e.period_key AS old_key, e.streak AS old_streak,
+                   {SQL_PERIOD_KEY.format(periodicity="h.periodicity", date="e.event_date")} AS period
+            FROM event_log e JOIN habit_info h ON h.habit = e.habit
+            WHERE e.habit BETWEEN ? AND ?
+        ), islands AS (
+            SELECT id, habit, period, old_key, old_streak,
+                   period - DENSE_RANK() OVER (PARTITION BY habit ORDER BY period) AS island,
+                   ROW_NUMBER() OVER (PARTITION BY habit, period ORDER BY id) AS repeat
+            FROM periods
+        ), replayed AS (
+            SELECT id, old_key, old_streak, CASE WHEN repeat = 1 THEN period END AS period_key,
+                   DENSE_RANK() OVER (PARTITION BY habit, island ORDER BY period) AS streak
+            FROM islands
+        )
+        SELECT id, period_key, streak, period_key IS NOT old_key FROM replayed
+        WHERE period_key IS NOT old_key OR streak IS NOT old_streak""", (first, last))
+    # Clear the keys that change first, so the unique (habit, period_key) index never sees an old key next to
+    # a new one. The id IN (...) conditions make SQLite look the events up instead of scanning event_log.
+    cur.execute("UPDATE event_log SET period_key = NULL WHERE id IN (SELECT id FROM replayed WHERE rekey)")
+    cur.execute("""
+        UPDATE event_log SET period_key = replayed.period_key, streak = replayed.streak
+        FROM replayed
+        WHERE replayed.id = event_log.id AND event_log.id IN (SELECT id FROM replayed)""")
+    cur.execute("DELETE FROM replayed")
+    cur.execute("""
+        UPDATE habit_info SET streak = 0, longest_streak = 0, longest_streak_end_date = NULL
+        WHERE habit BETWEEN ? AND ?""", (first, last))
+    cur.execute("""
+        WITH ranked AS (
+            SELECT habit, streak, event_date,
+                   ROW_NUMBER() OVER (PARTITION BY habit ORDER BY period_key DESC) AS latest,
+                   ROW_NUMBER() OVER (PARTITION BY habit ORDER BY streak DESC, period_key DESC) AS best
+            FROM event_log
+            WHERE period_key IS NOT NULL AND habit BETWEEN ? AND ?
+        ), totals AS (
+            SELECT habit, MAX(CASE WHEN latest = 1 THEN streak END) AS current,
+                   MAX(CASE WHEN best = 1 THEN streak END) AS longest,
+                   MAX(CASE WHEN best = 1 THEN event_date END) AS longest_end_date
+            FROM ranked
+            GROUP BY habit
+        )
+        UPDATE habit_info
+        SET streak = totals.current, longest_streak = totals.longest, longest_streak_end_date = totals.longest_end_date
+        FROM totals
+        WHERE totals.habit = habit_info.habit""", (first, last))
+    refresh_due_dates(cur, first, last)
+
+
+def rebuild_streaks(db, name):
+    """
+    Recompute the period keys and streaks of a habit from its history (see replay_streaks).
+
+    Parameters:
+    - db (sqlite3.Connection): Connection object to the database.
+    - name (str): Name of the habit.
+    """
+    with transaction(db, (name,)):
+        replay_streaks(db.cursor(), name, name)
+
+
+def rebuild_all_streaks(db, batch_size=REBUILD_BATCH_SIZE, progress=None):
+    """
+    Recompute the period keys and streaks of every habit from its history (see replay_streaks).
+
+    Habits are replayed in batches of consecutive names, each in its own transaction, so memory use and the size
+    of a transaction stay bounded however many habits there are, and an interrupted rebuild keeps the batches
+    it finished.
+
+    Parameters:
+    - db (sqlite3.Connection): Connection object to the database.
+    - batch_size (int): Number of habits per batch.
+    - progress: Optional function called after every batch with the number of habits replayed so far.
+
+    Returns:
+    - int: Number of habits replayed.
+    """
+    cur = db.cursor()
+    count = 0
+    after = None
+    while True:
+        names = [row[0] for row in cur.execute(
+            "SELECT habit FROM habit_info WHERE ? IS NULL OR habit > ? ORDER BY habit LIMIT ?",
+            (after, after, batch_size))]
+        if not names:
+            return count
+        with transaction(db, names):
+            replay_streaks(cur, names[0], names[-1])
+        count += len(names)
+        after = names[-1]
+        if progress is not None:
+            progress(count)
 
 
 def update_periodicity(db, name, new_periodicity):
     """
     Update the periodicity of a habit in the habit_info table.
 
+    The history is replayed under the new periodicity, so the habit keeps the streaks its check-ins earn under
+    the new rule.
+
     Parameters:
     - db (sqlite3.Connection): Connection object to the database.
     - name (str): Name of the habit.
     - new_periodicity (str): New periodicity value for the habit.
     """
     cur = db.cursor()
-    cur.execute("UPDATE habit_info SET periodicity = ? WHERE habit = ?", (new_periodicity, name))
-    db.commit()
+    with transaction(db, (name,)):
+        cur.execute("UPDATE habit_info SET periodicity = ? WHERE habit = ?", (new_periodicity, name))
+        replay_streaks(cur, name, name)
 
 
 def reset_streak(db, name):
@@ -148,7 +916,7 @@ def reset_streak(db, name):
     """
     cur = db.cursor()
     cur.execute("UPDATE habit_info SET streak = ? WHERE habit = ?", (0, name))
-    db.commit()
+    commit(db, (name,))
 
 
 def get_current_streak(db, name):
@@ -172,6 +940,9 @@ def update_log(db, name, streak, event_date):
     """
     Update the event log with a new entry for a habit in the event_log table.
 
+    The period key of the entry is derived from the periodicity of the habit, the longest streak of the habit
+    is raised if the entry beats it, and its due dates are moved on.
+
     Parameters:
     - db (sqlite3.Connection): Connection object to the database.
     - name (str): Name of the habit.
@@ -179,8 +950,15 @@ def update_log(db, name, streak, event_date):
     - event_date (str): Date of the event.
     """
     cur = db.cursor()
-    cur.execute("INSERT INTO event_log VALUES (?, ?, ?)", (name, streak, event_date))
-    db.commit()
+    with transaction(db, (name,)):
+        cur.execute("""
+            INSERT INTO event_log (habit, streak, event_date, period_key)
+            SELECT habit, ?, ?, period_key(periodicity, ?) FROM habit_info WHERE habit = ?""",
+                    (streak, event_date, event_date, name))
+        cur.execute("""
+            UPDATE habit_info SET longest_streak = ?, longest_streak_end_date = ?
+            WHERE habit = ? AND longest_streak < ?""", (streak, event_date, name, streak))
+        refresh_due_dates(cur, name, name)
 
 
 def update_streak(db, name, streak):
@@ -194,7 +972,7 @@ def update_streak(db, name, streak):
     """
     cur = db.cursor()
     cur.execute("UPDATE habit_info SET streak = ? WHERE habit = ?", (streak, name))
-    db.commit()
+    commit(db, (name,))
 
 
 def get_last_update_date(db, name):
@@ -248,6 +1026,25 @@ def get_description(db, name):
     return desc[0]
 
 
+def iter_pages(cur, page_size):
+    """
+    Yield the rows of an executed query in pages, so only one page is in memory at a time.
+
+    Parameters:
+    - cur: Cursor of an executed query.
+    - page_size: Number of rows per page.
+
+    Yields:
+    Lists of at most page_size rows.
+    """
+    cur.arraysize = page_size
+    while True:
+        page = cur.fetchmany()
+        if not page:
+            return
+        yield page
+
+
 def get_all_habits_as_choices(db):
     """
     Retrieve a list of unique habit choices from the database.
@@ -262,3 +1059,114 @@ def get_all_habits_as_choices(db):
     cur.execute("SELECT habit FROM habit_info")
     data = cur.fetchall()
     return [i[0].capitalize() for i in set(data)] if len(data) > 0 else None
+
+
+def get_check_in_state(db, name):
+    """
+    Get everything a check-in needs to know about a habit with a single query.
+
+    Parameters:
+    - db (sqlite3.Connection): Connection object to the database.
+    - name (str): Name of the habit.
+
+    Returns:
+    - tuple or None: (periodicity, current streak, last period key), or None if the habit does not exist.
+                     The last period key is None if the habit has no check-ins.
+    """
+    cur = db.cursor()
+    cur.execute("""
+        SELECT h.periodicity, h.streak,
+               (SELECT MAX(e.period_key) FROM event_log e WHERE e.habit = h.habit)
+        FROM habit_info h
+        WHERE h.habit = ?""", (name,))
+    return cur.fetchone()
+
+
+def get_check_in_states(db, names):
+    """
+    Get the check-in state of several habits with a single query.
+
+    Parameters:
+    - db (sqlite3.Connection): Connection object to the database.
+    - names (list): Names of the habits.
+
+    Returns:
+    - dict: Maps each existing habit name to a tuple of (periodicity, current streak, last period key).
+            Habits that do not exist are left out.
+    """
+    names = list(set(names))
+    states = {}
+    cur = db.cursor()
+    # Keep each query well below SQLite's limit on the number of host parameters
+    for start in range(0, len(names), 500):
+        chunk = names[start:start + 500]
+        placeholders = ", ".join("?" * len(chunk))
+        cur.execute(f"""
+            SELECT h.habit, h.periodicity, h.streak, MAX(e.period_key)
+            FROM habit_info h
+            LEFT JOIN event_log e ON e.habit = h.habit
+            WHERE h.habit IN ({placeholders})
+            GROUP BY h.habit""", chunk)
+        for name, periodicity, streak, last_period_key in cur.fetchall():
+            states[name] = (periodicity, streak, last_period_key)
+    return states
+
+
+# Inserts a check-in unless the habit already has one in the same period
+_INSERT_CHECK_IN = """
+    INSERT OR IGNORE INTO event_log (habit, streak, event_date, period_key)
+    SELECT habit, ?, ?, period_key(periodicity, ?) FROM habit_info WHERE habit = ?"""
+
+# Sets the current streak of a habit to the streak of its check-in in the period of the given date, raises the
+# longest streak if the current one beats it and moves the due dates on
+_UPDATE_CHECK_IN_STREAK = f"""
+    UPDATE habit_info
+    SET streak = e.streak,
+        longest_streak = MAX(habit_info.longest_streak, e.streak),
+        longest_streak_end_date = CASE WHEN e.streak > habit_info.longest_streak THEN e.event_date
+                                       ELSE habit_info.longest_streak_end_date END,
+        {_SET_DUE_DATES}
+    FROM event_log e
+    WHERE e.habit = habit_info.habit AND e.period_key = period_key(habit_info.periodicity, ?)
+      AND habit_info.habit = ?"""
+
+
+def add_check_in(db, name, streak, event_date):
+    """
+    Check in a habit with a single INSERT OR IGNORE, in one transaction with the streak update.
+
+    The unique (habit, period_key) index rejects a second check-in in the same period, even when it comes from
+    another process. The current streak is then taken from whichever check-in holds the period, and the longest
+    streak and the due dates are kept up to date in the same transaction.
+
+    Parameters:
+    - db (sqlite3.Connection): Connection object to the database.
+    - name (str): Name of the habit.
+    - streak (int): Streak of the habit after the check-in.
+    - event_date (str): Date of the check-in.
+
+    Returns:
+    - bool: True if the check-in was added, False if the period was already checked in.
+    """
+    cur = db.cursor()
+    with transaction(db, (name,)):
+        cur.execute(_INSERT_CHECK_IN, (streak, event_date, event_date, name))
+        added = cur.rowcount == 1
+        cur.execute(_UPDATE_CHECK_IN_STREAK, (event_date, name))
+    return added
+
+
+def add_check_ins(db, events):
+    """
+    Write many check-ins in a single transaction.
+
+    Parameters:
+    - db (sqlite3.Connection): Connection object to the database.
+    - events (list): Tuples of (name, streak, event_date) to check in. A check-in in a period that is already
+                     checked in is ignored.
+    """
+    cur = db.cursor()
+    with transaction(db, {name for name, _, _ in events}):
+        cur.executemany(_INSERT_CHECK_IN,
+                        [(streak, event_date, event_date, name) for name, streak, event_date in events])
+        cur.executemany(_UPDATE_CHECK_IN_STREAK, [(event_date, name) for name, _, event_date in events])
@@ -1,12 +1,40 @@
 from datetime import datetime
 from db import *
 
+# Outcomes of a check-in
+CHECKED_IN = "checked_in"
+ALREADY_CHECKED_IN = "already_checked_in"
+STREAK_BROKEN = "streak_broken"
+NOT_FOUND = "not_found"
+
+
+def evaluate_check_in(last_period_key, period_key):
+    """
+    Decide what a check-in does, following the same rules as Habit.handle_streaks.
+
+    Parameters:
+    - last_period_key: Period key of the last check-in (see db.get_period_key), or None if there is none.
+    - period_key: Period key of the new check-in.
+
+    Returns:
+    - str: CHECKED_IN if this is the first check-in or the one right after the last period, ALREADY_CHECKED_IN
+           if this period (or a later one) is already checked in, STREAK_BROKEN if at least one period was missed.
+    """
+    if last_period_key is None or period_key - last_period_key == 1:
+        return CHECKED_IN
+    elif period_key <= last_period_key:
+        return ALREADY_CHECKED_IN
+    else:
+        return STREAK_BROKEN
+
 
 class Habit:
     """
         A class representing a habit with methods to manage and track habit-related information.
     """
 
+    __slots__ = ("name", "periodicity", "description", "creation_date", "streak")
+
     def __init__(self, name: str = None, periodicity: str = None, description: str = None):
         """
         Initialize a Habit object with specified attributes.
@@ -30,13 +58,17 @@ class Habit:
         - db: Database object.
 
         Prints a success message if the habit is created, or an error message if the habit name is already taken.
+
+        Returns:
+        - bool: True if the habit is created, False if the name is already taken.
         """
         if is_habit_exists(db, self.name) is False:
             add_habit(db, self.name, self.periodicity, self.description, self.creation_date, self.streak)
             print(f"\nNew habit '{self.name.capitalize()}' is created successfully.\n")
+            return True
         else:
             print("\nHabit name typed is already taken. Try new habit name.\n")
-        return
+            return False
 
     def delete(self, db):
         """
@@ -52,19 +84,24 @@ class Habit:
 
     def edit_name(self, db, new_name):
         """
-        Delete the habit from the database.
+        Rename the habit in the database.
 
         Parameters:
         - db: Database object.
+        - new_name: New name for the habit.
 
-        Prints a success message after deleting the habit.
+        Prints a success message after renaming the habit, or an error message if the new name is already taken.
+
+        Returns:
+        - bool: True if the habit is renamed, False if the new name is already taken.
         """
         if is_habit_exists(db, new_name) is False:
             update_habit_name(db, self.name, new_name)
             print(f"\nHabit name is changed successfully.\n")
+            return True
         else:
             print("\nHabit name typed is already taken. Try new habit name.\n")
-        return
+            return False
 
     def edit_description(self, db, new_description):
         """
@@ -87,10 +124,10 @@ class Habit:
         - db: Database object.
         - new_periodicity: New periodicity for the habit.
 
-        Resets the streak and prints a success message after changing the periodicity.
+        Replays the history under the new periodicity, keeping the streak the check-ins earn under it, and prints
+        a success message after changing the periodicity.
         """
         update_periodicity(db, self.name, new_periodicity)
-        reset_streak(db, self.name)
         print(f"\nPeriodicity for  '{self.name.capitalize()}' is changed to '{new_periodicity}'.\n")
         return
 
@@ -115,165 +152,106 @@ class Habit:
         Parameters:
         - db: Database object.
         """
-        self.increment_streak(db)
         current_date = datetime.now().strftime("%Y-%m-%d")
-        update_log(db, self.name, self.streak, current_date)
-        update_streak(db, self.name, self.streak)
+        with transaction(db, (self.name,)):
+            self.increment_streak(db)
+            add_check_in(db, self.name, self.streak, current_date)
         return
 
-    def handle_streaks(self, db):
-        """
-        Handle streaks based on the habit's periodicity.
-
-        Parameters:
-        - db: Database object.
-
-        Manages streaks based on different cases for daily, weekly, monthly, and yearly habits.
-        """
-        last_event_date = get_last_update_date(db, self.name)
-        # Case 01: No previous events recorded
-        if last_event_date is None:
-            self.add_event(db)
-        # Habit is set to be performed daily
-        elif get_periodicity(db, self.name) == "daily":
-            # Case 02: Checked in today
-            if self.get_day_difference(db) == 0:
-                print(f"\nYou have already checked the habit '{self.name.capitalize()}' today. You can check-in again "
-                      f"tomorrow.\n")
-            # Case 03: Checked in yesterday
-            elif self.get_day_difference(db) == 1:
-                self.add_event(db)
-            # Case 04: Previous streak broken
-            else:
-                update_streak(db, self.name, 1)
-                print(f"\nYour previous streak is broken. Here we go again. Current Streak for "
-                      f"habit '{self.name.capitalize()}' is 1.\n")
-        # Case 03: Habit is set to be performed weekly
-        elif get_periodicity(db, self.name) == "weekly":
-            days_to_complete_week = self.get_days_to_complete_week(db)
-            day_difference = self.get_day_difference(db)
-            next_possible_day = days_to_complete_week - day_difference + 1
-            # Case 05: Already checked for the entire week
-            if days_to_complete_week >= day_difference:
-                print(f"\nYou have already checked the habit '{self.name.capitalize()}' for this week. You can "
-                      f"check-in again in '{next_possible_day}' days.\n")
-            # Case 06: Checked in within the past week
-            elif days_to_complete_week < day_difference <= days_to_complete_week + 7:
-                self.add_event(db)
-            # Case 07: Previous streak broken
-            else:
-                update_streak(db, self.name, 1)
-                print(f"\nYour previous streak is broken. Here we go again. Current Streak for "
-                      f"habit '{self.name.capitalize()}' is 1.\n")
-        # Habit is set to be performed monthly
-        elif get_periodicity(db, self.name) == "monthly":
-            # Case 08: Already checked for the entire month
-            if self.get_month_difference(db) == 0:
-                print(f"\nYou have already checked the habit '{self.name.capitalize()}' for this month. "
-                      f"You can check-in again next month.\n")
-            # Case 09: Checked in within the past month
-            elif self.get_month_difference(db) == 1:
-                self.add_event(db)
-            # Case 10: Previous streak broken
-            else:
-                update_streak(db, self.name, 1)
-                print(f"\nYour previous streak is broken. Here we go again. Current Streak for "
-                      f"habit '{self.name.capitalize()}' is 1.\n")
-        # Habit is set to be performed yearly
-        elif get_periodicity(db, self.name) == "yearly":
-            # Case 11: Already checked for the entire year
-            if self.get_year_difference(db) == 0:
-                print(f"\nYou have already checked the habit '{self.name.capitalize()}' for this year. "
-                      f"You can check-in again next year.\n")
-            # Case 12: Checked in within the past year
-            elif self.get_year_difference(db) == 1:
-                self.add_event(db)
-            # Case13: Previous streak broken
-            else:
-                update_streak(db, self.name, 1)
-                print(f"\nYour previous streak is broken. Here we go again. Current Streak for "
-                      f"habit '{self.name.capitalize()}' is 1.\n")
-
-    def get_day_difference(self, db):
-        """
-        Calculate the difference in days between the last event date and the current date.
-
-        Parameters:
-        - db: Database object.
-
-        Returns:
-        - int: The difference in days or None if there is no last event date.
+    def check_in(self, db, date=None):
         """
-        last_event_date = get_last_update_date(db, self.name)
-        if last_event_date is not None:
-            last_event_date = datetime.strptime(last_event_date, "%Y-%m-%d")
-            current_date = datetime.now()
-            difference = current_date - last_event_date
-            return difference.days
-        else:
-            return None
+        Check in the habit based on its periodicity, without printing anything.
 
-    def get_days_to_complete_week(self, db):
-        """
-        Calculate the number of days left to complete the current week for a weekly habit.
+        The state of the habit is read with a single query and the decision is made on that snapshot by comparing
+        period keys. A check-in that changes something is one INSERT OR IGNORE plus the streak update, in one
+        transaction; the unique (habit, period_key) index rejects a concurrent check-in for the same period.
 
         Parameters:
         - db: Database object.
+        - date: Date of the check-in as "YYYY-MM-DD". Defaults to today.
 
         Returns:
-        - int: The number of days left in the week or None if there is no last event date.
+        - tuple: (outcome, streak) where outcome is CHECKED_IN, ALREADY_CHECKED_IN, STREAK_BROKEN or NOT_FOUND.
         """
-        last_event_date = get_last_update_date(db, self.name)
-        if last_event_date is not None:
-            last_event_date = datetime.strptime(last_event_date, "%Y-%m-%d")
-            # monday = 1, tuesday = 2 ...
-            day_of_week = last_event_date.weekday() + 1
-            days_to_complete_week = 7 - day_of_week
-            return days_to_complete_week
-        else:
-            return None
+        current_date = date if date is not None else datetime.now().strftime("%Y-%m-%d")
+        state = get_check_in_state(db, self.name)
+        if state is None:
+            return NOT_FOUND, None
+        periodicity, streak, last_period_key = state
+        outcome = evaluate_check_in(last_period_key, get_period_key(periodicity, current_date))
+        if outcome != ALREADY_CHECKED_IN:
+            streak = streak + 1 if outcome == CHECKED_IN else 1
+            if not add_check_in(db, self.name, streak, current_date):
+                # Another check-in took this period first
+                outcome = ALREADY_CHECKED_IN
+                streak = get_current_streak(db, self.name)
+        self.periodicity = periodicity
+        self.streak = streak
+        return outcome, streak
 
-    def get_month_difference(self, db):
+    def handle_streaks(self, db):
         """
-        Calculate the number of days left to complete the current week for a weekly habit.
+        Handle streaks based on the habit's periodicity.
 
         Parameters:
         - db: Database object.
 
-        Returns:
-        - int: The number of days left in the week or None if there is no last event date.
+        Manages streaks based on different cases for daily, weekly, monthly, and yearly habits.
         """
-        last_event_date = get_last_update_date(db, self.name)
-        if last_event_date is not None:
-            current_date = datetime.now().strftime("%Y-%m-%d")
-            year1, month1, day1 = last_event_date.split('-')
-            year2, month2, day2 = current_date.split('-')
-            month1_int = int(month1)
-            month2_int = int(month2)
-            year1_int = int(year1)
-            year2_int = int(year2)
-
-            month_difference = (year2_int - year1_int) * 12 + (month2_int - month1_int)
-
-            return month_difference
+        outcome, streak = self.check_in(db)
+        if outcome == CHECKED_IN:
+            print(f"\nYour current streak for the habit  '{self.name.capitalize()}' is '{streak}'.\n")
+        elif outcome == STREAK_BROKEN:
+            print(f"\nYour previous streak is broken. Here we go again. Current Streak for "
+                  f"habit '{self.name.capitalize()}' is 1.\n")
+        elif outcome == NOT_FOUND:
+            print(f"\nHabit '{self.name.capitalize()}' is not found.\n")
+        elif self.periodicity == "daily":
+            print(f"\nYou have already checked the habit '{self.name.capitalize()}' today. You can check-in again "
+                  f"tomorrow.\n")
+        elif self.periodicity == "weekly":
+            next_possible_day = 7 - datetime.now().weekday()
+            print(f"\nYou have already checked the habit '{self.name.capitalize()}' for this week. You can "
+                  f"check-in again in '{next_possible_day}' days.\n")
+        elif self.periodicity == "monthly":
+            print(f"\nYou have already checked the habit '{self.name.capitalize()}' for this month. "
+                  f"You can check-in again next month.\n")
         else:
-            return None
+            print(f"\nYou have already checked the habit '{self.name.capitalize()}' for this year. "
+                  f"You can check-in again next year.\n")
 
-    def get_year_difference(self, db):
+    @staticmethod
+    def check_in_many(db, names, date=None):
         """
-        Calculate the difference in years between the last event date and the current date.
+        Check in several habits at once, writing all changes in a single transaction.
 
         Parameters:
         - db: Database object.
+        - names: Names of the habits to check in.
+        - date: Date of the check-in as "YYYY-MM-DD". Defaults to today.
 
         Returns:
-        - int: The difference in years or None if there is no last event date.
+        - list: A tuple of (name, outcome, streak) for each name, in the given order. The outcome is one of
+                CHECKED_IN, ALREADY_CHECKED_IN, STREAK_BROKEN or NOT_FOUND; the streak is None for NOT_FOUND.
         """
-        last_event_date = get_last_update_date(db, self.name)
-        if last_event_date is not None:
-            last_event_date = datetime.strptime(last_event_date, "%Y-%m-%d")
-            current_date = datetime.now()
-            year_difference = current_date.year - last_event_date.year
-            return year_difference
-        else:
-            return None
+        current_date = date if date is not None else datetime.now().strftime("%Y-%m-%d")
+        states = get_check_in_states(db, names)
+        events = []
+        results = []
+        for name in names:
+            if name not in states:
+                results.append((name, NOT_FOUND, None))
+                continue
+            periodicity, streak, last_period_key = states[name]
+            period_key = get_period_key(periodicity, current_date)
+            outcome = evaluate_check_in(last_period_key, period_key)
+            if outcome != ALREADY_CHECKED_IN:
+                streak = streak + 1 if outcome == CHECKED_IN else 1
+                events.append((name, streak, current_date))
+                # Later occurrences of the same name see the outcome of this one
+                states[name] = (periodicity, streak, period_key)
+            results.append((name, outcome, streak))
+
+        if events:
+            add_check_ins(db, events)
+        return results
@@ -80,6 +80,30 @@ def prompt_list_of_habits():
         raise ValueError("No habit found. Please create a habit first to use this option.")
 
 
+def prompt_habit_or_all_habits():
+    """
+    Prompt the user to select a habit, or all habits together.
+
+    Returns:
+    - str: The selected habit name in lowercase, or None for all habits.
+    """
+    db = get_db()
+    habits_list = get_all_habits_as_choices(db) or []
+    choice = q.select("Please Select a Habit", choices=["All Habits"] + sorted(habits_list)).ask()
+    return None if choice == "All Habits" else choice.lower()
+
+
+def prompt_report_grain():
+    """
+    Prompt the user to select the period completion rates are reported per.
+
+    Returns:
+    - str: The selected period in lowercase (Day, Week, Month, Year).
+    """
+    return q.select("Please Select the Period to Report Per",
+                    choices=["Day", "Week", "Month", "Year"]).ask().lower()
+
+
 def prompt_habit_create_confirmation(habit_name):
     """
     Prompt the user to confirm the creation of a new habit.
@@ -113,7 +137,7 @@ def prompt_change_periodicity_confirmation():
     Returns:
     - bool: True if the user confirms, False otherwise.
     """
-    return q.confirm("Changing periodicity of a habit will reset the streak. Would you like to continue?").ask()
+    return q.confirm("Changing periodicity of a habit will recount its streak under the new periodicity. Would you like to continue?").ask()
 
 
 def prompt_edit_description_confirmation():
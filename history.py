@@ -0,0 +1,191 @@
+"""
+Compact in-memory check-in history.
+
+A check-in loaded as a (habit, streak, event_date) tuple costs over 200 bytes of Python objects. HabitHistory keeps
+the days and streaks of a habit in two array('i') columns instead, 8 bytes per check-in, and hands them to NumPy
+without copying when a report needs the period keys.
+"""
+import itertools
+from array import array
+from datetime import date
+import numpy as np
+
+from db import read_snapshot
+from streaks import PERIODICITY_CODES, SQL_DAY_ORDINAL, period_keys
+
+
+class HabitHistory:
+    """
+    Check-in history of one habit, ordered by date.
+
+    Days are stored as day ordinals (date.toordinal()), next to the streak recorded with every check-in.
+    """
+
+    __slots__ = ("name", "periodicity", "days", "streaks")
+
+    def __init__(self, name, periodicity, days=None, streaks=None):
+        """
+        Initialize a HabitHistory.
+
+        Parameters:
+        - name: Name of the habit.
+        - periodicity: Periodicity of the habit (daily, weekly, monthly, yearly).
+        - days: array('i') of day ordinals, or a read-only int32 NumPy array (see snapshot.Snapshot). Defaults to
+                an empty array.
+        - streaks: array('i') with the streak of every check-in, or an int32 NumPy array. Defaults to an empty
+                   array.
+        """
+        self.name = name
+        self.periodicity = periodicity
+        self.days = array("i") if days is None else days
+        self.streaks = array("i") if streaks is None else streaks
+
+    def __len__(self):
+        return len(self.days)
+
+    def append(self, event_date, streak):
+        """
+        Add a check-in after the last one.
+
+        Parameters:
+        - event_date: Date of the check-in as "YYYY-MM-DD".
+        - streak: Streak of the check-in.
+        """
+        self.days.append(date.fromisoformat(event_date).toordinal())
+        self.streaks.append(streak)
+
+    def rows(self):
+        """
+        Yield the check-ins as (habit, streak, event_date) tuples, like the rows of the event_log table.
+        """
+        for day, streak in zip(self.days.tolist(), self.streaks.tolist()):
+            yield self.name, streak, date.fromordinal(day).isoformat()
+
+    def period_keys(self):
+        """
+        Get the period key of every check-in (see db.get_period_key).
+
+        Returns:
+        - numpy.ndarray: Period keys as int64.
+        """
+        days = np.frombuffer(self.days, dtype=np.int32) if len(self.days) else np.empty(0, dtype=np.int32)
+        return period_keys(days, np.full(len(days), PERIODICITY_CODES.get(self.periodicity, 0)))
+
+    def longest_streak(self):
+        """
+        Find the longest run of consecutive periods with a check-in.
+
+        Repeated check-ins in the same period count once. Of runs of the same length, the latest wins.
+
+        Returns:
+        - tuple: (length of the run, date of its last check-in as "YYYY-MM-DD"), or (0, None) without check-ins.
+        """
+        keys = self.period_keys()
+        if len(keys) == 0:
+            return 0, None
+        # Keep the last check-in of every period, then split the periods into runs of consecutive keys
+        last = np.append(keys[1:] != keys[:-1], True)
+        positions = np.flatnonzero(last)
+        ends = np.append(np.flatnonzero(np.diff(keys[positions]) != 1), len(positions) - 1)
+        lengths = np.diff(np.append(-1, ends))
+        best = len(lengths) - 1 - int(np.argmax(lengths[::-1]))
+        return int(lengths[best]), date.fromordinal(int(self.days[positions[ends[best]]])).isoformat()
+
+    @property
+    def nbytes(self):
+        """
+        Number of bytes held by the day and streak arrays.
+        """
+        return (len(self.days) * self.days.itemsize) + (len(self.streaks) * self.streaks.itemsize)
+
+
+class History:
+    """
+    Check-in history of several habits, keyed by habit name.
+    """
+
+    __slots__ = ("habits",)
+
+    def __init__(self, habits=None):
+        """
+        Initialize a History.
+
+        Parameters:
+        - habits: Dictionary mapping habit names to HabitHistory objects. Defaults to an empty dictionary.
+        """
+        self.habits = {} if habits is None else habits
+
+    def __getitem__(self, name):
+        return self.habits[name]
+
+    def __contains__(self, name):
+        return name in self.habits
+
+    def __iter__(self):
+        return iter(self.habits.values())
+
+    def __len__(self):
+        return len(self.habits)
+
+    def longest_streaks(self):
+        """
+        Find the longest streak of every habit (see HabitHistory.longest_streak).
+
+        Returns:
+        - list: (habit name, length of the run, date of its last check-in) tuples.
+        """
+        return [(habit.name, *habit.longest_streak()) for habit in self]
+
+    @property
+    def event_count(self):
+        """
+        Number of check-ins of all habits.
+        """
+        return sum(len(habit) for habit in self.habits.values())
+
+    @property
+    def nbytes(self):
+        """
+        Number of bytes held by the arrays of all habits.
+        """
+        return sum(habit.nbytes for habit in self.habits.values())
+
+    @classmethod
+    def load(cls, db, name=None):
+        """
+        Load the check-in history of all habits, or of one habit, from the event_log table.
+
+        The rows are read as a flat stream of integers straight into one array, which is then cut into the
+        arrays of every habit, so no tuple per check-in is ever kept.
+
+        Parameters:
+        - db: Database connection.
+        - name: Optional name of a single habit.
+
+        Returns:
+        - History: The check-in history, including habits without check-ins.
+        """
+        habit_filter = "" if name is None else "WHERE habit = ?"
+        params = () if name is None else (name,)
+        day = SQL_DAY_ORDINAL.format("event_date")
+        # Both queries must see the same rows
+        with read_snapshot(db):
+            habits = db.execute(f"SELECT habit, periodicity FROM habit_info {habit_filter} ORDER BY habit",
+                                params).fetchall()
+            counts = db.execute(f"SELECT habit, COUNT(*) FROM event_log {habit_filter} GROUP BY habit ORDER BY habit",
+                                params).fetchall()
+            # Both queries walk the (habit, event_date) index, so the events come in the order of the counts
+            cur = db.execute(f"SELECT {day}, streak FROM event_log {habit_filter} ORDER BY habit, event_date, id",
+                             params)
+            pairs = array("i", itertools.chain.from_iterable(cur))
+
+        history = cls({habit: HabitHistory(habit, periodicity) for habit, periodicity in habits})
+        start = 0
+        for habit, count in counts:
+            end = start + 2 * count
+            # Events of habits that no longer exist are left out
+            if habit in history:
+                history[habit].days = pairs[start:end:2]
+                history[habit].streaks = pairs[start + 1:end:2]
+            start = end
+        return history
@@ -0,0 +1,324 @@
+"""
+The interactive menu of the Habit Tracker.
+
+Menus are data: MENUS maps the name of every menu to its prompt and its choices, in order. A choice either opens
+another menu or runs an action, a function of the database connection; after an action the main menu is shown again.
+run_menu walks this table in a flat loop, so a session of any length keeps one frame on the stack, and adding an
+action is one entry in the table.
+"""
+from datetime import date
+
+import questionary as q
+
+import analytics
+import helper
+from habit import Habit
+
+MAIN_MENU = "main"
+
+# State that ends the session
+EXIT = "exit"
+
+
+def ask(prompt, choices):
+    """
+    Ask the user to pick one of the choices with questionary.
+
+    Returns:
+    - str: The choice, or None if the prompt was cancelled.
+    """
+    return q.select(prompt, choices=choices).ask()
+
+
+def create_habit(db):
+    """
+    Ask for the details of a new habit and create it.
+    """
+    habit_name = helper.prompt_habit_name()
+    habit_periodicity = helper.prompt_habit_periodicity()
+    habit_description = helper.prompt_habit_description()
+    if helper.prompt_habit_create_confirmation(habit_name):
+        habit = Habit(habit_name, habit_periodicity, habit_description)
+        habit.create(db)
+    else:
+        print("\nHabit was not created\n")
+
+
+def delete_habit(db):
+    """
+    Ask for a habit and delete it.
+    """
+    try:
+        habit_name = helper.prompt_list_of_habits()
+    except ValueError:
+        print("\nNo habit found. Please create a habit first to use this option.\n")
+    else:
+        habit = Habit(habit_name)
+        if helper.prompt_habit_delete_confirmation(habit_name):
+            habit.delete(db)
+        else:
+            print("\nNo Changes were made\n")
+
+
+def edit_habit_name(db):
+    """
+    Ask for a habit and rename it.
+    """
+    try:
+        old_habit_name = helper.prompt_list_of_habits()
+    except ValueError:
+        print("\nNo habit found. Please create a habit first to use this option.\n")
+    else:
+        new_habit_name = helper.prompt_new_habit_name()
+        if helper.prompt_edit_habit_name_confirmation():
+            habit = Habit(old_habit_name)
+            habit.edit_name(db, new_habit_name)
+        else:
+            print(f"\nName of {old_habit_name} remains unchanged!\n")
+
+
+def edit_habit_periodicity(db):
+    """
+    Ask for a habit and change its periodicity.
+    """
+    try:
+        habit_name = helper.prompt_list_of_habits()
+    except ValueError:  # ValueError is raised when there are no habits in the database
+        print("\nNo Habit Found; Please add a habit first.\n")
+    else:
+        new_periodicity = helper.prompt_habit_periodicity()
+        if helper.prompt_change_periodicity_confirmation():
+            habit = Habit(habit_name)
+            habit.change_periodicity(db, new_periodicity)
+        else:
+            print(f"\nPeriodicity of {habit_name} remains unchanged!\n")
+
+
+def edit_habit_description(db):
+    """
+    Ask for a habit and change its description.
+    """
+    try:
+        habit_name = helper.prompt_list_of_habits()
+    except ValueError:
+        print("\nNo habit found. Please create a habit first to use this option.\n")
+    else:
+        new_description = helper.prompt_new_habit_description()
+        if helper.prompt_edit_description_confirmation():
+            habit = Habit(habit_name)
+            habit.edit_description(db, new_description)
+        else:
+            print(f"\nDescription of {habit_name} remains unchanged!\n")
+
+
+def check_in_habit(db):
+    """
+    Ask for a habit and check it in.
+    """
+    try:
+        habit_name = helper.prompt_list_of_habits()
+    except ValueError:
+        print("\nNo habit found. please add a habit first to complete it!\n")
+    else:
+        habit = Habit(habit_name)
+        habit.handle_streaks(db)
+
+
+def show_report(db, title, empty_message, report, *args):
+    """
+    Print a report as a table under its title, or a message if it has no rows.
+
+    Parameters:
+    - db: Database connection.
+    - title: Printed above the table.
+    - empty_message: Printed instead of the table when the report raises ValueError.
+    - report: Analytics function returning the records, called with the database and args.
+    """
+    try:
+        records = report(db, *args)
+    except ValueError:
+        print(empty_message)
+    else:
+        print(title)
+        analytics.print_tabular(records, db)
+
+
+def show_all_habits(db):
+    """
+    Print all currently tracked habits.
+    """
+    show_report(db, "\nList of all currently tracked habits:\n", "\nNo habit found; Please add a habit first\n",
+                analytics.get_all_habits)
+
+
+def show_all_habits_info(db):
+    """
+    Print all currently tracked habits with their information, a page at a time, so a long list is never held in
+    memory whole.
+    """
+    try:
+        widths = analytics.get_habit_info_widths(db)
+    except ValueError:
+        print("\nNo habit found; Please add a habit first\n")
+    else:
+        print("\nList of all currently tracked habits with information:\n")
+        analytics.print_stream(analytics.HABIT_INFO_HEADER, analytics.iter_all_habits_info(db), widths=widths)
+
+
+def show_habits_with_periodicity(db):
+    """
+    Ask for a periodicity and print the habits that have it.
+    """
+    periodicity = helper.prompt_habit_periodicity()
+    show_report(db, "\nList of all habits with the same periodicity:\n",
+                f"\nNo habit found with periodicity '{periodicity}'.\n",
+                analytics.get_all_habits_based_on_periodicity, periodicity)
+
+
+def show_longest_streaks(db):
+    """
+    Print the longest streak of every habit.
+    """
+    show_report(db, "Longest run streak of all defined habits:", "\nNo Check-in Events is Found.\n",
+                analytics.get_longest_streaks_of_all_habits)
+
+
+def show_longest_streak_of_habit(db):
+    """
+    Ask for a habit and print its longest streak.
+    """
+    try:
+        habit_name = helper.prompt_list_of_habits()
+    except ValueError:
+        print("\nNo habit found. please add a habit first to complete it!\n")
+    else:
+        show_report(db, "Longest run streak for a given habit:",
+                    f"\nNo Check-in Events is Found for the habit '{habit_name}'.\n",
+                    analytics.get_longest_streak_for_given_habit, habit_name)
+
+
+def show_event_logs_of_habit(db):
+    """
+    Ask for a habit and print its check-ins, oldest first, a page at a time.
+    """
+    try:
+        habit_name = helper.prompt_list_of_habits()
+    except ValueError:
+        print("\nNo habit found. please add a habit first to complete it!\n")
+        return
+    try:
+        widths = analytics.get_event_log_widths(db, habit_name)
+    except ValueError:
+        print(f"\nNo Check-in Events is Found for the habit '{habit_name}'.\n")
+    else:
+        print("Check-in history for a given habit:")
+        analytics.print_stream(analytics.EVENT_LOG_HEADER, analytics.iter_event_logs_by_habit(db, habit_name),
+                               widths=widths)
+
+
+def show_completion_rates(db):
+    """
+    Ask for a habit, or all habits, and a grain and print the completion rates of the last year.
+    """
+    habit_name = helper.prompt_habit_or_all_habits()
+    grain = helper.prompt_report_grain()
+    start, end = analytics.get_report_window()
+    show_report(db, f"\nCompletion rates per {grain} over the last year:\n",
+                "\nNo habit found; Please add a habit first\n",
+                analytics.get_completion_rates, habit_name, grain, start, end)
+
+
+def show_heatmap(db):
+    """
+    Ask for a habit, or all habits, and print a heatmap of the check-ins of the last year.
+    """
+    habit_name = helper.prompt_habit_or_all_habits()
+    start, end = analytics.get_report_window()
+    try:
+        records = analytics.get_heatmap(db, habit_name, start, end)
+    except ValueError:
+        print("\nNo Check-in Events is Found.\n")
+    else:
+        print("\nCheck-ins over the last year:\n")
+        analytics.print_heatmap(records, start, end)
+
+
+def show_due_habits(db):
+    """
+    Print the habits that are due, at risk or overdue today.
+    """
+    show_report(db, "\nHabits due today:\n", "\nNo habit is due today.\n",
+                analytics.get_due_habits, date.today().isoformat())
+
+
+def exit_tracker(db):
+    """
+    Say goodbye and end the session.
+    """
+    print("\nHave a Nice Day! Remember to check-in your habits.\n")
+    return EXIT
+
+
+# Name of every menu -> (prompt, {choice: name of the menu it opens, or the action it runs})
+MENUS = {
+    MAIN_MENU: ("Select an option below:", {
+        "Create New Habit": create_habit,
+        "Delete Existing Habit": delete_habit,
+        "Customize Habit Information": "customize",
+        "Check-in Habit": check_in_habit,
+        "Analytics": "analytics",
+        "Exit": exit_tracker,
+    }),
+    "customize": ("What would you like to Edit:", {
+        "Habit Name": edit_habit_name,
+        "Habit Periodicity": edit_habit_periodicity,
+        "Habit description": edit_habit_description,
+        "Back to Main Menu": MAIN_MENU,
+    }),
+    "analytics": ("What would you like to view:", {
+        "List of all currently tracked habits": show_all_habits,
+        "List of all currently tracked habits with information": show_all_habits_info,
+        "List of all habits with the same periodicity": show_habits_with_periodicity,
+        "Longest run streak of all defined habits": show_longest_streaks,
+        "Longest run streak for a given habit": show_longest_streak_of_habit,
+        "Check-in history for a given habit": show_event_logs_of_habit,
+        "Completion rates": show_completion_rates,
+        "Calendar heatmap": show_heatmap,
+        "Due and at-risk habits": show_due_habits,
+        "Back to Main Menu": MAIN_MENU,
+    }),
+}
+
+
+def run_menu(db, select=ask, profiler=None, menus=None):
+    """
+    Show the menus until Exit is chosen.
+
+    Parameters:
+    - db: Database connection.
+    - select: Function called with the prompt and the choices of a menu, returning the choice or None if the prompt
+              was cancelled. Defaults to asking the user.
+    - profiler: profiling.CallProfiler to run every action under, if any.
+    - menus: Menu table. Defaults to MENUS.
+
+    Returns:
+    - int: Number of choices made.
+    """
+    menus = MENUS if menus is None else menus
+    choices = {name: list(options) for name, (_, options) in menus.items()}
+    state = MAIN_MENU
+    count = 0
+    while state != EXIT:
+        prompt, options = menus[state]
+        target = options.get(select(prompt, choices[state]))
+        count += 1
+        if target is None:
+            # A cancelled prompt goes back to the main menu
+            state = MAIN_MENU
+        elif isinstance(target, str):
+            state = target
+        else:
+            if profiler is not None:
+                target = profiler.wrap(f"menu.{target.__name__}", target)
+            state = target(db) or MAIN_MENU
+    return count
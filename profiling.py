@@ -0,0 +1,555 @@
+import builtins
+import contextlib
+import functools
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+# Methods of habit.Habit and functions of analytics timed as high-level operations by QueryStats
+HABIT_OPERATIONS = ("create", "delete", "edit_name", "edit_description", "change_periodicity", "add_event",
+                    "check_in", "check_in_many")
+ANALYTICS_OPERATIONS = ("get_all_habits", "get_all_habits_info", "get_all_habits_based_on_periodicity",
+                        "get_data_of_single_habit", "get_longest_streak_for_given_habit",
+                        "get_longest_streaks_of_all_habits", "get_event_logs_by_habit", "get_due_habits",
+                        "get_completion_rates", "get_heatmap", "print_tabular", "print_stream")
+
+# Profiles of calls are written to this directory when the environment variable is set, as with --profile DIR
+PROFILE_ENV = "HABIT_TRACKER_PROFILE"
+
+# Functions listed in the summary of every profile
+PROFILE_TOP = 20
+
+# Connection methods replaced on every connection QueryStats watches
+_CONNECTION_HOOKS = ("query_stats", "cursor", "execute", "executemany", "commit")
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r"(?<![\w.])\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+_PARAMETERS = re.compile(r"[:@$][A-Za-z_]\w*|\?\d+")
+_NULLS = re.compile(r"\bNULL\b", re.IGNORECASE)
+_IN_LISTS = re.compile(r"\bIN \(\?(?:, \?)*\)", re.IGNORECASE)
+_SPACES = re.compile(r"\s+")
+
+# QueryStats installed by QueryStats.install, and CallProfiler installed by CallProfiler.install, if any
+_installed = None
+_profiler = None
+
+
+class ImportTimer:
+    """
+    Measures how long each module takes to import, by wrapping the built-in __import__ function.
+
+    Only the first import of a module is timed; later imports find it in sys.modules and cost nothing.
+    """
+
+    def __init__(self, start_time=None):
+        """
+        Initialize an ImportTimer.
+
+        Parameters:
+        - start_time: time.perf_counter() value the process started at. Defaults to now.
+        """
+        self.start_time = time.perf_counter() if start_time is None else start_time
+        # Module name -> [total seconds including nested imports, seconds of its own]
+        self.times = {}
+        self._stack = []
+        self._original_import = None
+
+    def install(self):
+        """
+        Start timing imports.
+        """
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+
+    def uninstall(self):
+        """
+        Stop timing imports.
+        """
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+        self._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            self.times.setdefault(name, [elapsed, elapsed - nested])
+
+    def report(self, milestone, file=None, limit=15):
+        """
+        Print the slowest imports and the time from the start of the process to a milestone.
+
+        Parameters:
+        - milestone: Name of the point reached, e.g. "time to first prompt".
+        - file: File to print to. Defaults to sys.stderr.
+        - limit: Number of modules to list.
+        """
+        file = sys.stderr if file is None else file
+        elapsed = time.perf_counter() - self.start_time
+        print(f"\n{'module':40} {'total ms':>10} {'self ms':>10}", file=file)
+        slowest = sorted(self.times.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        for name, (total, own) in slowest:
+            print(f"{name:40} {total * 1000:10.1f} {own * 1000:10.1f}", file=file)
+        imports = sum(own for _, own in self.times.values())
+        print(f"{len(self.times)} modules imported in {imports * 1000:.1f} ms", file=file)
+        print(f"{milestone}: {elapsed * 1000:.1f} ms\n", file=file)
+
+
+@functools.lru_cache(maxsize=4096)
+def normalize_sql(sql):
+    """
+    Reduce a SQL statement to its shape, so that every execution of it is counted together: literals and parameters
+    become ?, IN lists become IN (...) and whitespace is collapsed.
+
+    Parameters:
+    - sql (str): The statement, as written or with its parameters filled in.
+
+    Returns:
+    - str: The normalized statement.
+    """
+    sql = _STRINGS.sub("?", sql)
+    sql = _NULLS.sub("?", _NUMBERS.sub("?", _PARAMETERS.sub("?", sql)))
+    sql = _SPACES.sub(" ", sql).replace("( ", "(").replace(" )", ")").replace(" ,", ",").strip()
+    return _IN_LISTS.sub("IN (...)", sql)
+
+
+def patch_functions(wrappers):
+    """
+    Replace functions with wrappers wherever a loaded module binds them, including modules that imported them by
+    name. Modules imported later get the wrappers from the modules they import them from.
+
+    Parameters:
+    - wrappers: Dictionary of every original function to its wrapper.
+
+    Returns:
+    - list: (module, attribute, original) of every replacement, for restore_patches.
+    """
+    patches = []
+    for module in list(sys.modules.values()):
+        if module is None or module is sys.modules[__name__]:
+            continue
+        for attribute, value in list(getattr(module, "__dict__", {}).items()):
+            try:
+                wrapper = wrappers.get(value)
+            except TypeError:
+                # Unhashable value
+                continue
+            if wrapper is not None:
+                patches.append((module, attribute, value))
+                setattr(module, attribute, wrapper)
+    return patches
+
+
+def patch_methods(cls, names, wrap):
+    """
+    Replace methods of a class with wrappers; static methods stay static.
+
+    Parameters:
+    - cls: The class.
+    - names: Names of the methods.
+    - wrap: Function called with the name and the function of a method, returning its wrapper.
+
+    Returns:
+    - list: (class, name, original) of every replacement, for restore_patches.
+    """
+    patches = []
+    for name in names:
+        method = cls.__dict__[name]
+        if isinstance(method, staticmethod):
+            setattr(cls, name, staticmethod(wrap(name, method.__func__)))
+        else:
+            setattr(cls, name, wrap(name, method))
+        patches.append((cls, name, method))
+    return patches
+
+
+def restore_patches(patches):
+    """
+    Put back what patch_functions or patch_methods replaced.
+    """
+    for owner, attribute, original in reversed(patches):
+        setattr(owner, attribute, original)
+
+
+def get_query_stats():
+    """
+    Get the installed QueryStats, or None if no statistics are being collected.
+    """
+    return _installed
+
+
+class StatsCursor(sqlite3.Cursor):
+    """
+    A cursor that times its statements and counts the rows fetched from them, for QueryStats.
+    """
+
+    # Statement the cursor last executed
+    sql = None
+
+    def record(self, start, rows):
+        stats = getattr(self.connection, "query_stats", None)
+        if stats is not None:
+            stats.record(self.sql, time.perf_counter() - start, rows)
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        self.sql = sql
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.record(start, 0)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        self.sql = sql
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self.record(start, 0)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self.record(start, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self.record(start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self.record(start, len(rows))
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self.record(start, 0)
+            raise
+        self.record(start, 1)
+        return row
+
+
+class QueryStats:
+    """
+    Counts and times the SQL statements the Habit Tracker runs, per statement, per db.py function and per
+    high-level operation (the Habit methods in HABIT_OPERATIONS and the reports in ANALYTICS_OPERATIONS).
+
+    install() wraps those functions in timers. The first time a connection is passed to one of them, a trace
+    callback (sqlite3.Connection.set_trace_callback) is set on it, which counts every statement SQLite runs,
+    including the BEGIN and COMMIT the sqlite3 module adds, and its cursors are replaced by StatsCursor, which
+    times the statements and counts the rows fetched; the BEGIN the sqlite3 module adds is timed with the statement
+    that opens the transaction. Nothing is wrapped until install() is called, so the statistics cost nothing when
+    they are off.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty QueryStats.
+        """
+        # Normalized statement -> [executions, seconds, rows fetched]
+        self.statements = {}
+        # "db.<function>" -> [calls, seconds, statements, rows fetched]
+        self.functions = {}
+        # "Habit.<method>" or "analytics.<function>" -> [calls, seconds, statements, rows fetched]
+        self.operations = {}
+        self.lock = threading.Lock()
+        # Records of the functions and operations running in each thread, which its statements count towards
+        self.local = threading.local()
+        self.connections = []
+        # (owner, attribute, original value) of everything install() replaced
+        self.patches = []
+        self.installed = False
+
+    def active(self):
+        if not hasattr(self.local, "records"):
+            self.local.records = []
+        return self.local.records
+
+    def trace(self, sql):
+        """
+        Trace callback: count one execution of a statement.
+        """
+        if not self.installed:
+            return
+        key = normalize_sql(sql)
+        with self.lock:
+            self.statements.setdefault(key, [0, 0.0, 0])[0] += 1
+            for record in self.active():
+                record[2] += 1
+
+    def record(self, sql, seconds, rows):
+        """
+        Add time spent on a statement and rows fetched from it.
+        """
+        if not self.installed:
+            return
+        with self.lock:
+            record = self.statements.setdefault(normalize_sql(sql), [0, 0.0, 0])
+            record[1] += seconds
+            record[2] += rows
+            if rows:
+                for record in self.active():
+                    record[3] += rows
+
+    def watch(self, db):
+        """
+        Start counting the statements of a connection, or of the connection of a cursor. Anything else is ignored.
+        """
+        if isinstance(db, sqlite3.Cursor):
+            db = db.connection
+        if not isinstance(db, sqlite3.Connection) or not hasattr(db, "__dict__") or \
+                db.__dict__.get("query_stats") is self:
+            return
+        commit = db.commit
+
+        def timed_commit():
+            start = time.perf_counter()
+            in_transaction = db.in_transaction
+            commit()
+            if in_transaction:
+                self.record("COMMIT", time.perf_counter() - start, 0)
+
+        db.set_trace_callback(self.trace)
+        db.query_stats = self
+        db.cursor = functools.partial(sqlite3.Connection.cursor, db, StatsCursor)
+        db.execute = lambda sql, parameters=(): db.cursor().execute(sql, parameters)
+        db.executemany = lambda sql, seq_of_parameters: db.cursor().executemany(sql, seq_of_parameters)
+        db.commit = timed_commit
+        self.connections.append(db)
+
+    def wrap(self, name, function, table):
+        """
+        Wrap a function in a timer that adds its calls to a table.
+        """
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not self.installed:
+                return function(*args, **kwargs)
+            for arg in args[:2]:
+                self.watch(arg)
+            with self.lock:
+                record = table.setdefault(name, [0, 0.0, 0, 0])
+            active = self.active()
+            active.append(record)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                active.pop()
+                with self.lock:
+                    record[0] += 1
+                    record[1] += seconds
+        return wrapper
+
+    def install(self):
+        """
+        Start collecting statistics: wrap the db.py functions that take a connection or cursor, and the operations.
+        Modules that imported these functions by name get the wrapped ones too.
+        """
+        global _installed
+        import inspect
+        import analytics
+        import db
+        from habit import Habit
+
+        wrappers = {}
+        for name, function in vars(db).items():
+            if inspect.isfunction(function) and function.__module__ == "db" and not name.startswith("_") and \
+                    not inspect.isgeneratorfunction(inspect.unwrap(function)) and \
+                    list(inspect.signature(function).parameters)[:1] in (["db"], ["cur"]):
+                wrappers[function] = self.wrap(f"db.{name}", function, self.functions)
+        for name in ANALYTICS_OPERATIONS:
+            function = getattr(analytics, name)
+            wrappers[function] = self.wrap(f"analytics.{name}", function, self.operations)
+        self.patches = patch_functions(wrappers)
+        self.patches += patch_methods(Habit, HABIT_OPERATIONS,
+                                      lambda name, function: self.wrap(f"Habit.{name}", function, self.operations))
+        self.installed = True
+        _installed = self
+
+    def uninstall(self):
+        """
+        Stop collecting statistics and put the original functions and connection methods back.
+        """
+        global _installed
+        self.installed = False
+        restore_patches(self.patches)
+        self.patches = []
+        for db in self.connections:
+            # Closed connections, and those of other threads, keep the trace callback; it ignores everything now
+            with contextlib.suppress(sqlite3.ProgrammingError):
+                db.set_trace_callback(None)
+            for name in _CONNECTION_HOOKS:
+                db.__dict__.pop(name, None)
+        self.connections = []
+        if _installed is self:
+            _installed = None
+
+    def to_dict(self):
+        """
+        Get the statistics, slowest first.
+
+        Returns:
+        - dict: Lists of statements, db.py functions and operations, each with its calls, total seconds, mean
+                milliseconds and rows fetched; functions and operations also count the statements they ran.
+        """
+        def entries(table, key):
+            items = sorted(table.items(), key=lambda item: item[1][1], reverse=True)
+            return [dict({key: name, "calls": record[0], "seconds": round(record[1], 6),
+                          "mean_ms": round(record[1] * 1000 / record[0], 3) if record[0] else None},
+                         **({"rows": record[2]} if len(record) == 3 else
+                            {"statements": record[2], "rows": record[3]}))
+                    for name, record in items]
+
+        with self.lock:
+            return {"statements": entries(self.statements, "sql"),
+                    "functions": entries(self.functions, "name"),
+                    "operations": entries(self.operations, "name")}
+
+    def dump(self, path):
+        """
+        Write the statistics as JSON to a file, or to stderr if path is "-".
+        """
+        if path == "-":
+            json.dump(self.to_dict(), sys.stderr, indent=2)
+            print(file=sys.stderr)
+        else:
+            with open(path, "w") as file:
+                json.dump(self.to_dict(), file, indent=2)
+
+
+def get_call_profiler():
+    """
+    Get the installed CallProfiler, or None if calls are not being profiled.
+    """
+    return _profiler
+
+
+class CallProfiler:
+    """
+    Profiles calls with cProfile, writing every profile to a timestamped .pstats file and a summary of it to stderr.
+
+    install() wraps every public Habit method and analytics function that takes the database; main.py wraps its
+    menu actions with wrap(). Only the outermost wrapped call running in a thread is profiled, so the profile of a
+    menu action includes the reports it runs. Nothing is wrapped until install() is called, so profiling costs
+    nothing when it is off.
+    """
+
+    def __init__(self, directory, top=PROFILE_TOP, out=None):
+        """
+        Initialize a CallProfiler.
+
+        Parameters:
+        - directory: Directory the .pstats files are written to; created if needed.
+        - top: Number of functions, by cumulative time, in the summary of every profile.
+        - out: File the summaries are printed to. Defaults to sys.stderr.
+        """
+        self.directory = directory
+        self.top = top
+        self.out = out
+        # Whether a profiled call is running in the thread
+        self.local = threading.local()
+        self.patches = []
+        self.installed = False
+
+    def wrap(self, name, function):
+        """
+        Wrap a function so that its calls are profiled, unless they are made from a profiled call.
+        """
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not self.installed or getattr(self.local, "running", False):
+                return function(*args, **kwargs)
+            return self.profile(name, function, *args, **kwargs)
+        return wrapper
+
+    def profile(self, name, function, *args, **kwargs):
+        """
+        Call a function under cProfile, then save the profile and print its summary.
+
+        Returns:
+        - What the function returns.
+        """
+        import cProfile
+        profile = cProfile.Profile()
+        self.local.running = True
+        start = time.perf_counter()
+        try:
+            return profile.runcall(function, *args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            self.local.running = False
+            self.save(name, profile, seconds)
+
+    def save(self, name, profile, seconds):
+        """
+        Write a profile to a .pstats file named after the time and the call, and print its slowest functions.
+
+        Returns:
+        - str: Path of the file.
+        """
+        import pstats
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{datetime.now():%Y%m%d-%H%M%S-%f}-{name}.pstats")
+        profile.dump_stats(path)
+        out = sys.stderr if self.out is None else self.out
+        print(f"\n{name}: {seconds * 1000:.1f} ms, profile written to {path}", file=out)
+        pstats.Stats(profile, stream=out).strip_dirs().sort_stats("cumulative").print_stats(self.top)
+        return path
+
+    def install(self):
+        """
+        Start profiling the public Habit methods and analytics functions that take the database.
+        """
+        global _profiler
+        import inspect
+        import analytics
+        from habit import Habit
+
+        def takes_db(function):
+            return not inspect.isgeneratorfunction(inspect.unwrap(function)) and \
+                "db" in inspect.signature(function).parameters
+
+        wrappers = {function: self.wrap(f"analytics.{name}", function)
+                    for name, function in vars(analytics).items()
+                    if inspect.isfunction(function) and function.__module__ == "analytics" and
+                    not name.startswith("_") and takes_db(function)}
+        methods = [name for name, method in vars(Habit).items()
+                   if not name.startswith("_") and (isinstance(method, staticmethod) or inspect.isfunction(method)) and
+                   takes_db(getattr(Habit, name))]
+        self.patches = patch_functions(wrappers)
+        self.patches += patch_methods(Habit, methods, lambda name, function: self.wrap(f"Habit.{name}", function))
+        self.installed = True
+        _profiler = self
+
+    def uninstall(self):
+        """
+        Stop profiling and put the original functions back.
+        """
+        global _profiler
+        self.installed = False
+        restore_patches(self.patches)
+        self.patches = []
+        if _profiler is self:
+            _profiler = None
@@ -0,0 +1,360 @@
+"""
+Reminders before streaks break.
+
+Usage:
+    python reminders.py [--db main.db] [--to - | --to FILE | --to unix:PATH | --to tcp:HOST:PORT]
+
+The streak of a habit breaks after habit_info.breaks_after_date unless the habit is checked in by then. The
+ReminderScheduler keeps a min-heap of (reminder time, habit) for the habits whose streak ends in the next few days
+only, found with a few seeks on the due-date index per day, so its memory and wake-ups grow with the habits at
+risk, not with all habits. It sleeps until the earliest reminder, or until a write made through the db module in
+this process changes a habit; only the changed habits are looked up again. Writes by other processes, such as the
+menu, cli.py or server.py, are noticed through PRAGMA data_version, checked at least every MAX_SLEEP seconds, and
+reload the deadlines of every loaded day. Before a reminder fires, its habit is checked once more.
+
+Every reminder is handed to a notifier as a dictionary with the habit, its periodicity, the last day of its streak
+and the reminder time; notifiers write it as a JSON line to stdout, a file or a local socket.
+"""
+import argparse
+import heapq
+import json
+import socket
+import sys
+import threading
+from datetime import datetime, time, timedelta
+
+from analytics import GRAINS, get_period_start
+from db import add_write_listener, get_db, remove_write_listener
+
+# How long before the end of the last day of a streak to remind, per periodicity
+REMINDER_LEADS = {
+    "daily": timedelta(hours=6),
+    "weekly": timedelta(days=1),
+    "monthly": timedelta(days=3),
+    "yearly": timedelta(days=7),
+}
+
+# Habits looked up per query when changed habits are checked again
+CHUNK_SIZE = 500
+
+# Longest sleep between two checks, in seconds, so writes by other processes and a changed system clock are noticed
+MAX_SLEEP = 60
+
+
+def get_streak_deadlines(db, day):
+    """
+    Find the habits whose streak breaks after a day unless they are checked in by then.
+
+    The next due date of such a habit is the first day of a period that ends on that day, which leaves one
+    candidate date per periodicity, so the query is a few seeks on the (next_due_date, breaks_after_date) index.
+
+    Parameters:
+    - db: Database connection.
+    - day: The day as a datetime.date.
+
+    Returns:
+    - list: (habit, periodicity, last day of the streak as "YYYY-MM-DD") tuples.
+    """
+    starts = sorted({get_period_start(periodicity, day).isoformat() for periodicity in GRAINS.values()})
+    placeholders = ", ".join("?" * len(starts))
+    cur = db.cursor()
+    cur.execute(f"""
+        SELECT habit, periodicity, breaks_after_date FROM habit_info
+        WHERE next_due_date IN ({placeholders}) AND breaks_after_date = ?""", (*starts, day.isoformat()))
+    return cur.fetchall()
+
+
+def get_streak_ends(db, names):
+    """
+    Get the periodicity and the last day of the streak of several habits.
+
+    Parameters:
+    - db: Database connection.
+    - names: Names of the habits.
+
+    Returns:
+    - dict: Maps every existing habit to a tuple of (periodicity, last day of the streak or None).
+    """
+    names = list(names)
+    ends = {}
+    cur = db.cursor()
+    for start in range(0, len(names), CHUNK_SIZE):
+        chunk = names[start:start + CHUNK_SIZE]
+        cur.execute(f"""
+            SELECT habit, periodicity, breaks_after_date FROM habit_info
+            WHERE habit IN ({", ".join("?" * len(chunk))})""", chunk)
+        for name, periodicity, breaks_after_date in cur:
+            ends[name] = (periodicity, breaks_after_date)
+    return ends
+
+
+def format_reminder(reminder):
+    """
+    Format a reminder as one JSON line.
+    """
+    return json.dumps(reminder) + "\n"
+
+
+def stdout_notifier(out=None):
+    """
+    Get a notifier that writes reminders to stdout, or to another text file.
+    """
+    def notify(reminder):
+        file = sys.stdout if out is None else out
+        file.write(format_reminder(reminder))
+        file.flush()
+    return notify
+
+
+def file_notifier(path):
+    """
+    Get a notifier that appends reminders to a file.
+    """
+    def notify(reminder):
+        with open(path, "a") as file:
+            file.write(format_reminder(reminder))
+    return notify
+
+
+def socket_notifier(address):
+    """
+    Get a notifier that sends every reminder over a new connection to a local socket.
+
+    Parameters:
+    - address: Path of a Unix socket, or a (host, port) tuple of a TCP socket.
+    """
+    def notify(reminder):
+        if isinstance(address, str):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(address)
+                sock.sendall(format_reminder(reminder).encode())
+        else:
+            with socket.create_connection(address, timeout=5) as sock:
+                sock.sendall(format_reminder(reminder).encode())
+    return notify
+
+
+def get_notifier(target):
+    """
+    Get the notifier for a --to argument: "-" for stdout, "unix:PATH", "tcp:HOST:PORT" or the path of a file.
+    """
+    if target == "-":
+        return stdout_notifier()
+    if target.startswith("unix:"):
+        return socket_notifier(target[len("unix:"):])
+    if target.startswith("tcp:"):
+        host, _, port = target[len("tcp:"):].rpartition(":")
+        return socket_notifier((host, int(port)))
+    return file_notifier(target)
+
+
+class ReminderScheduler:
+    """
+    Fires a reminder for every habit shortly before its streak breaks.
+    """
+
+    def __init__(self, db, notify, leads=None, now=datetime.now):
+        """
+        Initialize a ReminderScheduler. Nothing is loaded until the first call of run_pending.
+
+        Parameters:
+        - db (ManagedConnection): Connection from get_db.
+        - notify: Function called with every reminder.
+        - leads: Dictionary of how long before the end of a streak to remind, per periodicity. Defaults to
+                 REMINDER_LEADS.
+        - now: Function returning the current local time as a datetime.
+        """
+        self.db = db
+        self.notify = notify
+        self.leads = REMINDER_LEADS if leads is None else leads
+        self.now = now
+        # Deadlines are loaded for this many days, from today on, so every reminder is loaded before it is due
+        self.horizon = max(lead.days for lead in self.leads.values()) + 1
+        # (reminder time, habit, last day of the streak); entries that no longer match self.entries are stale
+        self.heap = []
+        # Maps every habit with a reminder to its entry in the heap
+        self.entries = {}
+        # (habit, last day of the streak) of the reminders fired, so none fires twice
+        self.fired = set()
+        # First and last day whose deadlines are loaded
+        self.first_day = self.last_day = None
+        # Habits changed since the last call of run_pending, or None if any habit may have changed
+        self.changed = set()
+        # PRAGMA data_version at the last call of run_pending; it changes when another connection commits
+        self.data_version = None
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopped = False
+
+    def __len__(self):
+        return len(self.entries)
+
+    def on_write(self, key, habits):
+        """
+        Write listener (see db.add_write_listener): take note of the changed habits and wake the scheduler up.
+        """
+        if key != self.db.key:
+            return
+        with self.lock:
+            if habits is None:
+                self.changed = None
+            elif self.changed is not None:
+                self.changed.update(habits)
+        self.wakeup.set()
+
+    def push(self, name, periodicity, breaks_after_date):
+        """
+        Schedule the reminder of a habit whose streak ends on a loaded day.
+        """
+        if (name, breaks_after_date) in self.fired:
+            return
+        deadline = datetime.combine(datetime.strptime(breaks_after_date, "%Y-%m-%d").date() + timedelta(days=1),
+                                    time())
+        entry = (deadline - self.leads.get(periodicity, self.leads["daily"]), name, breaks_after_date)
+        if self.entries.get(name) != entry:
+            heapq.heappush(self.heap, entry)
+            self.entries[name] = entry
+
+    def load(self, first, last):
+        """
+        Schedule the reminders of the habits whose streak ends on a range of days.
+
+        Parameters:
+        - first: First day as a datetime.date.
+        - last: Last day as a datetime.date.
+        """
+        day = first
+        while day <= last:
+            for name, periodicity, breaks_after_date in get_streak_deadlines(self.db, day):
+                self.push(name, periodicity, breaks_after_date)
+            day += timedelta(days=1)
+
+    def refresh(self, names):
+        """
+        Look changed habits up again and reschedule their reminders.
+
+        Parameters:
+        - names: Names of the habits.
+        """
+        ends = get_streak_ends(self.db, names)
+        for name in names:
+            entry = self.entries.pop(name, None)
+            periodicity, breaks_after_date = ends.get(name, (None, None))
+            if breaks_after_date is not None and \
+                    self.first_day.isoformat() <= breaks_after_date <= self.last_day.isoformat():
+                if entry is not None and entry[2] == breaks_after_date:
+                    # Still in the heap
+                    self.entries[name] = entry
+                self.push(name, periodicity, breaks_after_date)
+        # Stale entries stay in the heap until they reach the top; drop them once they outnumber the live ones
+        if len(self.heap) > 2 * len(self.entries) + 64:
+            self.heap = [entry for entry in self.heap if self.entries.get(entry[1]) == entry]
+            heapq.heapify(self.heap)
+
+    def advance(self, today):
+        """
+        Move the loaded days on to start today, loading the days that come into range.
+        """
+        last = today + timedelta(days=self.horizon - 1)
+        if self.first_day is None or today < self.first_day:
+            self.heap, self.entries = [], {}
+            self.load(today, last)
+        elif last > self.last_day:
+            self.load(max(self.last_day + timedelta(days=1), today), last)
+        self.first_day, self.last_day = today, last
+        # Streaks that ended before today are broken; their entries go stale
+        for name in [name for name, entry in self.entries.items() if entry[2] < today.isoformat()]:
+            del self.entries[name]
+        self.fired = {fired for fired in self.fired if fired[1] >= today.isoformat()}
+
+    def run_pending(self):
+        """
+        Apply the changes written since the last call and fire the reminders that are due.
+
+        Returns:
+        - list: The reminders fired.
+        """
+        now = self.now()
+        with self.lock:
+            changed, self.changed = self.changed, set()
+        data_version = self.db.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self.data_version:
+            # Another connection wrote, which the write listener does not see: any habit may have changed
+            self.data_version = data_version
+            changed = None
+        if changed is None:
+            self.first_day = None
+        self.advance(now.date())
+        if changed:
+            self.refresh(changed)
+
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            entry = heapq.heappop(self.heap)
+            if self.entries.get(entry[1]) == entry:
+                del self.entries[entry[1]]
+                due.append(entry)
+        # Check-ins made by other processes are not seen by the write listener
+        ends = get_streak_ends(self.db, [name for _, name, _ in due])
+        reminders = []
+        for remind_at, name, breaks_after_date in due:
+            periodicity, current = ends.get(name, (None, None))
+            if current != breaks_after_date:
+                continue
+            self.fired.add((name, breaks_after_date))
+            reminder = {"habit": name, "periodicity": periodicity, "breaks_after": breaks_after_date,
+                        "remind_at": remind_at.isoformat(timespec="minutes")}
+            reminders.append(reminder)
+            try:
+                self.notify(reminder)
+            except OSError as error:
+                print(f"Reminder for '{name}' not delivered: {error}", file=sys.stderr)
+        return reminders
+
+    def next_wakeup(self):
+        """
+        Get the time of the earliest reminder, or the start of the next day if it comes first.
+        """
+        while self.heap and self.entries.get(self.heap[0][1]) != self.heap[0]:
+            heapq.heappop(self.heap)
+        tomorrow = datetime.combine(self.first_day + timedelta(days=1), time())
+        return min(self.heap[0][0], tomorrow) if self.heap else tomorrow
+
+    def run(self):
+        """
+        Fire reminders until stop is called, sleeping between them.
+        """
+        add_write_listener(self.on_write)
+        try:
+            while not self.stopped:
+                self.run_pending()
+                seconds = (self.next_wakeup() - self.now()).total_seconds()
+                self.wakeup.wait(min(max(seconds, 0), MAX_SLEEP))
+                self.wakeup.clear()
+        finally:
+            remove_write_listener(self.on_write)
+
+    def stop(self):
+        """
+        Make run return. Safe to call from another thread or a signal handler.
+        """
+        self.stopped = True
+        self.wakeup.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Remind of habits before their streaks break.")
+    parser.add_argument("--db", default="main.db", help="database file (default: main.db)")
+    parser.add_argument("--to", default="-", help="where reminders go: '-' for stdout (default), a file, "
+                                                  "unix:PATH or tcp:HOST:PORT")
+    args = parser.parse_args(argv)
+    scheduler = ReminderScheduler(get_db(args.db), get_notifier(args.to))
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
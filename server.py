@@ -0,0 +1,403 @@
+"""
+Local HTTP/JSON server for the Habit Tracker, so several front ends can check in at once.
+
+Usage:
+    python server.py [--db main.db] [--host 127.0.0.1] [--port 8000] [--workers 4]
+
+Endpoints (request and response bodies are JSON):
+    GET    /habits                     all habits with information, or ?periodicity=P
+    GET    /habits/NAME                information of one habit
+    GET    /habits/NAME/events         check-in history of a habit
+    GET    /habits/NAME/longest        longest streak of a habit
+    GET    /longest                    longest streak of all habits
+    POST   /habits                     {"name", "periodicity", "description"}: create a habit
+    PATCH  /habits/NAME                {"name", "description", "periodicity"} (any of them): edit a habit
+    DELETE /habits/NAME                delete a habit
+    POST   /checkins                   {"names": [...], "date": "YYYY-MM-DD"} (date optional): check in habits
+
+Commands run through cli.run_command, so the results are the ones cli.py prints. Reads run on a bounded pool of
+threads, each with its own connection; all writes go through one writer task and its own thread and connection,
+in the order they arrived.
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import contextlib
+import json
+import os
+import signal
+import sqlite3
+import sys
+import threading
+import traceback
+from argparse import Namespace
+from datetime import date
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from cli import PERIODICITIES, run_command
+from db import get_db, is_habit_exists
+from habit import NOT_FOUND
+
+# Threads serving reads
+READ_WORKERS = 4
+
+# Writes waiting for the writer task; further writers wait for room
+WRITE_QUEUE_SIZE = 1000
+
+# Largest request body accepted, in bytes
+MAX_BODY_SIZE = 1 << 20
+
+
+class RequestError(Exception):
+    """
+    Raised for a request that cannot be served, with the HTTP status to answer with.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def route(method, path, query, body):
+    """
+    Translate a request into the commands of cli.py.
+
+    Parameters:
+    - method: HTTP method.
+    - path: Path of the URL.
+    - query: Query string arguments, as returned by urllib.parse.parse_qs.
+    - body: Parsed JSON body, or None.
+
+    Returns:
+    - tuple: (whether the commands write, list of argparse.Namespace commands).
+
+    Raises:
+    - RequestError: If the route does not exist or the request is invalid.
+    """
+    parts = [unquote(part) for part in path.strip("/").split("/")]
+    body = body if isinstance(body, dict) else {}
+
+    if method == "GET":
+        if parts == ["habits"] and "periodicity" in query:
+            return False, [Namespace(command="report", report="periodicity",
+                                     periodicity=periodicity(query["periodicity"][0]))]
+        if parts == ["habits"]:
+            return False, [Namespace(command="report", report="info")]
+        if parts == ["longest"]:
+            return False, [Namespace(command="report", report="longest", name=None)]
+        if len(parts) == 2 and parts[0] == "habits":
+            return False, [Namespace(command="report", report="habit", name=parts[1])]
+        if len(parts) == 3 and parts[0] == "habits" and parts[2] in ("events", "longest"):
+            return False, [Namespace(command="report", report=parts[2], name=parts[1])]
+
+    elif method == "POST" and parts == ["habits"]:
+        return True, [Namespace(command="create", name=text(body, "name"),
+                                periodicity=periodicity(body.get("periodicity")),
+                                description=str(body.get("description", "")))]
+
+    elif method == "POST" and parts == ["checkins"]:
+        names = body.get("names")
+        if not names or not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "'names' must be a list of habit names")
+        return True, [Namespace(command="checkin", names=names, date=day(body.get("date")))]
+
+    elif method == "DELETE" and len(parts) == 2 and parts[0] == "habits":
+        return True, [Namespace(command="delete", name=parts[1])]
+
+    elif method == "PATCH" and len(parts) == 2 and parts[0] == "habits":
+        name = parts[1]
+        commands = []
+        if "description" in body:
+            commands.append(Namespace(command="describe", name=name, description=str(body["description"])))
+        if "periodicity" in body:
+            commands.append(Namespace(command="periodicity", name=name,
+                                      periodicity=periodicity(body["periodicity"])))
+        # Renamed last, so the other changes still find the habit under its old name
+        if "name" in body:
+            commands.append(Namespace(command="rename", name=name, new_name=text(body, "name")))
+        if not commands:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "nothing to change")
+        return True, commands
+
+    raise RequestError(HTTPStatus.NOT_FOUND, f"no route for {method} {path}")
+
+
+def text(body, key):
+    """
+    Get a required, non-empty string from a request body.
+    """
+    value = body.get(key)
+    if not isinstance(value, str) or not value.strip():
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"'{key}' is required")
+    return value
+
+
+def periodicity(value):
+    """
+    Check a periodicity from a request.
+    """
+    if value not in PERIODICITIES:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"periodicity must be one of {', '.join(PERIODICITIES)}")
+    return value
+
+
+def day(value):
+    """
+    Check an optional "YYYY-MM-DD" date from a request.
+    """
+    if value is None:
+        return None
+    try:
+        if isinstance(value, str) and date.fromisoformat(value).isoformat() == value:
+            return value
+    except ValueError:
+        pass
+    raise RequestError(HTTPStatus.BAD_REQUEST, "'date' must be a date as YYYY-MM-DD")
+
+
+def status_of(results):
+    """
+    Pick the HTTP status of the results of a request. A habit that is not found is a 404, also for reports.
+    """
+    errors = [result.get("error") for result in results if result.get("ok") is False]
+    if not errors:
+        return HTTPStatus.OK
+    if "not_found" in errors:
+        return HTTPStatus.NOT_FOUND
+    if "habit already exists" in errors:
+        return HTTPStatus.CONFLICT
+    return HTTPStatus.BAD_REQUEST
+
+
+class HabitServer:
+    """
+    Serves the Habit Tracker over HTTP/1.1 with keep-alive connections.
+    """
+
+    def __init__(self, db_name="main.db", workers=READ_WORKERS):
+        """
+        Initialize a HabitServer.
+
+        Parameters:
+        - db_name: Name of the SQLite database file.
+        - workers: Number of threads serving reads.
+        """
+        self.db_name = db_name
+        self.workers = workers
+        self.readers = concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix="reader")
+        self.writer = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="writer")
+        # Connection of every reader thread and of the writer thread
+        self.local = threading.local()
+        self.writes = None
+        self.writer_task = None
+        self.server = None
+
+    def execute(self, commands):
+        """
+        Run commands on the connection of the calling thread.
+
+        Returns:
+        - list: Result objects of all commands.
+        """
+        if getattr(self.local, "db", None) is None:
+            self.local.db = get_db(self.db_name, per_thread=True)
+        results = []
+        for args in commands:
+            name = getattr(args, "name", None) if args.command == "report" else None
+            # A report on a missing habit would just have no rows, the same as one on a habit without check-ins
+            if name is not None and not is_habit_exists(self.local.db, name.lower()):
+                results.append({"command": "report", "report": args.report, "habit": name.lower(), "ok": False,
+                                "error": NOT_FOUND})
+            else:
+                results.extend(run_command(self.local.db, args))
+        return results
+
+    def close_connection(self, barrier):
+        """
+        Close the connection of the calling thread, then wait until every other thread of the pool has done so.
+        Blocking on the barrier makes every thread of the pool take exactly one of these calls.
+        """
+        if getattr(self.local, "db", None) is not None:
+            self.local.db.close()
+            self.local.db = None
+        barrier.wait()
+
+    async def write_loop(self):
+        """
+        Run queued writes one after another on the writer thread.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            commands, future = await self.writes.get()
+            try:
+                result = await loop.run_in_executor(self.writer, self.execute, commands)
+            except Exception as error:
+                if not future.done():
+                    future.set_exception(error)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            self.writes.task_done()
+
+    async def dispatch(self, method, target, body):
+        """
+        Serve one request.
+
+        Returns:
+        - tuple: (HTTP status, JSON-serializable response).
+        """
+        url = urlsplit(target)
+        try:
+            payload = json.loads(body) if body else None
+        except ValueError:
+            return HTTPStatus.BAD_REQUEST, {"ok": False, "error": "body is not valid JSON"}
+        try:
+            writes, commands = route(method, url.path, parse_qs(url.query), payload)
+            if writes:
+                future = asyncio.get_running_loop().create_future()
+                await self.writes.put((commands, future))
+                results = await future
+            else:
+                results = await asyncio.get_running_loop().run_in_executor(self.readers, self.execute, commands)
+        except RequestError as error:
+            return error.status, {"ok": False, "error": str(error)}
+        except ValueError as error:
+            return HTTPStatus.BAD_REQUEST, {"ok": False, "error": str(error)}
+        except sqlite3.OperationalError as error:
+            # Another process holds the database: the client may retry, unlike after any other database error
+            if "locked" in str(error) or "busy" in str(error):
+                return HTTPStatus.SERVICE_UNAVAILABLE, {"ok": False, "error": str(error)}
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"ok": False, "error": str(error)}
+        except sqlite3.Error as error:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"ok": False, "error": str(error)}
+        except Exception:
+            # A bug rather than a bad request: answer it, so the connection is not dropped without a response
+            traceback.print_exc()
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"ok": False, "error": "internal server error"}
+        return status_of(results), {"results": results}
+
+    async def handle(self, reader, writer):
+        """
+        Serve the requests of one connection until the client closes it.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.respond(writer, HTTPStatus.BAD_REQUEST, {"ok": False, "error": "bad request"}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # Without a length the end of the body, and so the start of the next request, is unknown
+                    await self.respond(writer, HTTPStatus.BAD_REQUEST, {"ok": False, "error": "bad Content-Length"},
+                                       False)
+                    break
+                if length > MAX_BODY_SIZE:
+                    await self.respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                       {"ok": False, "error": "body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = (headers.get("connection", "").lower() != "close") and version != "HTTP/1.0"
+                status, response = await self.dispatch(method.upper(), target, body)
+                await self.respond(writer, status, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    @staticmethod
+    async def respond(writer, status, response, keep_alive):
+        """
+        Write a JSON response.
+        """
+        body = json.dumps(response).encode()
+        writer.write(f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                     f"Content-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body)
+        await writer.drain()
+
+    async def start(self, host="127.0.0.1", port=8000):
+        """
+        Start listening. The writer thread opens its connection, and so migrates the schema, before the first request.
+
+        Returns:
+        - asyncio.Server: The listening server.
+        """
+        await asyncio.get_running_loop().run_in_executor(self.writer, self.execute, [])
+        self.writes = asyncio.Queue(WRITE_QUEUE_SIZE)
+        self.writer_task = asyncio.create_task(self.write_loop())
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server
+
+    async def stop(self):
+        """
+        Stop listening, finish the queued writes and shut the threads down.
+        """
+        self.server.close()
+        await self.server.wait_closed()
+        await self.writes.join()
+        self.writer_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self.writer_task
+        for pool, count in ((self.readers, self.workers), (self.writer, 1)):
+            barrier = threading.Barrier(count)
+            closes = [pool.submit(self.close_connection, barrier) for _ in range(count)]
+            await asyncio.gather(*map(asyncio.wrap_future, closes))
+            pool.shutdown()
+
+
+async def serve(db_name, host, port, workers):
+    """
+    Run the server until it is interrupted or terminated.
+    """
+    server = HabitServer(db_name, workers)
+    listening = await server.start(host, port)
+    address = listening.sockets[0].getsockname()
+    print(f"Serving {db_name} on http://{address[0]}:{address[1]}", file=sys.stderr, flush=True)
+    stopped = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        # Not available on Windows, where Ctrl+C raises KeyboardInterrupt instead
+        with contextlib.suppress(NotImplementedError):
+            asyncio.get_running_loop().add_signal_handler(signum, stopped.set)
+    try:
+        await stopped.wait()
+    finally:
+        await server.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the Habit Tracker over HTTP/JSON.")
+    parser.add_argument("--db", default="main.db", help="database file (default: main.db)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=READ_WORKERS, help="threads serving reads")
+    args = parser.parse_args(argv)
+    # The Habit class prints messages for people; keep them out of the server's output
+    with open(os.devnull, "w") as messages, contextlib.redirect_stdout(messages):
+        with contextlib.suppress(KeyboardInterrupt):
+            asyncio.run(serve(args.db, args.host, args.port, args.workers))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+Per-user databases for hosting many users.
+
+Every user gets a database file of their own, with the same schema as main.db, so one user's writes never take a
+lock another user has to wait for. The ShardRouter maps user ids to those files, spread over 256 subdirectories,
+keeps a bounded number of connections open, and fans queries out over all users in parallel.
+"""
+import concurrent.futures
+import contextlib
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import quote, unquote
+
+from db import get_db
+
+# Connections kept open by a router; the least recently used idle ones are closed beyond this
+MAX_OPEN = 256
+
+# Threads used to fan a query out over the users
+FAN_OUT_WORKERS = 8
+
+# Longest accepted user id, so that file names stay within the limits of common file systems
+MAX_USER_ID_LENGTH = 64
+
+
+class ShardRouter:
+    """
+    Maps user ids to their database files and hands out connections to them.
+    """
+
+    def __init__(self, root, max_open=MAX_OPEN):
+        """
+        Initialize a ShardRouter.
+
+        Parameters:
+        - root: Directory holding the user databases. It is created when the first user connects.
+        - max_open: Number of idle connections kept open.
+        """
+        self.root = root
+        self.max_open = max_open
+        # Maps user ids to [connection, number of connect() blocks using it], least recently used first
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+
+    def path(self, user_id):
+        """
+        Get the database file of a user.
+
+        The file name is the quoted user id, so any id maps to a file inside the root directory. The subdirectory
+        is picked by a hash of the id, which spreads the users evenly.
+
+        Raises:
+        - ValueError: If the user id is empty or too long.
+        """
+        if not user_id or len(user_id) > MAX_USER_ID_LENGTH:
+            raise ValueError(f"user id must be 1 to {MAX_USER_ID_LENGTH} characters long")
+        shard = hashlib.sha1(user_id.encode()).hexdigest()[:2]
+        return os.path.join(self.root, shard, quote(user_id, safe="") + ".db")
+
+    def users(self):
+        """
+        List the users that have a database.
+
+        Returns:
+        - list: Sorted user ids.
+        """
+        if not os.path.isdir(self.root):
+            return []
+        users = []
+        for shard in os.listdir(self.root):
+            folder = os.path.join(self.root, shard)
+            if os.path.isdir(folder):
+                users.extend(unquote(name[:-3]) for name in os.listdir(folder) if name.endswith(".db"))
+        return sorted(users)
+
+    @contextlib.contextmanager
+    def connect(self, user_id):
+        """
+        Use the database of a user, creating it for a new user.
+
+        The connection stays open while the block runs; afterwards it may be closed to make room for others.
+
+        Parameters:
+        - user_id: Id of the user.
+
+        Yields:
+        The connection to the user's database.
+        """
+        path = self.path(user_id)
+        with self._lock:
+            entry = self._open.get(user_id)
+            if entry is None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                entry = self._open[user_id] = [get_db(path), 0]
+            entry[1] += 1
+            self._open.move_to_end(user_id)
+        try:
+            yield entry[0]
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                self._evict()
+
+    def _evict(self):
+        """
+        Close the least recently used idle connections beyond max_open. The caller holds the lock.
+        """
+        idle = [user_id for user_id, (_, users) in self._open.items() if users == 0]
+        for user_id in idle[:max(len(self._open) - self.max_open, 0)]:
+            self._open.pop(user_id)[0].close()
+
+    def fan_out(self, function, user_ids=None, workers=FAN_OUT_WORKERS):
+        """
+        Run a function on the database of every user, in parallel.
+
+        Parameters:
+        - function: Function taking a connection.
+        - user_ids: Users to run the function for. Defaults to all users.
+        - workers: Number of threads.
+
+        Returns:
+        - dict: Maps every user id to the result of the function. A function that raises raises here.
+        """
+        user_ids = self.users() if user_ids is None else user_ids
+
+        def run(user_id):
+            with self.connect(user_id) as db:
+                return function(db)
+
+        with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+            futures = {user_id: pool.submit(run, user_id) for user_id in user_ids}
+            return {user_id: future.result() for user_id, future in futures.items()}
+
+    def close(self):
+        """
+        Close every connection that is not in use.
+        """
+        with self._lock:
+            for user_id in [user_id for user_id, (_, users) in self._open.items() if users == 0]:
+                self._open.pop(user_id)[0].close()
@@ -0,0 +1,228 @@
+"""
+Memory-mapped columnar snapshots of the check-in history.
+
+A snapshot is a directory holding the habit id, day ordinal and streak of every check-in as three int32 .npy
+files, ordered by habit and date, next to habits.json, the dictionary of the habits the ids point into. Opening
+one maps the files with np.load(mmap_mode="r") instead of reading them, so it takes about as long as reading the
+dictionary, and processes that open the same snapshot share its pages through the operating system's page cache.
+
+A Snapshot can stand in for the database connection of the analytics functions that read the check-in history,
+like a history.History.
+"""
+import json
+import os
+import shutil
+from datetime import date
+import numpy as np
+
+from analytics import get_period_start
+from db import read_snapshot
+from history import HabitHistory
+from streaks import PERIODICITY_CODES, SQL_DAY_ORDINAL, compute_longest_streaks, period_keys
+
+# Format of the files; a snapshot of another version is refused
+SNAPSHOT_VERSION = 1
+
+# Column files, each holding one int32 value per check-in
+COLUMNS = ("habit_ids", "days", "streaks")
+
+# Rows read from the database at a time when writing a snapshot
+PAGE_SIZE = 50000
+
+PERIODICITIES = {code: periodicity for periodicity, code in PERIODICITY_CODES.items()}
+
+
+def write_snapshot(db, path, page_size=PAGE_SIZE):
+    """
+    Write a snapshot of all habits and check-ins.
+
+    The check-ins are streamed from the database into the memory-mapped column files a page at a time, so memory
+    use does not grow with the size of the history. The snapshot is written next to path and moved into place
+    once complete; processes that have the old snapshot open keep reading it.
+
+    Parameters:
+    - db: Database connection.
+    - path: Directory of the snapshot.
+    - page_size: Number of rows read from the database at a time.
+
+    Returns:
+    - int: Number of check-ins written.
+    """
+    day = SQL_DAY_ORDINAL.format("event_date")
+    temporary = path.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+    # All queries must see the same rows
+    with read_snapshot(db):
+        habits = db.execute("""
+            SELECT habit, periodicity, date(creation_date) FROM habit_info ORDER BY habit""").fetchall()
+        known = {habit for habit, _, _ in habits}
+        counts = dict(db.execute("SELECT habit, COUNT(*) FROM event_log GROUP BY habit"))
+        # Events of habits that no longer exist are left out
+        habit_filter = "" if known.issuperset(counts) else "WHERE habit IN (SELECT habit FROM habit_info)"
+        counts = [counts.get(habit, 0) for habit, _, _ in habits]
+        total = sum(counts)
+
+        columns = {column: np.lib.format.open_memmap(os.path.join(temporary, column + ".npy"), mode="w+",
+                                                     dtype=np.int32, shape=(total,))
+                   for column in COLUMNS}
+        columns["habit_ids"][:] = np.repeat(np.arange(len(habits), dtype=np.int32), counts)
+        cur = db.execute(f"SELECT {day}, streak FROM event_log {habit_filter} ORDER BY habit, event_date, id")
+        start = 0
+        while True:
+            page = cur.fetchmany(page_size)
+            if not page:
+                break
+            pairs = np.array(page, dtype=np.int32)
+            columns["days"][start:start + len(page)] = pairs[:, 0]
+            columns["streaks"][start:start + len(page)] = pairs[:, 1]
+            start += len(page)
+    for column in columns.values():
+        column.flush()
+    del columns
+
+    with open(os.path.join(temporary, "habits.json"), "w") as file:
+        json.dump({"version": SNAPSHOT_VERSION, "events": total,
+                   "names": [habit for habit, _, _ in habits],
+                   "periodicities": [periodicity for _, periodicity, _ in habits],
+                   "creation_dates": [creation_date for _, _, creation_date in habits],
+                   "counts": counts}, file)
+
+    # A directory cannot replace another one in a single rename, so the old snapshot is moved aside first
+    old = path.rstrip(os.sep) + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, old)
+    os.rename(temporary, path)
+    shutil.rmtree(old, ignore_errors=True)
+    return total
+
+
+class Snapshot:
+    """
+    Read-only check-in history of all habits, mapped from a snapshot directory.
+    """
+
+    __slots__ = ("path", "names", "periodicities", "creation_dates", "offsets", "positions", "codes",
+                 "habit_ids", "days", "streaks")
+
+    def __init__(self, path, habits, columns):
+        """
+        Initialize a Snapshot. Use Snapshot.open to read one from disk.
+
+        Parameters:
+        - path: Directory of the snapshot.
+        - habits: Contents of habits.json.
+        - columns: Dictionary of the column arrays, named as in COLUMNS.
+        """
+        self.path = path
+        self.names = habits["names"]
+        self.periodicities = habits["periodicities"]
+        self.creation_dates = habits["creation_dates"]
+        self.offsets = np.concatenate(([0], np.cumsum(habits["counts"], dtype=np.int64)))
+        self.positions = {name: i for i, name in enumerate(self.names)}
+        self.codes = np.array([PERIODICITY_CODES.get(periodicity, 0) for periodicity in self.periodicities],
+                              dtype=np.int64)
+        self.habit_ids = columns["habit_ids"]
+        self.days = columns["days"]
+        self.streaks = columns["streaks"]
+
+    @classmethod
+    def open(cls, path):
+        """
+        Open a snapshot written by write_snapshot.
+
+        Raises:
+        - ValueError: If the snapshot has another version or its columns do not match its dictionary.
+        - OSError: If the snapshot cannot be read.
+        """
+        with open(os.path.join(path, "habits.json")) as file:
+            habits = json.load(file)
+        if habits.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"snapshot {path} has version {habits.get('version')}, not {SNAPSHOT_VERSION}")
+        columns = {column: np.load(os.path.join(path, column + ".npy"), mmap_mode="r") for column in COLUMNS}
+        if any(len(values) != habits["events"] for values in columns.values()):
+            raise ValueError(f"snapshot {path} is incomplete")
+        return cls(path, habits, columns)
+
+    def __getitem__(self, name):
+        i = self.positions[name]
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return HabitHistory(name, self.periodicities[i], self.days[start:end], self.streaks[start:end])
+
+    def __contains__(self, name):
+        return name in self.positions
+
+    def __iter__(self):
+        return (self[name] for name in self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def event_count(self):
+        """
+        Number of check-ins of all habits.
+        """
+        return len(self.days)
+
+    def longest_streaks(self):
+        """
+        Find the longest streak of every habit (see HabitHistory.longest_streak), for all habits at once.
+
+        Returns:
+        - list: (habit name, length of the run, date of its last check-in) tuples.
+        """
+        keys = period_keys(self.days, self.codes[self.habit_ids])
+        longest, end_days = compute_longest_streaks(self.habit_ids, keys, self.days, len(self))
+        return [(name, length, date.fromordinal(day).isoformat() if day > 0 else None)
+                for name, length, day in zip(self.names, longest.tolist(), end_days.tolist())]
+
+    def check_in_counts(self, name, start, end):
+        """
+        Count the check-ins of a habit, or of all habits, on every day between two dates, like
+        analytics.get_check_in_counts. The first check-in of every period counts; repeated ones do not.
+
+        Parameters:
+        - name: Name of the habit, or None for all habits.
+        - start: First day as "YYYY-MM-DD".
+        - end: Last day as "YYYY-MM-DD".
+
+        Returns:
+        Tuple of (event date, periodicity, number of check-ins) tuples, ordered by date.
+        """
+        if name is None:
+            first, last = 0, len(self.days)
+        elif name in self:
+            i = self.positions[name]
+            first, last = self.offsets[i], self.offsets[i + 1]
+        else:
+            return ()
+        habit_ids, days = self.habit_ids[first:last], self.days[first:last]
+        codes = self.codes[habit_ids]
+        keys = period_keys(days, codes)
+        counted = np.ones(len(keys), dtype=bool)
+        counted[1:] = (habit_ids[1:] != habit_ids[:-1]) | (keys[1:] != keys[:-1])
+        counted &= (days >= date.fromisoformat(start).toordinal()) & (days <= date.fromisoformat(end).toordinal())
+        # One group per day and periodicity, the longest periods first, as analytics.get_check_in_counts orders them
+        width = len(PERIODICITY_CODES)
+        groups, counts = np.unique(days[counted].astype(np.int64) * width + (width - 1 - codes[counted]),
+                                   return_counts=True)
+        return tuple((date.fromordinal(group // width).isoformat(), PERIODICITIES[width - 1 - group % width], count)
+                     for group, count in zip(groups.tolist(), counts.tolist()))
+
+    def creation_groups(self, name):
+        """
+        Count the habits, or the one habit, by periodicity and the first day of the period they were created in,
+        like the grouped query of analytics.count_due_periods.
+
+        Returns:
+        - list: (periodicity, first day as "YYYY-MM-DD" or None, number of habits) tuples.
+        """
+        positions = range(len(self)) if name is None else [self.positions[name]] if name in self else []
+        groups = {}
+        for i in positions:
+            periodicity, created = self.periodicities[i], self.creation_dates[i]
+            first = get_period_start(periodicity, date.fromisoformat(created)).isoformat() if created else None
+            groups[periodicity, first] = groups.get((periodicity, first), 0) + 1
+        return [(periodicity, first, count) for (periodicity, first), count in groups.items()]
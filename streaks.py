@@ -0,0 +1,210 @@
+import itertools
+from datetime import datetime
+import numpy as np
+
+# Periodicities as small integer codes, in the order used by the engine
+PERIODICITY_CODES = {"daily": 0, "weekly": 1, "monthly": 2, "yearly": 3}
+
+# date(1970, 1, 1).toordinal(); day ordinals count 0001-01-01 as day 1
+UNIX_EPOCH_ORDINAL = 719163
+
+# Converts an ISO "YYYY-MM-DD" event_date to a day ordinal inside SQLite
+SQL_DAY_ORDINAL = "CAST(julianday({}) - 1721424.5 AS INTEGER)"
+
+
+def period_keys(days, periodicities):
+    """
+    Compute the period key of every event, so that consecutive periods have consecutive keys.
+
+    The keys are the same as the ones db.get_period_key stores in the event_log table.
+
+    Parameters:
+    - days: NumPy array of day ordinals.
+    - periodicities: NumPy array of periodicity codes (see PERIODICITY_CODES), one per day.
+
+    Returns:
+    - numpy.ndarray: Period key of every day, as int64.
+    """
+    days = np.asarray(days, dtype=np.int64)
+    if len(days) == 0:
+        return days.copy()
+
+    # Build the keys of every periodicity for the range of days, which is far smaller than the number of
+    # events, then look every event up in that table
+    first = days.min()
+    span = np.arange(first, days.max() + 1)
+    dates = (span - UNIX_EPOCH_ORDINAL).astype("datetime64[D]")
+    table = np.stack([
+        span,
+        (span - 1) // 7,
+        dates.astype("datetime64[M]").astype(np.int64) + 1970 * 12,
+        dates.astype("datetime64[Y]").astype(np.int64) + 1970,
+    ])
+    return table[np.asarray(periodicities), days - first]
+
+
+def compute_streaks(habit_ids, keys, habit_count, current_keys=None):
+    """
+    Compute the current and longest streak of every habit from its check-in period keys.
+
+    Repeated check-ins in the same period count once. A run of consecutive period keys is a streak, found with
+    diff/cumsum run detection.
+
+    Parameters:
+    - habit_ids: NumPy array with the habit id (0 to habit_count - 1) of every check-in.
+    - keys: NumPy array with the period key of every check-in.
+    - habit_count: Number of habits.
+    - current_keys: Optional NumPy array with the period key of today for every habit. When given, a habit whose
+                    last check-in is older than the previous period has a current streak of 0.
+
+    Returns:
+    - tuple: (current streaks, longest streaks, last period keys) as NumPy arrays indexed by habit id. Habits
+             without check-ins have streaks of 0 and a last period key of -1.
+    """
+    current = np.zeros(habit_count, dtype=np.int64)
+    longest = np.zeros(habit_count, dtype=np.int64)
+    last_keys = np.full(habit_count, -1, dtype=np.int64)
+    if len(habit_ids) == 0:
+        return current, longest, last_keys
+
+    # Sort by habit, then period key, using a single combined integer. Events loaded in index order are
+    # already sorted, in which case the sort is skipped.
+    habit_ids = np.asarray(habit_ids, dtype=np.int64)
+    keys = np.asarray(keys, dtype=np.int64)
+    first_key = keys.min()
+    stride = keys.max() - first_key + 1
+    combined = habit_ids * stride + (keys - first_key)
+    if np.any(combined[1:] < combined[:-1]):
+        combined = np.sort(combined)
+
+    # Drop repeated check-ins in the same period
+    distinct = np.empty(len(combined), dtype=bool)
+    distinct[0] = True
+    np.not_equal(combined[1:], combined[:-1], out=distinct[1:])
+    combined = combined[distinct]
+    habit_ids = combined // stride
+
+    # A run starts at the first check-in of a habit or after a gap of more than one period. Runs of
+    # the same habit stay next to each other, as do the first runs of consecutive habits.
+    habit_starts = np.empty(len(combined), dtype=bool)
+    habit_starts[0] = True
+    np.not_equal(habit_ids[1:], habit_ids[:-1], out=habit_starts[1:])
+    run_starts = habit_starts.copy()
+    run_starts[1:] |= np.diff(combined) != 1
+    run_ids = np.cumsum(run_starts) - 1
+    run_lengths = np.diff(np.append(np.flatnonzero(run_starts), len(combined)))
+
+    habits = habit_ids[habit_starts]
+    first_runs = run_ids[habit_starts]
+    longest[habits] = np.maximum.reduceat(run_lengths, first_runs)
+
+    # The last check-in of every habit closes its most recent run
+    last = np.append(habit_starts[1:], True)
+    current[habits] = run_lengths[run_ids[last]]
+    last_keys[habits] = combined[last] - habits * stride + first_key
+    if current_keys is not None:
+        current_keys = np.asarray(current_keys, dtype=np.int64)
+        current[last_keys < current_keys - 1] = 0
+    return current, longest, last_keys
+
+
+def compute_longest_streaks(habit_ids, keys, days, habit_count):
+    """
+    Compute the longest streak of every habit and the day of its last check-in, from check-ins ordered by habit
+    and day.
+
+    Repeated check-ins in the same period count once, and the last of them dates the period. Of runs of the same
+    length, the latest wins, as in history.HabitHistory.longest_streak.
+
+    Parameters:
+    - habit_ids: NumPy array with the habit id (0 to habit_count - 1) of every check-in.
+    - keys: NumPy array with the period key of every check-in.
+    - days: NumPy array with the day ordinal of every check-in.
+    - habit_count: Number of habits.
+
+    Returns:
+    - tuple: (longest streaks, day ordinals of their last check-ins) as NumPy arrays indexed by habit id. Habits
+             without check-ins have a longest streak of 0 and a day of -1.
+    """
+    longest = np.zeros(habit_count, dtype=np.int64)
+    end_days = np.full(habit_count, -1, dtype=np.int64)
+    if len(habit_ids) == 0:
+        return longest, end_days
+
+    # Keep the last check-in of every period of every habit
+    habit_ids = np.asarray(habit_ids, dtype=np.int64)
+    keys = np.asarray(keys, dtype=np.int64)
+    last = np.ones(len(keys), dtype=bool)
+    last[:-1] = (habit_ids[1:] != habit_ids[:-1]) | (keys[1:] != keys[:-1])
+    habit_ids, keys, days = habit_ids[last], keys[last], np.asarray(days)[last]
+
+    # Runs of consecutive periods, as in compute_streaks
+    run_starts = np.ones(len(keys), dtype=bool)
+    run_starts[1:] = (habit_ids[1:] != habit_ids[:-1]) | (np.diff(keys) != 1)
+    firsts = np.flatnonzero(run_starts)
+    lengths = np.diff(np.append(firsts, len(keys)))
+    run_habits = habit_ids[firsts]
+
+    # The best run of a habit has the highest length, then the highest position
+    scores = lengths * len(lengths) + np.arange(len(lengths))
+    habit_first_runs = np.flatnonzero(np.append(True, run_habits[1:] != run_habits[:-1]))
+    best = np.maximum.reduceat(scores, habit_first_runs) % len(lengths)
+    habits = run_habits[habit_first_runs]
+    longest[habits] = lengths[best]
+    end_days[habits] = days[firsts[best] + lengths[best] - 1]
+    return longest, end_days
+
+
+def load_events(db, name=None):
+    """
+    Load habits and check-in days from the database into NumPy arrays.
+
+    Parameters:
+    - db: Database connection.
+    - name: Optional name of a single habit to load.
+
+    Returns:
+    - tuple: (habit names, periodicity codes, habit id of every event, day ordinal of every event).
+    """
+    cur = db.cursor()
+    if name is None:
+        cur.execute("SELECT habit, periodicity FROM habit_info ORDER BY habit")
+    else:
+        cur.execute("SELECT habit, periodicity FROM habit_info WHERE habit = ?", (name,))
+    habits = cur.fetchall()
+    names = [habit for habit, _ in habits]
+    codes = np.array([PERIODICITY_CODES.get(periodicity, 0) for _, periodicity in habits], dtype=np.int64)
+
+    # Pair events with the position of their habit, counted in the same order as above
+    day = SQL_DAY_ORDINAL.format("e.event_date")
+    if name is None:
+        cur.execute(f"""
+            WITH ids AS (SELECT habit, ROW_NUMBER() OVER (ORDER BY habit) - 1 AS id FROM habit_info)
+            SELECT ids.id, {day} FROM event_log e JOIN ids ON ids.habit = e.habit
+            ORDER BY e.habit, e.event_date""")
+    else:
+        cur.execute(f"SELECT 0, {day} FROM event_log e WHERE e.habit = ? ORDER BY e.event_date", (name,))
+    pairs = np.fromiter(itertools.chain.from_iterable(cur), dtype=np.int64).reshape(-1, 2)
+    return names, codes, pairs[:, 0], pairs[:, 1]
+
+
+def get_streaks(db, name=None, date=None):
+    """
+    Recompute the current and longest streak of habits from their check-in history.
+
+    Unlike the streak values stored in the database, these follow each habit's current periodicity and are not
+    affected by resets.
+
+    Parameters:
+    - db: Database connection.
+    - name: Optional name of a single habit.
+    - date: Date of today as "YYYY-MM-DD", used to tell whether a streak is still running. Defaults to today.
+
+    Returns:
+    - dict: Maps every habit name to a tuple of (current streak, longest streak).
+    """
+    names, codes, habit_ids, days = load_events(db, name)
+    today = datetime.strptime(date, "%Y-%m-%d") if date is not None else datetime.now()
+    current_keys = period_keys(np.full(len(names), today.toordinal()), codes)
+    current, longest, _ = compute_streaks(habit_ids, period_keys(days, codes[habit_ids]), len(names), current_keys)
+    return {habit: (int(current[i]), int(longest[i])) for i, habit in enumerate(names)}
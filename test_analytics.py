@@ -1,5 +1,6 @@
 from datetime import datetime
 from analytics import *
+import sqlite3
 import textwrap
 import pytest
 from freezegun import freeze_time
@@ -72,6 +73,7 @@ class TestAnalytics:
         Test the function get_longest_streaks_of_all_habits from the analytics module.
         """
         assert len(get_longest_streaks_of_all_habits(self.db)) == 5
+        assert get_longest_streaks_of_all_habits(self.db)[3] == ("studying", 4, "2023-02-05")
 
     def test_get_event_logs_by_habit(self):
         """
@@ -79,6 +81,50 @@ class TestAnalytics:
         """
         assert len(get_event_logs_by_habit(self.db, "studying")) == 6
 
+    def test_cache(self):
+        """
+        Test that repeated analytics queries are served from the cache until the database changes.
+        """
+        statements = []
+        self.db.set_trace_callback(statements.append)
+        first = get_all_habits(self.db)
+        assert get_all_habits(self.db) is first
+        with pytest.raises(ValueError):
+            get_event_logs_by_habit(self.db, "exercise")
+        with pytest.raises(ValueError):
+            get_event_logs_by_habit(self.db, "exercise")
+        # Besides the cheap check for writes of other processes before every lookup
+        assert len([statement for statement in statements if statement != "PRAGMA data_version"]) == 2
+
+        add_habit(self.db, "running", "daily", "Run for 30 minutes", "2023-12-01", 0)
+        assert len(get_all_habits(self.db)) == 8
+        self.db.set_trace_callback(None)
+
+    def test_cache_other_process(self):
+        """
+        Test that a commit through another connection, like one of another process, makes cached results stale.
+        """
+        assert len(get_all_habits(self.db)) == 7
+        other = sqlite3.connect("test.db")
+        with other:
+            other.execute("INSERT INTO habit_info (habit, periodicity, description, creation_date, streak) "
+                          "VALUES ('running', 'daily', 'Run for 30 minutes', '2023-12-01', 0)")
+        other.close()
+        assert len(get_all_habits(self.db)) == 8
+
+    def test_cache_size(self, monkeypatch):
+        """
+        Test that the cache keeps only the most recently used results.
+        """
+        import analytics
+        monkeypatch.setattr(analytics, "CACHE_SIZE", 2)
+        clear_cache()
+        get_all_habits(self.db)
+        get_all_habits_info(self.db)
+        get_all_habits(self.db)
+        get_longest_streaks_of_all_habits(self.db)
+        assert [key[0] for key in analytics._cache] == ["get_all_habits", "get_longest_streaks_of_all_habits"]
+
     def test_print_tabular(self, capfd):
         """
         Test the function print_tabular from the analytics module.
@@ -99,6 +145,125 @@ class TestAnalytics:
             +----------+-------------+-------------------------+---------------+----------------+
         """)
         assert captured.out == expected_output
+
+    def test_iter_all_habits_info(self):
+        """
+        Test the functions iter_all_habits_info and get_habit_info_widths from the analytics module.
+        """
+        pages = list(iter_all_habits_info(self.db, page_size=4))
+        assert [len(page) for page in pages] == [4, 2]
+        assert pages[1][-1][0] == "camping"
+        assert get_habit_info_widths(self.db) == [8, 7, 23, 10, 1]
+
+    def test_iter_event_logs_by_habit(self):
+        """
+        Test the functions iter_event_logs_by_habit and get_event_log_widths from the analytics module.
+        """
+        pages = list(iter_event_logs_by_habit(self.db, "studying", page_size=2))
+        assert [len(page) for page in pages] == [2, 2, 1]
+        assert pages[0][0] == ("studying", 1, "2023-01-15")
+        assert get_event_log_widths(self.db, "studying") == [8, 1, 10]
+        with pytest.raises(ValueError):
+            get_event_log_widths(self.db, "exercise")
+
+    def test_print_stream(self, capfd):
+        """
+        Test the function print_stream from the analytics module.
+        """
+        # Sized up front, the streamed table is the one print_tabular prints
+        count = print_stream(HABIT_INFO_HEADER, iter_all_habits_info(self.db, page_size=2),
+                             widths=get_habit_info_widths(self.db))
+        streamed = capfd.readouterr().out
+        print_tabular(get_all_habits_info(self.db), self.db)
+        assert count == 6
+        assert streamed == capfd.readouterr().out
+
+        # Sized by the first page, longer values on later pages are cut short
+        count = print_stream(EVENT_LOG_HEADER, [[("coding", 1, "2023-01-23")], [("coding more", 2, "2023-01-24")]])
+        captured = capfd.readouterr()
+        expected_output = textwrap.dedent("""\
+            +--------+--------+------------+
+            | Habit  | Streak | Event Date |
+            +--------+--------+------------+
+            | coding |   1    | 2023-01-23 |
+            | codin… |   2    | 2023-01-24 |
+            +--------+--------+------------+
+        """)
+        assert count == 2
+        assert captured.out == expected_output
+
+    def test_get_completion_rates(self):
+        """
+        Test completion rates of one habit and of all habits.
+        """
+        # Weeks are due from the week studying was created in (starting Monday 2023-01-09), and every week counts
+        # in the month it starts in
+        assert get_completion_rates(self.db, "studying", "month", "2023-01-01", "2023-03-31")[1:] == (
+            ("2023-01-01", 4, 4, 100.0), ("2023-02-01", 1, 4, 25.0), ("2023-03-01", 0, 4, 0.0))
+        assert get_completion_rates(self.db, "coding", "week", "2023-01-16", "2023-02-05")[1:] == (
+            ("2023-01-16", 0, 1, 0.0), ("2023-01-23", 3, 7, 42.9), ("2023-01-30", 0, 7, 0.0))
+        # Ten days of coding, four weeks of studying and the year camping was created in are due in January;
+        # the check-in of the week starting 2023-01-30 comes after the last day
+        assert get_completion_rates(self.db, None, "month", "2023-01-01", "2023-01-31")[1:] == (
+            ("2023-01-01", 6, 15, 40.0), )
+        with pytest.raises(ValueError):
+            get_completion_rates(self.db, "coding", "hour", "2023-01-01", "2023-01-31")
+        with pytest.raises(ValueError):
+            get_completion_rates(self.db, "unknown", "day", "2023-01-01", "2023-01-31")
+
+    def test_get_due_habits(self):
+        """
+        Test finding the habits that are due, at risk or overdue on a day.
+        """
+        assert [(row[0], row[3], row[4], row[5]) for row in get_due_habits(self.db, "2023-11-20")[1:]] == [
+            ("coding", "2023-01-26", "2023-01-26", "overdue"), ("studying", "2023-03-06", "2023-03-12", "overdue"),
+            ("exercise", "2023-03-09", None, "due"), ("swimming", "2023-09-01", "2023-09-30", "overdue"),
+            ("reading", "2023-10-07", None, "due")]
+        assert get_due_habits(self.db, "2023-09-30")[4] == ("swimming", "monthly", 2, "2023-09-01", "2023-09-30",
+                                                             "at risk")
+        update_log(self.db, "swimming", 3, "2023-09-30")
+        assert "swimming" not in [row[0] for row in get_due_habits(self.db, "2023-09-30")]
+        with pytest.raises(ValueError):
+            get_due_habits(self.db, "2023-01-01")
+
+    def test_habit_cache(self):
+        """
+        Test that a check-in only invalidates the cached reports of its own habit.
+        """
+        get_completion_rates(self.db, "coding", "week", "2023-01-01", "2023-12-31")
+        studying = get_completion_rates(self.db, "studying", "week", "2023-01-01", "2023-12-31")
+        update_log(self.db, "coding", 4, "2023-01-26")
+
+        statements = []
+        self.db.set_trace_callback(statements.append)
+        assert get_completion_rates(self.db, "studying", "week", "2023-01-01", "2023-12-31") is studying
+        assert statements == ["PRAGMA data_version"]
+        assert get_completion_rates(self.db, "coding", "week", "2023-01-01", "2023-12-31")[2][1] == 4
+        assert statements
+        self.db.set_trace_callback(None)
+
+    def test_print_heatmap(self, capfd):
+        """
+        Test printing the check-ins of two weeks as a calendar heatmap.
+        """
+        records = get_heatmap(self.db, None, "2023-01-16", "2023-01-29")
+        assert records[1:] == (("2023-01-22", 1), ("2023-01-23", 1), ("2023-01-24", 1), ("2023-01-25", 1),
+                               ("2023-01-29", 1))
+        print_heatmap(records, "2023-01-16", "2023-01-29")
+        captured = capfd.readouterr()
+        expected_output = textwrap.dedent("""\
+                Jan
+            Mon ·█
+            Tue ·█
+            Wed ·█
+            Thu ··
+            Fri ··
+            Sat ··
+            Sun ██
+                Less · ░ ▒ ▓ █ More (busiest day: 1 check-ins)
+        """)
+        assert captured.out == expected_output
+
     def teardown_method(self):
         """
         Clean up resources after each test case.
@@ -0,0 +1,206 @@
+import io
+import json
+import pytest
+from cli import *
+from db import *
+import os
+
+
+class TestCli:
+    """
+    Test suite for the non-interactive command line interface.
+    """
+
+    def setup_method(self):
+        """
+        Set up the necessary resources before each test case.
+        """
+        self.db = get_db("test.db")
+
+    def run(self, *lines):
+        """
+        Run command lines as a batch and return the parsed JSON results.
+        """
+        out = io.StringIO()
+        run_batch(self.db, lines, out)
+        return [json.loads(line) for line in out.getvalue().splitlines()]
+
+    def test_batch(self):
+        """
+        Test creating, checking in and reporting in a single batch.
+        """
+        results = self.run("# set up",
+                           "create coding --periodicity daily --description 'Code for 30 minutes'",
+                           "",
+                           "checkin coding --date 2024-01-01",
+                           "checkin coding --date 2024-01-02",
+                           "checkin coding running --date 2024-01-02",
+                           "report longest",
+                           "report events coding")
+        assert results[0] == {"command": "create", "habit": "coding", "ok": True}
+        assert [result["outcome"] for result in results[1:5]] == ["checked_in", "checked_in",
+                                                                  "already_checked_in", "not_found"]
+        assert results[5]["rows"] == [["coding", 2, "2024-01-02"]]
+        assert results[6]["header"] == ["Habit", "Streak", "Event Date"]
+        assert results[6]["rows"] == [["coding", 1, "2024-01-01"], ["coding", 2, "2024-01-02"]]
+        assert get_description(self.db, "coding") == "Code for 30 minutes"
+
+    def test_batch_single_transaction(self):
+        """
+        Test that a batch commits once, however many commands it runs.
+        """
+        statements = []
+        self.db.set_trace_callback(statements.append)
+        self.run(*[f"create habit{i} --periodicity weekly" for i in range(20)],
+                 *[f"checkin habit{i}" for i in range(20)])
+        self.db.set_trace_callback(None)
+        assert statements.count("COMMIT") == 1
+        assert get_current_streak(self.db, "habit19") == 1
+
+    def test_rates_and_heatmap(self):
+        """
+        Test the completion rate and heatmap reports.
+        """
+        results = self.run("create coding --periodicity daily",
+                           "checkin coding --date 2024-01-01",
+                           "checkin coding --date 2024-01-03",
+                           "report rates coding --grain week --start 2024-01-01 --end 2024-01-14",
+                           "report heatmap --start 2024-01-01 --end 2024-01-14")
+        # The habit was created today, so only the checked-in days count as due
+        assert results[3]["rows"] == [["2024-01-01", 2, 2, 100.0]]
+        assert results[4]["rows"] == [["2024-01-01", 1], ["2024-01-03", 1]]
+
+    def test_due(self):
+        """
+        Test the report of due and at-risk habits.
+        """
+        results = self.run("create coding --periodicity daily",
+                           "checkin coding --date 2024-01-01",
+                           "report due --date 2024-01-02",
+                           "report due --date 2024-01-01",
+                           "report due --date garbage")
+        assert results[2]["rows"] == [["coding", "daily", 1, "2024-01-02", "2024-01-02", "at risk"]]
+        assert results[3]["rows"] == []
+        assert results[4] == {"command": "report", "ok": False, "error": "invalid date 'garbage', expected YYYY-MM-DD"}
+
+    def test_rebuild(self):
+        """
+        Test recounting the streaks of one habit and of all habits.
+        """
+        results = self.run("create coding --periodicity daily",
+                           "checkin coding --date 2024-01-01",
+                           "checkin coding --date 2024-01-02",
+                           "periodicity coding weekly",
+                           "rebuild coding",
+                           "rebuild --all",
+                           "rebuild",
+                           "rebuild coding --all")
+        assert results[4] == {"command": "rebuild", "habit": "coding", "ok": True, "streak": 1}
+        assert results[5]["habits"] == 1
+        assert [result["ok"] for result in results[6:]] == [False, False]
+
+    def test_errors(self):
+        """
+        Test that bad commands produce error results without stopping the batch.
+        """
+        results = self.run("fly coding",
+                           "create coding --periodicity hourly",
+                           "rename coding biking",
+                           "create 'coding",
+                           "create coding --periodicity daily")
+        assert [result["ok"] for result in results] == [False, False, False, False, True]
+        assert results[2]["error"] == "not_found"
+
+    def test_export_import(self, tmp_path):
+        """
+        Test exporting check-ins to a file and importing them back.
+        """
+        path = tmp_path / "events.jsonl"
+        results = self.run("create coding --periodicity daily",
+                           "checkin coding --date 2024-01-01",
+                           f"export events {path}",
+                           "delete coding",
+                           "create coding --periodicity daily",
+                           f"import events {path} --chunk-size 10",
+                           f"import events {tmp_path / 'missing.csv'}")
+        assert results[2]["rows"] == 1
+        assert (results[5]["rows"], results[5]["inserted"]) == (1, 1)
+        assert results[6]["ok"] is False
+        assert self.db.execute("SELECT event_date FROM event_log").fetchall() == [("2024-01-01",)]
+
+    def test_snapshot(self, tmp_path):
+        """
+        Test writing a snapshot and reporting from it.
+        """
+        path = tmp_path / "snapshot"
+        results = self.run("create coding --periodicity daily",
+                           "checkin coding --date 2024-01-01",
+                           "checkin coding --date 2024-01-02",
+                           f"snapshot {path}",
+                           "checkin coding --date 2024-01-03",
+                           f"report longest --snapshot {path}",
+                           "report longest",
+                           f"report heatmap coding --end 2024-01-31 --snapshot {path}",
+                           f"report events coding --snapshot {tmp_path / 'missing'}")
+        assert (results[3]["ok"], results[3]["events"]) == (True, 2)
+        assert results[5]["rows"] == [["coding", 2, "2024-01-02"]]
+        assert results[6]["rows"] == [["coding", 3, "2024-01-03"]]
+        assert results[7]["rows"] == [["2024-01-01", 1], ["2024-01-02", 1]]
+        assert results[8]["ok"] is False
+
+    def test_stats(self, tmp_path, capsys):
+        """
+        Test the stats command and the statistics written by --stats.
+        """
+        assert self.run("stats")[0]["ok"] is False
+        path = tmp_path / "stats.json"
+        batch = tmp_path / "batch.txt"
+        batch.write_text("create coding --periodicity daily\ncheckin coding\nreport longest\nstats\n")
+        assert main(["--db", "test.db", "--stats", str(path), "--batch", str(batch)]) == 0
+        result = json.loads(capsys.readouterr().out.splitlines()[-1])
+        assert result["ok"] is True
+        assert {"Habit.create", "Habit.check_in_many",
+                "analytics.get_longest_streaks_of_all_habits"} <= {operation["name"]
+                                                                   for operation in result["operations"]}
+        with open(path) as file:
+            assert json.load(file)["operations"] == result["operations"]
+
+    def test_profile(self, tmp_path, capsys):
+        """
+        Test profiling the reports of a command into .pstats files.
+        """
+        assert main(["--db", "test.db", "--profile", str(tmp_path), "report", "habits"]) == 0
+        assert [path.name.split("-", 3)[3] for path in tmp_path.iterdir()] == ["analytics.get_all_habits.pstats"]
+        assert "profile written to" in capsys.readouterr().err
+
+    def test_main(self, capsys):
+        """
+        Test running a single command from the command line.
+        """
+        assert main(["--db", "test.db", "create", "reading", "--periodicity", "weekly"]) == 0
+        assert main(["--db", "test.db", "report", "habits"]) == 0
+        lines = capsys.readouterr().out.splitlines()
+        assert json.loads(lines[0])["ok"] is True
+        assert json.loads(lines[1])["rows"] == [["reading"]]
+
+    def test_exit_status(self, tmp_path):
+        """
+        Test that the exit status tells whether any result failed.
+        """
+        batch = tmp_path / "batch.txt"
+        batch.write_text("create coding --periodicity daily\ncheckin coding\n")
+        assert main(["--db", "test.db", "--batch", str(batch)]) == 0
+        assert main(["--db", "test.db", "delete", "running"]) == 1
+        assert main(["--db", "test.db", "checkin", "coding", "running"]) == 1
+        assert main(["--db", "test.db", "checkin", "coding", "--date", "2024-13-01"]) == 1
+        batch.write_text("checkin coding\ncheckin 'coding\n")
+        assert main(["--db", "test.db", "--batch", str(batch)]) == 1
+
+    def teardown_method(self):
+        """
+        Clean up resources after each test case.
+
+        Close the database connection and remove the test database file.
+        """
+        self.db.close()
+        os.remove("test.db")
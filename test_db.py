@@ -0,0 +1,324 @@
+import sqlite3
+import threading
+import time
+import pytest
+from db import *
+import os
+
+
+class TestMigrations:
+    """
+    Test suite for the schema migrations of the db module.
+    """
+
+    def test_new_database_is_up_to_date(self):
+        """
+        Test that a new database is created with the latest schema version and the event_log index.
+        """
+        db = get_db("test.db")
+        assert db.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        indexes = [row[1] for row in db.execute("PRAGMA index_list(event_log)")]
+        assert "idx_event_log_habit_date" in indexes
+        db.close()
+
+    def test_upgrade_existing_database(self):
+        """
+        Test that a database created before schema versioning is upgraded in place without losing data.
+        """
+        legacy = sqlite3.connect("test.db")
+        legacy.execute("CREATE TABLE habit_info (habit TEXT PRIMARY KEY, periodicity TEXT, description TEXT, "
+                       "creation_date TEXT, streak INT)")
+        legacy.execute("CREATE TABLE event_log (habit TEXT, streak INT, event_date DATE)")
+        legacy.execute("INSERT INTO habit_info VALUES ('coding', 'daily', 'Code', '2023-01-22', 2)")
+        legacy.execute("INSERT INTO event_log VALUES ('coding', 1, '2023-01-23')")
+        legacy.execute("INSERT INTO event_log VALUES ('coding', 2, '2023-01-24')")
+        legacy.execute("INSERT INTO event_log VALUES ('coding', 2, '2023-01-24')")
+        legacy.commit()
+        legacy.close()
+
+        db = get_db("test.db")
+        assert db.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        assert db.execute("SELECT id, habit, streak, event_date, period_key FROM event_log ORDER BY id").fetchall() == [
+            (1, "coding", 1, "2023-01-23", 738543), (2, "coding", 2, "2023-01-24", 738544),
+            (3, "coding", 2, "2023-01-24", None)]
+        assert get_last_update_date(db, "coding") == "2023-01-24"
+        assert db.execute("SELECT longest_streak, longest_streak_end_date FROM habit_info").fetchone() == (
+            2, "2023-01-24")
+        assert db.execute("SELECT next_due_date, breaks_after_date FROM habit_info").fetchone() == (
+            "2023-01-25", "2023-01-25")
+        db.close()
+
+    def test_migrations_run_once(self):
+        """
+        Test that opening an up-to-date database does not run any migration again.
+        """
+        get_db("test.db").close()
+        db = sqlite3.connect("test.db")
+        statements = []
+        db.set_trace_callback(statements.append)
+        migrate(db)
+        assert statements == ["PRAGMA user_version"]
+        db.close()
+
+    def teardown_method(self):
+        """
+        Clean up resources after each test case.
+
+        Remove the test database file.
+        """
+        os.remove("test.db")
+
+
+
+class TestReplay:
+    """
+    Test suite for recomputing streaks from the history.
+    """
+
+    def setup_method(self):
+        """
+        Set up the necessary resources before each test case.
+        """
+        self.db = get_db("test.db")
+        for i in range(5):
+            add_habit(self.db, f"habit{i}", "daily", "", "2024-01-01", 0)
+            for day in (1, 2, 3, 5, 6):
+                add_check_in(self.db, f"habit{i}", 1, f"2024-01-0{day}")
+        add_habit(self.db, "unused", "weekly", "", "2024-01-01", 7)
+
+    def streaks(self, name):
+        """
+        Get the streaks of the check-ins of a habit, oldest first.
+        """
+        return [row[0] for row in self.db.execute("SELECT streak FROM event_log WHERE habit = ? ORDER BY event_date",
+                                                  (name, ))]
+
+    def test_rebuild_streaks(self):
+        """
+        Test that a habit's streaks are recounted from its history, and no other habit is touched.
+        """
+        rebuild_streaks(self.db, "habit1")
+        assert self.streaks("habit1") == [1, 2, 3, 1, 2]
+        assert self.streaks("habit2") == [1, 1, 1, 1, 1]
+        assert get_current_streak(self.db, "habit1") == 2
+        assert self.db.execute("SELECT longest_streak, longest_streak_end_date FROM habit_info WHERE habit = ?",
+                               ("habit1", )).fetchone() == (3, "2024-01-03")
+
+    def test_rebuild_all_streaks(self):
+        """
+        Test that rebuilding all habits in small batches repairs every habit.
+        """
+        batches = []
+        assert rebuild_all_streaks(self.db, batch_size=2, progress=batches.append) == 6
+        assert batches == [2, 4, 6]
+        assert all(self.streaks(f"habit{i}") == [1, 2, 3, 1, 2] for i in range(5))
+        assert get_current_streak(self.db, "unused") == 0
+
+    def due_dates(self, name):
+        """
+        Get the next due date and the last day of the streak of a habit.
+        """
+        return self.db.execute("SELECT next_due_date, breaks_after_date FROM habit_info WHERE habit = ?",
+                               (name, )).fetchone()
+
+    def test_due_dates(self):
+        """
+        Test that the due dates follow check-ins, including several at once, and periodicity changes.
+        """
+        assert self.due_dates("habit0") == ("2024-01-07", "2024-01-07")
+        assert self.due_dates("unused") == ("2024-01-01", None)
+        update_periodicity(self.db, "habit0", "weekly")
+        assert self.due_dates("habit0") == ("2024-01-08", "2024-01-14")
+        add_check_ins(self.db, [("unused", 1, "2024-01-31"), ("habit1", 1, "2024-01-04")])
+        assert self.due_dates("unused") == ("2024-02-05", "2024-02-11")
+        # A check-in filled in afterwards does not move the due dates back
+        assert self.due_dates("habit1") == ("2024-01-07", "2024-01-07")
+        update_periodicity(self.db, "habit2", "monthly")
+        assert self.due_dates("habit2") == ("2024-02-01", "2024-02-29")
+
+    def teardown_method(self):
+        """
+        Clean up resources after each test case.
+
+        Close the database connection and remove the test database file.
+        """
+        self.db.close()
+        os.remove("test.db")
+
+
+class TestConnectionManager:
+    """
+    Test suite for the connection manager of the db module.
+    """
+
+    def test_shared_connection(self):
+        """
+        Test that get_db returns the same connection for the same database until it is closed.
+        """
+        db = get_db("test.db")
+        assert get_db("test.db") is db
+        assert get_db(os.path.abspath("test.db")) is db
+        db.close()
+        new_db = get_db("test.db")
+        assert new_db is not db
+        new_db.close()
+
+    def test_per_thread_connection(self):
+        """
+        Test that each thread gets its own connection when asking for one.
+        """
+        db = get_db("test.db", per_thread=True)
+        assert get_db("test.db", per_thread=True) is db
+        assert get_db("test.db") is not db
+        other = []
+        thread = threading.Thread(target=lambda: other.append(get_db("test.db", per_thread=True)))
+        thread.start()
+        thread.join()
+        assert other[0] is not db
+        get_db("test.db").close()
+        db.close()
+
+    def test_read_snapshot(self):
+        """
+        Test that queries in a read_snapshot block do not see commits made meanwhile, and that a block inside a
+        transaction leaves the transaction alone.
+        """
+        db = get_db("test.db")
+        other = sqlite3.connect("test.db")
+        with read_snapshot(db):
+            assert db.execute("SELECT COUNT(*) FROM habit_info").fetchone()[0] == 0
+            with other:
+                other.execute("INSERT INTO habit_info (habit, periodicity) VALUES ('coding', 'daily')")
+            assert db.execute("SELECT COUNT(*) FROM habit_info").fetchone()[0] == 0
+        assert not db.in_transaction
+        assert db.execute("SELECT COUNT(*) FROM habit_info").fetchone()[0] == 1
+        other.close()
+
+        with transaction(db):
+            add_habit(db, "reading", "weekly", "Read for 2 hours", "2024-01-01", 0)
+            with read_snapshot(db):
+                assert db.execute("SELECT COUNT(*) FROM habit_info").fetchone()[0] == 2
+        assert is_habit_exists(db, "reading")
+        db.close()
+
+    def test_pragmas(self):
+        """
+        Test that the connection pragmas are applied when a connection is opened.
+        """
+        db = get_db("test.db", cache_size=1024, mmap_size=0)
+        assert db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert db.execute("PRAGMA synchronous").fetchone()[0] == 1
+        assert db.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+        assert db.execute("PRAGMA cache_size").fetchone()[0] == -1024
+        db.close()
+
+    def teardown_method(self):
+        """
+        Clean up resources after each test case.
+
+        Remove the test database file.
+        """
+        os.remove("test.db")
+
+
+class TestGroupCommit:
+    """
+    Test suite for grouping the commits of a connection.
+    """
+
+    def setup_method(self):
+        """
+        Set up the necessary resources before each test case.
+        """
+        self.db = get_db("test.db")
+        add_habit(self.db, "coding", "daily", "Code for 30 minutes", "2024-01-01", 0)
+        add_habit(self.db, "reading", "daily", "Read a book", "2024-01-01", 0)
+        # A second connection only sees committed changes
+        self.other = sqlite3.connect("test.db")
+
+    def committed_events(self):
+        """
+        Count the check-ins other connections can see.
+        """
+        return self.other.execute("SELECT COUNT(*) FROM event_log").fetchone()[0]
+
+    def test_max_events(self):
+        """
+        Test that a group is committed once it is full, and that the connection sees its own changes before that.
+        """
+        enable_group_commit(self.db, max_delay=60, max_events=2)
+        add_check_in(self.db, "coding", 1, "2024-01-01")
+        assert self.committed_events() == 0
+        assert get_current_streak(self.db, "coding") == 1
+        add_check_in(self.db, "reading", 1, "2024-01-01")
+        assert self.committed_events() == 2
+
+    def test_max_delay(self):
+        """
+        Test that a group is committed by the timer when no more changes come.
+        """
+        enable_group_commit(self.db, max_delay=0.01, max_events=1000)
+        add_check_in(self.db, "coding", 1, "2024-01-01")
+        deadline = time.monotonic() + 5
+        while self.committed_events() == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert self.committed_events() == 1
+
+    def test_close_and_disable(self):
+        """
+        Test that disabling group commit and closing the connection commit the open group.
+        """
+        enable_group_commit(self.db, max_delay=60)
+        add_check_in(self.db, "coding", 1, "2024-01-01")
+        disable_group_commit(self.db)
+        assert self.db.group_commit is None
+        assert self.committed_events() == 1
+        enable_group_commit(self.db, max_delay=60)
+        add_check_in(self.db, "reading", 1, "2024-01-01")
+        self.db.close()
+        assert self.committed_events() == 2
+
+    def test_failed_transaction(self):
+        """
+        Test that a transaction that raises rolls back only its own changes, not the rest of the group.
+        """
+        enable_group_commit(self.db, max_delay=60)
+        add_check_in(self.db, "coding", 1, "2024-01-01")
+        with pytest.raises(RuntimeError):
+            with transaction(self.db):
+                add_check_in(self.db, "reading", 1, "2024-01-01")
+                raise RuntimeError
+        self.db.group_commit.flush()
+        assert self.other.execute("SELECT habit FROM event_log").fetchall() == [("coding",)]
+
+    def test_habit_generations(self):
+        """
+        Test that changes mark only their own habits as changed, also when their group is committed.
+        """
+        reading = get_habit_generation("reading")
+        enable_group_commit(self.db, max_delay=60)
+        add_check_in(self.db, "coding", 1, "2024-01-01")
+        coding = get_habit_generation("coding")
+        assert coding > reading
+        self.db.group_commit.flush()
+        assert get_habit_generation("coding") > coding
+        assert get_habit_generation("reading") == reading
+
+    def test_per_thread_connection(self):
+        """
+        Test that group commit is refused for a connection owned by one thread.
+        """
+        db = get_db("test.db", per_thread=True)
+        with pytest.raises(ValueError):
+            enable_group_commit(db)
+        db.close()
+
+    def teardown_method(self):
+        """
+        Clean up resources after each test case.
+
+        Close the database connections and remove the test database file.
+        """
+        self.other.close()
+        self.db.close()
+        os.remove("test.db")
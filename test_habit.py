@@ -1,5 +1,5 @@
 from datetime import datetime
-from habit import Habit
+from habit import Habit, CHECKED_IN, ALREADY_CHECKED_IN, STREAK_BROKEN, NOT_FOUND
 import pytest
 from freezegun import freeze_time
 from db import *
@@ -64,9 +64,9 @@ class TestHabit:
 
     def test_change_periodicity(self):
         """
-        Test changing the periodicity of a habit and check if streaks are reset accordingly.
+        Test changing the periodicity of a habit and check if streaks are recounted accordingly.
 
-        This test case verifies that changing the periodicity resets streaks correctly using the 'change_periodicity' method.
+        This test case verifies that changing the periodicity keeps the streak the check-ins earn under the new periodicity.
         """
         self.habit1.create(self.db)
         self.habit1.handle_streaks(self.db)
@@ -74,7 +74,24 @@ class TestHabit:
         assert get_last_update_date(self.db, "driving") == datetime.now().strftime("%Y-%m-%d")
         self.habit1.change_periodicity(self.db, "weekly")
         assert get_periodicity(self.db, "driving") == "weekly"
-        assert get_current_streak(self.db, "driving") == 0
+        assert get_current_streak(self.db, "driving") == 1
+
+    def test_change_periodicity_keeps_earned_streak(self):
+        """
+        Test that a daily habit switched to weekly keeps the weekly streak its check-ins earn.
+        """
+        self.habit1.create(self.db)
+        # Two weeks in a row, with a gap of one day, then a repeat in the second week
+        for day in ("2024-01-01", "2024-01-02", "2024-01-04", "2024-01-09", "2024-01-10"):
+            self.habit1.check_in(self.db, day)
+        assert get_current_streak(self.db, "driving") == 2
+        self.habit1.change_periodicity(self.db, "weekly")
+        assert get_current_streak(self.db, "driving") == 2
+        events = self.db.execute("SELECT streak, period_key IS NOT NULL FROM event_log ORDER BY event_date")
+        assert events.fetchall() == [(1, 1), (1, 0), (1, 0), (2, 1), (2, 0)]
+        self.habit1.change_periodicity(self.db, "daily")
+        assert get_current_streak(self.db, "driving") == 2
+        assert self.db.execute("SELECT longest_streak FROM habit_info").fetchone() == (2, )
 
     def test_add_event(self):
         """
@@ -269,6 +286,122 @@ class TestHabit:
             self.habit4.handle_streaks(self.db)
             assert get_current_streak(self.db, "camping") == 1
 
+    def test_handle_streak_after_break(self):
+        """
+        Test that the check-in that breaks a streak starts a new one.
+
+        This test case verifies that a broken streak keeps counting from the check-in that broke it.
+        """
+        with freeze_time(datetime(2023, 12, 2)):
+            self.habit1.create(self.db)
+            self.habit1.handle_streaks(self.db)
+        with freeze_time(datetime(2023, 12, 5)):
+            self.habit1.handle_streaks(self.db)
+            assert get_current_streak(self.db, "driving") == 1
+            assert get_last_update_date(self.db, "driving") == "2023-12-05"
+        with freeze_time(datetime(2023, 12, 6)):
+            self.habit1.handle_streaks(self.db)
+            assert get_current_streak(self.db, "driving") == 2
+
+    def test_longest_streak(self):
+        """
+        Test that the longest streak of a habit is kept up to date by check-ins.
+
+        This test case verifies that a broken streak does not lower the longest streak.
+        """
+        self.habit1.create(self.db)
+        for day in ["2023-12-01", "2023-12-02", "2023-12-03", "2023-12-05", "2023-12-06"]:
+            self.habit1.check_in(self.db, day)
+        row = self.db.execute("SELECT streak, longest_streak, longest_streak_end_date FROM habit_info "
+                              "WHERE habit = 'driving'").fetchone()
+        assert row == (2, 3, "2023-12-03")
+
+    def test_check_in_same_period_ignored(self):
+        """
+        Test that a second check-in in the same period is rejected by the database.
+
+        This test case verifies that 'add_check_in' ignores a check-in for a period that is already checked in,
+        as happens when two processes check in at the same time.
+        """
+        self.habit2.create(self.db)
+        assert add_check_in(self.db, "reading", 1, "2023-12-04") is True
+        assert add_check_in(self.db, "reading", 5, "2023-12-06") is False
+        assert get_current_streak(self.db, "reading") == 1
+        assert get_last_update_date(self.db, "reading") == "2023-12-04"
+
+    def test_check_in_statement_count(self):
+        """
+        Test that a check-in runs a fixed, small number of SQL statements.
+
+        This test case verifies that 'handle_streaks' reads the habit state once and, when the streak changes,
+        writes it in a single transaction.
+        """
+        self.habit2.create(self.db)
+        statements = []
+        self.db.set_trace_callback(statements.append)
+        with freeze_time(datetime(2023, 12, 1)):
+            self.habit2.handle_streaks(self.db)
+        # One read, then BEGIN, INSERT, UPDATE and COMMIT
+        assert len(statements) == 5
+        assert statements.count("COMMIT") == 1
+
+        statements.clear()
+        with freeze_time(datetime(2023, 12, 3)):
+            self.habit2.handle_streaks(self.db)
+        # Already checked in this week: the read is the only statement
+        assert len(statements) == 1
+        self.db.set_trace_callback(None)
+
+    def test_check_in_many(self):
+        """
+        Test checking in several habits at once and check the returned outcomes.
+
+        This test case verifies that 'check_in_many' applies the same rules as 'handle_streaks' for every
+        periodicity and reports unknown habits instead of failing.
+        """
+        frozen_date = datetime(2023, 12, 4)
+        with freeze_time(frozen_date):
+            for habit in (self.habit1, self.habit2, self.habit3, self.habit4):
+                habit.create(self.db)
+        names = ["driving", "reading", "swimming", "camping"]
+
+        results = Habit.check_in_many(self.db, names + ["driving", "flying"], "2023-12-04")
+        assert results == [("driving", CHECKED_IN, 1),
+                           ("reading", CHECKED_IN, 1),
+                           ("swimming", CHECKED_IN, 1),
+                           ("camping", CHECKED_IN, 1),
+                           ("driving", ALREADY_CHECKED_IN, 1),
+                           ("flying", NOT_FOUND, None)]
+
+        results = Habit.check_in_many(self.db, names, "2023-12-05")
+        assert [outcome for _, outcome, _ in results] == [CHECKED_IN, ALREADY_CHECKED_IN,
+                                                          ALREADY_CHECKED_IN, ALREADY_CHECKED_IN]
+        assert get_current_streak(self.db, "driving") == 2
+        assert get_last_update_date(self.db, "driving") == "2023-12-05"
+
+        results = Habit.check_in_many(self.db, names, "2024-01-10")
+        assert results == [("driving", STREAK_BROKEN, 1),
+                           ("reading", STREAK_BROKEN, 1),
+                           ("swimming", CHECKED_IN, 2),
+                           ("camping", CHECKED_IN, 2)]
+        assert get_current_streak(self.db, "driving") == 1
+        assert get_current_streak(self.db, "swimming") == 2
+
+    def test_check_in_many_single_transaction(self):
+        """
+        Test that checking in several habits at once commits only once.
+
+        This test case verifies that 'check_in_many' writes all check-ins in a single transaction.
+        """
+        for habit in (self.habit1, self.habit2, self.habit3, self.habit4):
+            habit.create(self.db)
+        statements = []
+        self.db.set_trace_callback(statements.append)
+        Habit.check_in_many(self.db, ["driving", "reading", "swimming", "camping"])
+        self.db.set_trace_callback(None)
+        assert statements.count("COMMIT") == 1
+        assert get_current_streak(self.db, "camping") == 1
+
     def teardown_method(self):
         """
         Clean up resources after each test case.
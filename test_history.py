@@ -0,0 +1,80 @@
+from array import array
+import pytest
+from history import *
+from db import *
+import analytics
+import os
+
+
+class TestHistory:
+    """
+    Test suite for the compact in-memory check-in history.
+    """
+
+    def setup_method(self):
+        """
+        Set up the test environment by creating a test database and adding sample data.
+        """
+        self.db = get_db("test.db")
+        add_habit(self.db, "studying", "weekly", "Study for 60 minutes", "2023-01-15", 1)
+        add_habit(self.db, "coding", "daily", "Code for 60 minutes", "2023-01-22", 3)
+        add_habit(self.db, "exercise", "daily", "Exercise for 30 minutes", "2023-03-09", 0)
+
+        update_log(self.db, "studying", 1, "2023-01-15")
+        update_log(self.db, "studying", 2, "2023-01-22")
+        update_log(self.db, "studying", 1, "2023-03-05")
+        update_log(self.db, "coding", 1, "2023-01-23")
+        update_log(self.db, "coding", 2, "2023-01-24")
+        update_log(self.db, "coding", 3, "2023-01-25")
+        update_log(self.db, "coding", 1, "2023-01-27")
+
+    def test_load(self):
+        """
+        Test that the history holds every check-in in two int arrays per habit.
+        """
+        history = History.load(self.db)
+        assert len(history) == 3
+        assert history.event_count == 7
+        assert history.nbytes == 7 * 8
+        coding = history["coding"]
+        assert isinstance(coding.days, array) and coding.days.typecode == "i"
+        assert list(coding.streaks) == [1, 2, 3, 1]
+        assert list(coding.rows()) == self.db.execute(
+            "SELECT habit, streak, event_date FROM event_log WHERE habit = 'coding' ORDER BY event_date").fetchall()
+        assert len(history["exercise"]) == 0
+        assert [habit.name for habit in History.load(self.db, "studying")] == ["studying"]
+        assert not self.db.in_transaction
+
+    def test_append(self):
+        """
+        Test adding a check-in to a loaded history.
+        """
+        coding = History.load(self.db, "coding")["coding"]
+        coding.append("2023-01-28", 2)
+        assert coding.longest_streak() == (3, "2023-01-25")
+        coding.append("2023-01-29", 3)
+        coding.append("2023-01-29", 3)
+        assert coding.longest_streak() == (3, "2023-01-29")
+
+    def test_analytics(self):
+        """
+        Test that the event-based analytics give the same results on a history as on the database.
+        """
+        history = History.load(self.db)
+        assert analytics.get_longest_streaks_of_all_habits(history) == \
+            analytics.get_longest_streaks_of_all_habits(self.db)
+        assert analytics.get_longest_streak_for_given_habit(history, "studying") == \
+            analytics.get_longest_streak_for_given_habit(self.db, "studying")
+        assert analytics.get_event_logs_by_habit(history, "coding") == \
+            analytics.get_event_logs_by_habit(self.db, "coding")
+        with pytest.raises(ValueError):
+            analytics.get_event_logs_by_habit(history, "exercise")
+        with pytest.raises(ValueError):
+            analytics.get_longest_streak_for_given_habit(history, "running")
+
+    def teardown_method(self):
+        """
+        Clean up the test environment by closing the database connection and removing the test database file.
+        """
+        self.db.close()
+        os.remove("test.db")
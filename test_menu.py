@@ -0,0 +1,120 @@
+import contextlib
+import io
+import sys
+import tracemalloc
+from menu import *
+from profiling import CallProfiler
+from db import *
+import os
+
+
+def stack_depth():
+    """
+    Count the frames on the stack of the caller.
+    """
+    frame, depth = sys._getframe(1), 0
+    while frame is not None:
+        frame, depth = frame.f_back, depth + 1
+    return depth
+
+
+class TestMenu:
+    """
+    Test suite for the interactive menu.
+    """
+
+    def setup_method(self):
+        """
+        Set up a test database.
+        """
+        self.db = get_db("test.db")
+
+    def script(self, *choices):
+        """
+        Get a select function that makes the given choices in order, checking each is offered.
+        """
+        choices = iter(choices)
+
+        def select(prompt, options):
+            choice = next(choices)
+            assert choice is None or choice in options
+            return choice
+        return select
+
+    def test_actions(self, monkeypatch, capsys):
+        """
+        Test that choices run their actions and that every action leads back to the main menu.
+        """
+        monkeypatch.setattr(helper, "prompt_habit_name", lambda: "coding")
+        monkeypatch.setattr(helper, "prompt_habit_periodicity", lambda: "daily")
+        monkeypatch.setattr(helper, "prompt_habit_description", lambda: "Code for 60 minutes")
+        monkeypatch.setattr(helper, "prompt_habit_create_confirmation", lambda name: True)
+        monkeypatch.setattr(helper, "prompt_list_of_habits", lambda: "coding")
+        count = run_menu(self.db, self.script("Create New Habit",
+                                              "Check-in Habit",
+                                              "Analytics", "List of all currently tracked habits",
+                                              "Analytics", "List of all currently tracked habits with information",
+                                              "Analytics", "Check-in history for a given habit",
+                                              "Customize Habit Information", "Back to Main Menu",
+                                              None,
+                                              "Exit"))
+        assert count == 12
+        assert get_current_streak(self.db, "coding") == 1
+        out = capsys.readouterr().out
+        assert "List of all currently tracked habits:" in out
+        assert "| coding |    daily    | Code for 60 minutes |" in out
+        assert "| coding |   1    | " in out
+        assert out.rstrip().endswith("Have a Nice Day! Remember to check-in your habits.")
+
+    def test_profiled_actions(self, tmp_path, capsys):
+        """
+        Test that every action, and not the menu prompts, is profiled on its own.
+        """
+        profiler = CallProfiler(str(tmp_path), out=io.StringIO())
+        profiler.install()
+        try:
+            run_menu(self.db, self.script("Analytics", "Due and at-risk habits", "Exit"), profiler=profiler)
+        finally:
+            profiler.uninstall()
+        assert sorted(path.name.split("-", 3)[3] for path in tmp_path.iterdir()) == [
+            "menu.exit_tracker.pstats", "menu.show_due_habits.pstats"]
+
+    def test_soak(self):
+        """
+        Test that over 100k navigations run in a flat loop: the stack does not grow and memory stays flat.
+        """
+        # Into every submenu and back, a report, and a cancelled prompt now and then
+        cycle = ["Customize Habit Information", "Back to Main Menu", "Analytics", "Back to Main Menu",
+                 "Analytics", "Due and at-risk habits", None]
+        # Whole cycles, so the last navigation ends on the main menu
+        navigations = len(cycle) * 15_000
+        depths = set()
+        memory = []
+        made = 0
+
+        def select(prompt, options):
+            nonlocal made
+            if made % 10_000 == 0:
+                depths.add(stack_depth())
+                memory.append(tracemalloc.get_traced_memory()[0])
+            choice = cycle[made % len(cycle)] if made < navigations else "Exit"
+            made += 1
+            return choice
+
+        tracemalloc.start()
+        try:
+            with open(os.devnull, "w") as out, contextlib.redirect_stdout(out):
+                count = run_menu(self.db, select)
+        finally:
+            tracemalloc.stop()
+        assert count == navigations + 1
+        assert len(depths) == 1
+        # Allow for allocator noise, but nothing that grows with the number of navigations
+        assert max(memory[1:]) - memory[1] < 64 * 1024
+
+    def teardown_method(self):
+        """
+        Close the database connection and remove the test database file.
+        """
+        self.db.close()
+        os.remove("test.db")
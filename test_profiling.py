@@ -0,0 +1,166 @@
+import builtins
+import io
+import json
+import os
+import pstats
+import sys
+import analytics
+import db as db_module
+import habit
+from habit import Habit
+from db import *
+from profiling import *
+
+
+class TestImportTimer:
+    """
+    Test suite for the startup profiler.
+    """
+
+    def test_import_timer(self):
+        """
+        Test that the first import of a module is timed and reported, and that uninstall restores __import__.
+        """
+        original = builtins.__import__
+        sys.modules.pop("colorsys", None)
+        timer = ImportTimer()
+        timer.install()
+        try:
+            import colorsys
+            import colorsys
+        finally:
+            timer.uninstall()
+        assert builtins.__import__ is original
+        assert list(timer.times) == ["colorsys"]
+        total, own = timer.times["colorsys"]
+        assert total >= own >= 0
+
+        out = io.StringIO()
+        timer.report("time to result", file=out)
+        assert "colorsys" in out.getvalue()
+        assert "time to result:" in out.getvalue()
+
+
+class TestQueryStats:
+    """
+    Test suite for the SQL statistics.
+    """
+
+    def setup_method(self):
+        """
+        Set up a test database and start collecting statistics.
+        """
+        self.db = get_db("test.db")
+        self.stats = QueryStats()
+        self.stats.install()
+
+    def test_operations(self):
+        """
+        Test that statements, db.py functions and operations are counted, with the rows they fetch.
+        """
+        Habit("coding", "daily", "Code for 60 minutes").create(self.db)
+        Habit("reading", "weekly", "Read for 2 hours").create(self.db)
+        Habit("coding").check_in(self.db, "2024-01-01")
+        analytics.get_all_habits_info(self.db)
+        stats = self.stats.to_dict()
+
+        operations = {operation["name"]: operation for operation in stats["operations"]}
+        # One read, then BEGIN, INSERT, UPDATE and COMMIT
+        assert (operations["Habit.check_in"]["calls"], operations["Habit.check_in"]["statements"]) == (1, 5)
+        assert operations["Habit.create"]["calls"] == 2
+        # Two habits, and the row of the PRAGMA data_version the cache reads first
+        assert operations["analytics.get_all_habits_info"]["rows"] == 3
+        functions = {function["name"]: function for function in stats["functions"]}
+        assert functions["db.add_check_in"]["calls"] == 1
+        assert "db.transaction" not in functions
+        statements = {statement["sql"]: statement for statement in stats["statements"]}
+        assert statements["COMMIT"]["calls"] >= 3
+        # Executions with different values are counted as one statement
+        insert = "INSERT INTO habit_info (habit, periodicity, description, creation_date, streak, next_due_date) " \
+                 "VALUES (?, ?, ?, ?, ?, date(?))"
+        assert statements[insert]["calls"] == 2
+        # The BEGIN the sqlite3 module adds runs inside the statement that opens the transaction, and is timed with it
+        assert all(statement["calls"] and (statement["seconds"] > 0 or statement["sql"] == "BEGIN")
+                   for statement in stats["statements"])
+
+    def test_uninstall(self, tmp_path):
+        """
+        Test that uninstall puts back the original functions and connection methods, and that dump writes JSON.
+        """
+        Habit("coding", "daily", "Code for 60 minutes").create(self.db)
+        assert get_query_stats() is self.stats
+        self.stats.uninstall()
+        assert get_query_stats() is None
+        assert habit.add_habit is db_module.add_habit
+        assert db_module.add_habit.__module__ == "db" and not hasattr(db_module.add_habit, "__wrapped__")
+        assert not hasattr(Habit.create, "__wrapped__")
+        assert "execute" not in self.db.__dict__
+        Habit("reading", "weekly", "Read for 2 hours").create(self.db)
+        self.stats.dump(tmp_path / "stats.json")
+        with open(tmp_path / "stats.json") as file:
+            operations = json.load(file)["operations"]
+        assert [operation["calls"] for operation in operations] == [1]
+
+    def test_normalize_sql(self):
+        """
+        Test that literals, values and IN lists are reduced to placeholders.
+        """
+        assert normalize_sql("SELECT  habit FROM t\n WHERE a = 'it''s' AND b IN (1, 2.5, NULL) AND c2 = :c2") == \
+            "SELECT habit FROM t WHERE a = ? AND b IN (...) AND c2 = ?"
+
+    def teardown_method(self):
+        """
+        Stop collecting statistics, close the database connection and remove the test database file.
+        """
+        self.stats.uninstall()
+        self.db.close()
+        os.remove("test.db")
+
+
+class TestCallProfiler:
+    """
+    Test suite for the cProfile hooks.
+    """
+
+    def setup_method(self):
+        """
+        Set up a test database.
+        """
+        self.db = get_db("test.db")
+
+    def test_call_profiler(self, tmp_path):
+        """
+        Test that every outermost Habit and analytics call gets a profile file and a summary, and that uninstall
+        puts the original functions back.
+        """
+        original = analytics.get_all_habits
+        out = io.StringIO()
+        profiler = CallProfiler(str(tmp_path / "profiles"), top=5, out=out)
+        profiler.install()
+        try:
+            Habit("coding", "daily", "Code for 60 minutes").create(self.db)
+            # check_in runs inside handle_streaks, so it has no profile of its own
+            Habit("coding").handle_streaks(self.db)
+            analytics.get_all_habits(self.db)
+            profiler.wrap("menu.check_in_habit", lambda: Habit.check_in_many(self.db, ["coding"]))()
+        finally:
+            profiler.uninstall()
+        assert analytics.get_all_habits is original
+        assert not hasattr(Habit.check_in, "__wrapped__")
+        assert get_call_profiler() is None
+
+        files = sorted(os.listdir(tmp_path / "profiles"))
+        assert [file.split("-", 3)[3] for file in files] == ["Habit.create.pstats", "Habit.handle_streaks.pstats",
+                                                            "analytics.get_all_habits.pstats",
+                                                            "menu.check_in_habit.pstats"]
+        stats = pstats.Stats(str(tmp_path / "profiles" / files[1]))
+        assert any(function == "check_in" for _, _, function in stats.stats)
+        assert "Habit.handle_streaks: " in out.getvalue()
+        assert out.getvalue().count("profile written to") == 4
+
+    def teardown_method(self):
+        """
+        Close the database connection and remove the test database file.
+        """
+        self.db.close()
+        os.remove("test.db")
@@ -0,0 +1,147 @@
+import io
+import json
+import socket
+import sqlite3
+import threading
+from datetime import datetime
+from freezegun import freeze_time
+from reminders import *
+from habit import Habit
+from db import *
+import os
+
+
+class TestReminderScheduler:
+    """
+    Test suite for the reminders before streaks break.
+    """
+
+    def setup_method(self):
+        """
+        Set up a test database with a daily and a weekly habit, checked in on Monday 2024-01-01, and a scheduler
+        whose clock the tests set.
+        """
+        self.db = get_db("test.db")
+        add_habit(self.db, "coding", "daily", "Code for 60 minutes", "2024-01-01", 0)
+        add_habit(self.db, "reading", "weekly", "Read for 2 hours", "2024-01-01", 0)
+        add_habit(self.db, "camping", "yearly", "Camp for 2 nights", "2024-01-01", 0)
+        Habit.check_in_many(self.db, ["coding", "reading"], "2024-01-01")
+        self.clock = datetime(2024, 1, 2, 12)
+        self.reminders = []
+        self.scheduler = ReminderScheduler(self.db, self.reminders.append, now=lambda: self.clock)
+        add_write_listener(self.scheduler.on_write)
+        self.listening = True
+
+    def run_at(self, *clock):
+        """
+        Run the scheduler at a time and return the habits it reminded of.
+        """
+        self.clock = datetime(*clock)
+        return [reminder["habit"] for reminder in self.scheduler.run_pending()]
+
+    def test_reminders(self):
+        """
+        Test that every habit is reminded of once, its lead time before its streak breaks.
+        """
+        assert self.run_at(2024, 1, 2, 12) == []
+        # Only the habits whose streak ends within the horizon are loaded: coding today, not reading on Sunday
+        assert len(self.scheduler) == 1
+        assert self.scheduler.next_wakeup() == datetime(2024, 1, 2, 18)
+        assert self.run_at(2024, 1, 2, 18) == ["coding"]
+        assert self.reminders[0] == {"habit": "coding", "periodicity": "daily", "breaks_after": "2024-01-02",
+                                     "remind_at": "2024-01-02T18:00"}
+        assert self.run_at(2024, 1, 2, 19) == []
+        # A weekly streak checked in on Monday lasts until the end of the next week
+        assert self.run_at(2024, 1, 13, 23) == []
+        assert self.run_at(2024, 1, 14) == ["reading"]
+        assert self.scheduler.next_wakeup() == datetime(2024, 1, 15)
+
+    def test_changes(self):
+        """
+        Test that check-ins, periodicity changes, renames and deletions reschedule only the changed habits.
+        """
+        self.run_at(2024, 1, 2, 12)
+        with freeze_time(datetime(2024, 1, 2, 15)):
+            Habit("coding").add_event(self.db)
+        assert self.run_at(2024, 1, 2, 18) == []
+        assert self.run_at(2024, 1, 3, 18) == ["coding"]
+
+        Habit("coding").change_periodicity(self.db, "weekly")
+        Habit("reading").edit_name(self.db, "studying")
+        assert self.run_at(2024, 1, 7) == []
+        assert len(self.scheduler) == 2
+        assert self.scheduler.next_wakeup() == datetime(2024, 1, 8)
+
+        Habit.check_in_many(self.db, ["coding"], "2024-01-08")
+        Habit("studying").delete(self.db)
+        assert self.run_at(2024, 1, 14) == []
+        assert self.run_at(2024, 1, 21) == ["coding"]
+
+    def test_other_connection(self):
+        """
+        Test that a check-in the write listener does not see still cancels the reminder.
+        """
+        self.run_at(2024, 1, 2, 12)
+        remove_write_listener(self.scheduler.on_write)
+        self.listening = False
+        Habit.check_in_many(self.db, ["coding"], "2024-01-02")
+        assert self.run_at(2024, 1, 2, 18) == []
+
+    def test_other_process(self):
+        """
+        Test that a check-in made through another connection, like one of another process, moves the reminder.
+        """
+        self.run_at(2024, 1, 2, 8)
+        other = sqlite3.connect("test.db")
+        with other:
+            other.execute("""
+                UPDATE habit_info SET next_due_date = '2024-01-03', breaks_after_date = '2024-01-03'
+                WHERE habit = 'coding'""")
+        other.close()
+        assert self.run_at(2024, 1, 2, 18) == []
+        assert self.run_at(2024, 1, 3, 18) == ["coding"]
+
+    def test_run(self):
+        """
+        Test that run sleeps until woken by a write and returns when stopped.
+        """
+        self.clock = datetime(2024, 1, 2, 19)
+        thread = threading.Thread(target=self.scheduler.run)
+        thread.start()
+        self.scheduler.stop()
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+        assert [reminder["habit"] for reminder in self.reminders] == ["coding"]
+
+    def test_notifiers(self, tmp_path):
+        """
+        Test writing reminders to a file, a text stream and a Unix socket.
+        """
+        reminder = {"habit": "coding", "periodicity": "daily", "breaks_after": "2024-01-02",
+                    "remind_at": "2024-01-02T18:00"}
+        get_notifier(str(tmp_path / "reminders.jsonl"))(reminder)
+        get_notifier(str(tmp_path / "reminders.jsonl"))(reminder)
+        with open(tmp_path / "reminders.jsonl") as file:
+            assert [json.loads(line) for line in file] == [reminder, reminder]
+
+        out = io.StringIO()
+        stdout_notifier(out)(reminder)
+        assert json.loads(out.getvalue()) == reminder
+
+        path = str(tmp_path / "reminders.sock")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            server.bind(path)
+            server.listen()
+            get_notifier(f"unix:{path}")(reminder)
+            connection, _ = server.accept()
+            with connection:
+                assert json.loads(connection.makefile().readline()) == reminder
+
+    def teardown_method(self):
+        """
+        Clean up the test environment by closing the database connection and removing the test database file.
+        """
+        if self.listening:
+            remove_write_listener(self.scheduler.on_write)
+        self.db.close()
+        os.remove("test.db")
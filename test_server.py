@@ -0,0 +1,160 @@
+import asyncio
+import json
+import pytest
+import sqlite3
+from server import *
+from db import *
+import os
+
+
+class TestServer:
+    """
+    Test suite for the HTTP/JSON server.
+    """
+
+    def setup_method(self):
+        """
+        Set up the necessary resources before each test case.
+        """
+        self.db = get_db("test.db")
+
+    def serve(self, *requests):
+        """
+        Start a server on test.db, send requests on one keep-alive connection and stop the server.
+
+        Parameters:
+        - requests: (method, path, body) tuples.
+
+        Returns:
+        - list: (HTTP status, parsed JSON body) of every response.
+        """
+        async def scenario():
+            server = HabitServer("test.db", workers=2)
+            listening = await server.start("127.0.0.1", 0)
+            reader, writer = await asyncio.open_connection(*listening.sockets[0].getsockname()[:2])
+            responses = []
+            for method, path, body in requests:
+                data = json.dumps(body).encode() if body is not None else b""
+                writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+                status = int((await reader.readline()).split()[1])
+                headers = {}
+                while (line := await reader.readline()) != b"\r\n":
+                    key, _, value = line.decode().partition(":")
+                    headers[key.lower()] = value.strip()
+                responses.append((status, json.loads(await reader.readexactly(int(headers["content-length"])))))
+            writer.close()
+            await server.stop()
+            return responses
+        return asyncio.run(scenario())
+
+    def test_requests(self):
+        """
+        Test creating, checking in, reading and changing habits over HTTP.
+        """
+        responses = self.serve(("POST", "/habits", {"name": "coding", "periodicity": "daily"}),
+                               ("POST", "/habits", {"name": "coding", "periodicity": "daily"}),
+                               ("POST", "/checkins", {"names": ["coding"], "date": "2024-01-01"}),
+                               ("POST", "/checkins", {"names": ["coding"], "date": "2024-01-02"}),
+                               ("GET", "/habits/coding/events", None),
+                               ("GET", "/longest", None),
+                               ("PATCH", "/habits/coding", {"name": "code", "periodicity": "weekly"}),
+                               ("GET", "/habits?periodicity=weekly", None),
+                               ("DELETE", "/habits/code", None),
+                               ("GET", "/habits/code", None))
+        assert [status for status, _ in responses] == [200, 409, 200, 200, 200, 200, 200, 200, 200, 404]
+        assert responses[3][1]["results"][0]["streak"] == 2
+        assert len(responses[4][1]["results"][0]["rows"]) == 2
+        assert responses[5][1]["results"][0]["rows"] == [["coding", 2, "2024-01-02"]]
+        assert responses[7][1]["results"][0]["rows"][0][:2] == ["code", "weekly"]
+        assert not is_habit_exists(self.db, "code")
+
+    def test_bad_requests(self):
+        """
+        Test that invalid requests are answered with an error instead of breaking the connection.
+        """
+        responses = self.serve(("GET", "/nowhere", None),
+                               ("POST", "/habits", {"name": "coding", "periodicity": "hourly"}),
+                               ("POST", "/checkins", {"names": "coding"}),
+                               ("PATCH", "/habits/coding", {}),
+                               ("DELETE", "/habits/coding", None),
+                               ("POST", "/checkins", {"names": ["coding"], "date": 5}),
+                               ("POST", "/checkins", {"names": ["coding"], "date": "2024-1-1"}),
+                               ("GET", "/habits/coding/longest", None),
+                               ("GET", "/habits/coding/events", None))
+        assert [status for status, _ in responses] == [404, 400, 400, 400, 404, 400, 400, 404, 404]
+        assert all(response.get("ok") is False or response["results"][0]["ok"] is False
+                   for _, response in responses)
+
+    def test_bad_content_length(self):
+        """
+        Test that a missing or negative body length is answered with 400 and closes the connection.
+        """
+        async def scenario(length):
+            server = HabitServer("test.db", workers=1)
+            listening = await server.start("127.0.0.1", 0)
+            reader, writer = await asyncio.open_connection(*listening.sockets[0].getsockname()[:2])
+            writer.write(f"POST /habits HTTP/1.1\r\nContent-Length: {length}\r\n\r\n{{}}".encode())
+            response = await reader.read()
+            writer.close()
+            await server.stop()
+            return response
+        for length in ("abc", "-1"):
+            response = asyncio.run(scenario(length))
+            assert response.startswith(b"HTTP/1.1 400 ")
+            assert b"Connection: close" in response
+
+    def test_database_errors(self, monkeypatch):
+        """
+        Test that a locked database is answered with 503, so clients can retry, and other database errors with 500.
+        """
+        errors = iter([sqlite3.OperationalError("database is locked"), sqlite3.DatabaseError("disk I/O error")])
+        execute = HabitServer.execute
+
+        def failing_execute(self, commands):
+            # Start opens the connection of the writer with no commands
+            if not commands:
+                return execute(self, commands)
+            raise next(errors)
+        monkeypatch.setattr(HabitServer, "execute", failing_execute)
+        responses = self.serve(("POST", "/habits", {"name": "coding", "periodicity": "daily"}),
+                               ("GET", "/habits", None))
+        assert responses == [(503, {"ok": False, "error": "database is locked"}),
+                             (500, {"ok": False, "error": "disk I/O error"})]
+
+    def test_reports_without_check_ins(self):
+        """
+        Test that the reports on a habit without check-ins are empty, not missing.
+        """
+        responses = self.serve(("POST", "/habits", {"name": "coding", "periodicity": "daily"}),
+                               ("GET", "/habits/coding/longest", None),
+                               ("GET", "/habits/coding/events", None))
+        assert [status for status, _ in responses] == [200, 200, 200]
+        assert responses[2][1]["results"][0]["rows"] == []
+
+    def test_internal_errors(self, monkeypatch, capsys):
+        """
+        Test that an unexpected error is answered with 500 and the connection keeps serving.
+        """
+        import server
+        monkeypatch.setattr(server, "route", lambda *args: 1 / 0)
+        responses = self.serve(("GET", "/habits", None), ("GET", "/habits", None))
+        assert responses == [(500, {"ok": False, "error": "internal server error"})] * 2
+        assert "ZeroDivisionError" in capsys.readouterr().err
+
+    def test_route(self):
+        """
+        Test that a rename is the last of the changes of a PATCH request.
+        """
+        writes, commands = route("PATCH", "/habits/coding", {}, {"name": "code", "description": "Code"})
+        assert writes
+        assert [args.command for args in commands] == ["describe", "rename"]
+        assert route("GET", "/habits/my%20habit", {}, None)[1][0].name == "my habit"
+
+    def teardown_method(self):
+        """
+        Clean up resources after each test case.
+
+        Close the database connection and remove the test database file.
+        """
+        self.db.close()
+        os.remove("test.db")
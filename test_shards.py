@@ -0,0 +1,105 @@
+import io
+import json
+import shutil
+import sqlite3
+import pytest
+from shards import *
+from db import *
+from cli import main, run_for_all_users
+
+
+class TestShardRouter:
+    """
+    Test suite for per-user databases.
+    """
+
+    def setup_method(self):
+        """
+        Set up the necessary resources before each test case.
+        """
+        self.router = ShardRouter("test_users", max_open=2)
+
+    def test_path(self):
+        """
+        Test that every user id maps to its own file inside the root directory.
+        """
+        paths = {self.router.path(user_id) for user_id in ("alice", "bob", "../alice", "a/b")}
+        assert len(paths) == 4
+        assert all(os.path.dirname(os.path.dirname(path)) == "test_users" for path in paths)
+        assert self.router.path("alice") == ShardRouter("test_users").path("alice")
+        with pytest.raises(ValueError):
+            self.router.path("")
+
+    def test_users_are_separate(self):
+        """
+        Test that users have habits of the same name without seeing each other's habits.
+        """
+        for user_id, periodicity in (("alice", "daily"), ("a/b", "weekly")):
+            with self.router.connect(user_id) as db:
+                add_habit(db, "coding", periodicity, "", "2024-01-01", 0)
+        with self.router.connect("alice") as db:
+            assert get_periodicity(db, "coding") == "daily"
+        assert self.router.users() == ["a/b", "alice"]
+
+    def test_eviction(self):
+        """
+        Test that only idle connections are closed, least recently used first.
+        """
+        with self.router.connect("alice") as alice:
+            for user_id in ("bob", "carol", "dave"):
+                with self.router.connect(user_id):
+                    pass
+            # Alice is still in use, so she stays open with the most recent idle connection
+            assert list(self.router._open) == ["alice", "dave"]
+            assert is_habit_exists(alice, "coding") is False
+
+    def test_fan_out(self):
+        """
+        Test running a query for every user in parallel.
+        """
+        for i in range(5):
+            with self.router.connect(f"user{i}") as db:
+                for j in range(i):
+                    add_habit(db, f"habit{j}", "daily", "", "2024-01-01", 0)
+        counts = self.router.fan_out(lambda db: db.execute("SELECT COUNT(*) FROM habit_info").fetchone()[0])
+        assert counts == {f"user{i}": i for i in range(5)}
+        out = io.StringIO()
+        assert run_for_all_users(self.router, ["report", "habits"], out) == (5, 0)
+        results = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert [result["user"] for result in results] == [f"user{i}" for i in range(5)]
+
+    def test_hot_user(self):
+        """
+        Test that a user holding the write lock does not keep other users from writing.
+        """
+        with self.router.connect("hot") as db:
+            add_habit(db, "coding", "daily", "", "2024-01-01", 0)
+        hot = sqlite3.connect(self.router.path("hot"))
+        hot.execute("BEGIN IMMEDIATE")
+        try:
+            with self.router.connect("other") as db:
+                db.execute("PRAGMA busy_timeout = 0")
+                add_habit(db, "coding", "daily", "", "2024-01-01", 0)
+        finally:
+            hot.rollback()
+            hot.close()
+
+    def test_cli(self, capsys):
+        """
+        Test running commands for one user and for all users from the command line.
+        """
+        main(["--users", "test_users", "--user", "alice", "create", "coding", "--periodicity", "daily"])
+        main(["--users", "test_users", "--user", "bob", "create", "reading", "--periodicity", "daily"])
+        main(["--users", "test_users", "--all-users", "report", "habits"])
+        lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        assert [(line["user"], line["rows"]) for line in lines[2:]] == [("alice", [["coding"]]),
+                                                                       ("bob", [["reading"]])]
+
+    def teardown_method(self):
+        """
+        Clean up resources after each test case.
+
+        Close the connections and remove the user databases.
+        """
+        self.router.close()
+        shutil.rmtree("test_users", ignore_errors=True)
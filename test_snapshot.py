@@ -0,0 +1,95 @@
+import json
+import numpy as np
+import pytest
+from snapshot import *
+from history import History
+from db import *
+import analytics
+import os
+
+
+class TestSnapshot:
+    """
+    Test suite for the memory-mapped columnar snapshots.
+    """
+
+    def setup_method(self):
+        """
+        Set up the test environment by creating a test database and adding sample data.
+        """
+        self.db = get_db("test.db")
+        add_habit(self.db, "studying", "weekly", "Study for 60 minutes", "2023-01-15", 1)
+        add_habit(self.db, "coding", "daily", "Code for 60 minutes", "2023-01-22", 3)
+        add_habit(self.db, "exercise", "daily", "Exercise for 30 minutes", "2023-03-09", 0)
+
+        update_log(self.db, "studying", 1, "2023-01-15")
+        update_log(self.db, "studying", 2, "2023-01-22")
+        update_log(self.db, "studying", 2, "2023-01-24")
+        update_log(self.db, "studying", 1, "2023-03-05")
+        update_log(self.db, "coding", 1, "2023-01-23")
+        update_log(self.db, "coding", 2, "2023-01-24")
+        update_log(self.db, "coding", 3, "2023-01-25")
+        update_log(self.db, "coding", 1, "2023-01-27")
+
+    def test_write_and_open(self, tmp_path):
+        """
+        Test that a snapshot holds every check-in in memory-mapped int32 columns.
+        """
+        path = str(tmp_path / "snapshot")
+        assert write_snapshot(self.db, path, page_size=3) == 8
+        snapshot = Snapshot.open(path)
+        assert len(snapshot) == 3 and snapshot.event_count == 8
+        assert isinstance(snapshot.days, np.memmap) and snapshot.days.dtype == np.int32
+        assert snapshot.habit_ids.tolist() == [0, 0, 0, 0, 2, 2, 2, 2]
+        assert list(snapshot["coding"].rows()) == list(History.load(self.db, "coding")["coding"].rows())
+        assert len(snapshot["exercise"]) == 0 and "running" not in snapshot
+        assert not self.db.in_transaction
+
+        # Writing again replaces the snapshot, while an open one keeps its data
+        update_log(self.db, "exercise", 1, "2023-03-09")
+        assert write_snapshot(self.db, path) == 9
+        assert snapshot.event_count == 8 and Snapshot.open(path).event_count == 9
+        assert sorted(os.listdir(tmp_path)) == ["snapshot"]
+
+    def test_analytics(self, tmp_path):
+        """
+        Test that the analytics give the same results on a snapshot as on the database.
+        """
+        path = str(tmp_path / "snapshot")
+        write_snapshot(self.db, path)
+        snapshot = Snapshot.open(path)
+        assert snapshot.longest_streaks() == History.load(self.db).longest_streaks()
+        assert analytics.get_longest_streaks_of_all_habits(snapshot) == \
+            analytics.get_longest_streaks_of_all_habits(History.load(self.db))
+        assert analytics.get_event_logs_by_habit(snapshot, "studying") == \
+            analytics.get_event_logs_by_habit(self.db, "studying")
+        for name in (None, "studying", "coding"):
+            assert snapshot.check_in_counts(name, "2023-01-01", "2023-12-31") == \
+                analytics.get_check_in_counts(self.db, name, "2023-01-01", "2023-12-31")
+            for grain in analytics.GRAINS:
+                assert analytics.get_completion_rates(snapshot, name, grain, "2023-01-01", "2023-03-31") == \
+                    analytics.get_completion_rates(self.db, name, grain, "2023-01-01", "2023-03-31")
+            assert analytics.get_heatmap(snapshot, name, "2023-01-20", "2023-12-31") == \
+                analytics.get_heatmap(self.db, name, "2023-01-20", "2023-12-31")
+        with pytest.raises(ValueError):
+            analytics.get_heatmap(snapshot, "exercise", "2023-01-01", "2023-12-31")
+
+    def test_version(self, tmp_path):
+        """
+        Test that a snapshot of another version is refused.
+        """
+        path = str(tmp_path / "snapshot")
+        write_snapshot(self.db, path)
+        with open(os.path.join(path, "habits.json")) as file:
+            habits = json.load(file)
+        with open(os.path.join(path, "habits.json"), "w") as file:
+            json.dump(dict(habits, version=SNAPSHOT_VERSION + 1), file)
+        with pytest.raises(ValueError):
+            Snapshot.open(path)
+
+    def teardown_method(self):
+        """
+        Clean up the test environment by closing the database connection and removing the test database file.
+        """
+        self.db.close()
+        os.remove("test.db")
@@ -0,0 +1,94 @@
+from datetime import date
+import numpy as np
+from streaks import *
+from db import *
+import os
+
+
+class TestStreaks:
+    """
+    Test suite for the NumPy streak engine.
+    """
+
+    def setup_method(self):
+        """
+        Set up the test environment by creating a test database and adding sample data.
+        """
+        self.db = get_db("test.db")
+        add_habit(self.db, "studying", "weekly", "Study for 60 minutes", "2023-01-15", 1)
+        add_habit(self.db, "coding", "daily", "Code for 60 minutes", "2023-01-22", 3)
+        add_habit(self.db, "exercise", "daily", "Exercise for 30 minutes", "2023-03-09", 0)
+
+        update_log(self.db, "studying", 1, "2023-01-15")
+        update_log(self.db, "studying", 2, "2023-01-22")
+        update_log(self.db, "studying", 3, "2023-01-29")
+        update_log(self.db, "studying", 4, "2023-02-05")
+        update_log(self.db, "studying", 1, "2023-03-05")
+        update_log(self.db, "coding", 1, "2023-01-23")
+        update_log(self.db, "coding", 2, "2023-01-24")
+        update_log(self.db, "coding", 3, "2023-01-25")
+        update_log(self.db, "coding", 1, "2023-01-27")
+
+    def test_period_keys(self):
+        """
+        Test that consecutive periods get consecutive keys for every periodicity.
+        """
+        days = [date(2023, 12, 31).toordinal(), date(2024, 1, 1).toordinal()]
+        assert list(period_keys(days, [0, 0])) == [days[0], days[0] + 1]
+        # Sunday and the following Monday are in consecutive weeks
+        weeks = period_keys(days, [1, 1])
+        assert weeks[1] - weeks[0] == 1
+        months = period_keys(days, [2, 2])
+        assert months[1] - months[0] == 1
+        assert list(period_keys(days, [3, 3])) == [2023, 2024]
+        # The same keys as the ones stored in the event_log table
+        for code, periodicity in enumerate(["daily", "weekly", "monthly", "yearly"]):
+            assert period_keys(days[:1], [code])[0] == get_period_key(periodicity, "2023-12-31")
+
+    def test_compute_streaks(self):
+        """
+        Test run detection, including repeated check-ins in the same period.
+        """
+        habit_ids = np.array([1, 0, 0, 0, 0, 1, 0])
+        keys = np.array([5, 10, 11, 11, 12, 7, 20])
+        current, longest, last_keys = compute_streaks(habit_ids, keys, 3)
+        assert list(longest) == [3, 1, 0]
+        assert list(current) == [1, 1, 0]
+        assert list(last_keys) == [20, 7, -1]
+
+        current, _, _ = compute_streaks(habit_ids, keys, 3, current_keys=np.array([21, 9, 0]))
+        assert list(current) == [1, 0, 0]
+
+    def test_get_streaks(self):
+        """
+        Test that streaks are recomputed from the check-in history instead of the stored streak values.
+        """
+        result = get_streaks(self.db, date="2023-01-28")
+        assert result["coding"] == (1, 3)
+        result = get_streaks(self.db, date="2023-03-20")
+        assert result == {"coding": (0, 3), "exercise": (0, 0), "studying": (0, 4)}
+
+        # Under a monthly periodicity the same studying check-ins cover January to March
+        update_periodicity(self.db, "studying", "monthly")
+        assert get_streaks(self.db, "studying", date="2023-03-20") == {"studying": (3, 3)}
+
+    def test_compute_longest_streaks(self):
+        """
+        Test run detection, including repeated check-ins in the same period and ties between runs.
+        """
+        habit_ids = np.array([0, 0, 0, 0, 1, 1])
+        keys = np.array([10, 11, 11, 12, 5, 7])
+        days = np.array([100, 101, 102, 103, 50, 52])
+        longest, end_days = compute_longest_streaks(habit_ids, keys, days, 3)
+        assert list(longest) == [3, 1, 0]
+        # Of runs of the same length the latest wins
+        assert list(end_days) == [103, 52, -1]
+
+    def teardown_method(self):
+        """
+        Clean up resources after each test case.
+
+        Close the database connection and remove the test database file.
+        """
+        self.db.close()
+        os.remove("test.db")
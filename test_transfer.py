@@ -0,0 +1,111 @@
+import io
+import pytest
+from transfer import *
+from db import *
+import os
+
+
+class TestTransfer:
+    """
+    Test suite for importing and exporting habits and check-ins.
+    """
+
+    def setup_method(self):
+        """
+        Set up the necessary resources before each test case.
+        """
+        self.db = get_db("test.db")
+        add_habit(self.db, "coding", "daily", "Code for 30 minutes", "2024-01-01", 2)
+        add_habit(self.db, "reading", "weekly", "Read a book", "2024-01-01", 1)
+        add_check_ins(self.db, [("coding", 1, "2024-01-01"), ("coding", 2, "2024-01-02"),
+                                ("reading", 1, "2024-01-03")])
+
+    def longest_streak(self, name):
+        """
+        Get the longest streak of a habit and the date it was reached on.
+        """
+        return self.db.execute("SELECT longest_streak, longest_streak_end_date FROM habit_info WHERE habit = ?",
+                               (name,)).fetchone()
+
+    def round_trip(self, fmt):
+        """
+        Export both tables, then import them into a fresh database.
+        """
+        files = {}
+        for table in TABLES:
+            files[table] = io.StringIO()
+            count = len(self.db.execute(TABLES[table]["select"]).fetchall())
+            assert export_table(self.db, table, files[table], fmt, page_size=2) == count
+        self.db.close()
+        os.remove("test.db")
+        self.db = get_db("test.db")
+        for table in TABLES:
+            files[table].seek(0)
+            import_table(self.db, table, files[table], fmt, chunk_size=2)
+
+    @pytest.mark.parametrize("fmt", FORMATS)
+    def test_round_trip(self, fmt):
+        """
+        Test that exported habits and check-ins import back unchanged, with their period keys and longest streaks.
+        """
+        self.round_trip(fmt)
+        assert self.db.execute("SELECT habit, periodicity, description, creation_date, streak FROM habit_info "
+                               "ORDER BY habit").fetchall() == [("coding", "daily", "Code for 30 minutes", "2024-01-01", 2),
+                                         ("reading", "weekly", "Read a book", "2024-01-01", 1)]
+        assert get_check_in_state(self.db, "reading") == ("weekly", 1, get_period_key("weekly", "2024-01-03"))
+        assert self.longest_streak("coding") == (2, "2024-01-02")
+
+    def test_repeated_check_ins(self):
+        """
+        Test that a repeated check-in in a period survives a round trip without counting, and that importing the
+        same check-ins twice adds nothing.
+        """
+        # As the add_period_keys migration leaves a second check-in in the same week
+        self.db.execute("INSERT INTO event_log (habit, streak, event_date) VALUES ('reading', 1, '2024-01-04')")
+        self.db.commit()
+        events = "SELECT habit, streak, event_date, period_key FROM event_log ORDER BY habit, event_date"
+        expected = self.db.execute(events).fetchall()
+        self.round_trip("csv")
+        assert self.db.execute(events).fetchall() == expected
+        assert self.longest_streak("reading") == (1, "2024-01-03")
+
+        file = io.StringIO()
+        export_table(self.db, "events", file)
+        file.seek(0)
+        assert import_table(self.db, "events", file)[:2] == (4, 0)
+
+    def test_import_skips(self):
+        """
+        Test that check-ins of unknown habits and existing habits are skipped, and that a check-in in a period
+        that is already checked in is kept without counting.
+        """
+        progress = []
+        events = io.StringIO("event_date,habit,streak\n2024-01-04,reading,1\n2024-01-05,running,1\n"
+                             "2024-01-09,reading,2\n")
+        read, inserted, _ = import_table(self.db, "events", events, chunk_size=2,
+                                         progress=lambda *args: progress.append(args[:2]))
+        assert (read, inserted) == (3, 2)
+        assert progress == [(2, 1), (3, 2)]
+        assert self.db.execute("SELECT period_key FROM event_log WHERE event_date = '2024-01-04'").fetchone() == (None,)
+        assert self.longest_streak("reading") == (2, "2024-01-09")
+        assert self.db.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+
+        habits = io.StringIO('{"habit": "coding", "periodicity": "weekly"}\n\n{"habit": "running"}\n')
+        assert import_table(self.db, "habits", habits, "jsonl")[:2] == (2, 1)
+        assert get_periodicity(self.db, "coding") == "daily"
+
+    def test_missing_column(self):
+        """
+        Test that a CSV file without a column of the table is refused.
+        """
+        with pytest.raises(ValueError):
+            import_table(self.db, "events", io.StringIO("habit,event_date\ncoding,2024-01-03\n"))
+
+    def teardown_method(self):
+        """
+        Clean up resources after each test case.
+
+        Close the database connection and remove the test database file.
+        """
+        self.db.close()
+        os.remove("test.db")
@@ -0,0 +1,187 @@
+"""
+Streaming import and export of habits and check-in history as CSV or JSON Lines.
+
+Rows are streamed in pages on export and in chunks on import, so memory use does not grow with the size of
+the file.
+"""
+import csv
+import functools
+import itertools
+import json
+import time
+
+from db import get_period_key, iter_pages, refresh_due_dates, refresh_longest_streaks, transaction
+
+# Rows per fetchmany() call on export
+PAGE_SIZE = 5000
+
+# Rows per executemany() call and transaction on import
+CHUNK_SIZE = 50000
+
+FORMATS = ("csv", "jsonl")
+
+# Columns and statements of every table that can be moved. Imported habits that already exist are skipped,
+# as are check-ins of unknown habits and check-ins already in the database, so importing a file twice adds
+# nothing. A repeated check-in in a period that is already checked in is kept with a NULL period key, as the
+# add_period_keys migration does: it stays in the history without counting towards the streak.
+TABLES = {
+    "habits": {
+        "columns": ("habit", "periodicity", "description", "creation_date", "streak"),
+        "select": """
+            SELECT habit, periodicity, description, creation_date, streak FROM habit_info ORDER BY habit""",
+        "insert": """
+            INSERT OR IGNORE INTO habit_info (habit, periodicity, description, creation_date, streak)
+            VALUES (?, ?, ?, ?, ?)""",
+    },
+    "events": {
+        "columns": ("habit", "streak", "event_date"),
+        "select": "SELECT habit, streak, event_date FROM event_log ORDER BY habit, event_date, id",
+        "insert": """
+            INSERT INTO event_log (habit, streak, event_date, period_key)
+            SELECT ?1, ?2, ?3, CASE WHEN taken THEN NULL ELSE ?4 END
+            FROM (SELECT EXISTS (SELECT 1 FROM event_log WHERE habit = ?1 AND period_key = ?4) AS taken)
+            WHERE NOT taken
+               OR NOT EXISTS (SELECT 1 FROM event_log WHERE habit = ?1 AND event_date = ?3 AND streak IS ?2)""",
+    },
+}
+
+
+def get_format(path):
+    """
+    Guess the file format from the file name: JSON Lines for .jsonl and .ndjson files, CSV otherwise.
+    """
+    return "jsonl" if path.lower().endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def export_table(db, table, file, fmt="csv", page_size=PAGE_SIZE):
+    """
+    Write all rows of a table to a file.
+
+    CSV files start with a header row; JSON Lines files hold one object per row.
+
+    Parameters:
+    - db: Database connection.
+    - table: "habits" or "events".
+    - file: Text file opened for writing (with newline="" for CSV).
+    - fmt: "csv" or "jsonl".
+    - page_size: Number of rows read from the database at a time.
+
+    Returns:
+    - int: Number of rows written.
+    """
+    columns = TABLES[table]["columns"]
+    cur = db.cursor()
+    cur.execute(TABLES[table]["select"])
+    count = 0
+    if fmt == "csv":
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        for page in iter_pages(cur, page_size):
+            writer.writerows(page)
+            count += len(page)
+    else:
+        for page in iter_pages(cur, page_size):
+            file.write("".join(json.dumps(dict(zip(columns, row))) + "\n" for row in page))
+            count += len(page)
+    return count
+
+
+def read_rows(table, file, fmt="csv"):
+    """
+    Read the rows of a table from a file, one at a time, as tuples in the order of the table's columns.
+
+    CSV columns are matched by the names in the header row, so they may come in any order. Blank JSON Lines
+    lines are skipped; missing keys read as None.
+
+    Raises:
+    - ValueError: If a CSV file lacks a column of the table.
+    """
+    columns = TABLES[table]["columns"]
+    if fmt == "jsonl":
+        return (tuple(map(json.loads(line).get, columns)) for line in file if line.strip())
+
+    reader = csv.reader(file)
+    header = next(reader, [])
+    missing = [column for column in columns if column not in header]
+    if missing:
+        raise ValueError(f"missing column(s): {', '.join(missing)}")
+    if tuple(header) == columns:
+        return reader
+    positions = [header.index(column) for column in columns]
+    return (tuple(row[i] for i in positions) for row in reader)
+
+
+def add_period_keys(rows, periodicities, key=get_period_key):
+    """
+    Append the period key to every check-in row and drop the rows of habits that do not exist.
+
+    The keys are worked out here instead of with the period_key SQL function, as calling back into Python from
+    SQLite for every row costs more than the insert itself.
+
+    Parameters:
+    - rows: Iterable of (habit, streak, event_date) tuples.
+    - periodicities: Dictionary of the periodicity of every habit.
+    - key: Function computing the period key from a periodicity and a date.
+
+    Returns:
+    - list: (habit, streak, event_date, period_key) tuples.
+    """
+    return [(habit, streak, event_date, key(periodicities[habit], event_date))
+            for habit, streak, event_date in rows if habit in periodicities]
+
+
+def import_table(db, table, file, fmt="csv", chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Load rows from a file into a table.
+
+    Every chunk of rows is written with one executemany call in its own transaction, so a failed import keeps
+    the chunks before the failure. The longest streaks and the due dates are recomputed once all rows are in.
+
+    Check-ins are only inserted for habits that exist, so the foreign key check is switched off during the
+    import, unless the import runs inside a transaction() block, where SQLite does not allow changing it.
+
+    Parameters:
+    - db: Database connection.
+    - table: "habits" or "events".
+    - file: Text file opened for reading (with newline="" for CSV).
+    - fmt: "csv" or "jsonl".
+    - chunk_size: Number of rows per transaction.
+    - progress: Optional function called after every chunk with the rows read so far, the rows inserted so far
+                and the seconds elapsed.
+
+    Returns:
+    - tuple: (rows read, rows inserted, seconds elapsed).
+    """
+    start = time.perf_counter()
+    rows = read_rows(table, file, fmt)
+    cur = db.cursor()
+    read = inserted = 0
+    if table == "events":
+        periodicities = dict(db.execute("SELECT habit, periodicity FROM habit_info"))
+        # Check-ins repeat the same few thousand dates, so their keys are memoized
+        key = functools.lru_cache(maxsize=65536)(get_period_key)
+    skip_foreign_keys = table == "events" and not db.in_transaction
+    if skip_foreign_keys:
+        db.execute("PRAGMA foreign_keys = OFF")
+    try:
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                break
+            read += len(chunk)
+            if table == "events":
+                chunk = add_period_keys(chunk, periodicities, key)
+            with transaction(db):
+                cur.executemany(TABLES[table]["insert"], chunk)
+            inserted += max(cur.rowcount, 0)
+            if progress is not None:
+                progress(read, inserted, time.perf_counter() - start)
+        if inserted:
+            with transaction(db):
+                if table == "events":
+                    refresh_longest_streaks(cur)
+                refresh_due_dates(cur)
+    finally:
+        if skip_foreign_keys:
+            db.execute("PRAGMA foreign_keys = ON")
+    return read, inserted, time.perf_counter() - start